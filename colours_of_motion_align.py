@@ -0,0 +1,449 @@
+import argparse
+import json
+import os
+from pathlib import Path
+
+import colours_of_motion_processing as processing
+from colours_of_motion_lazy import lazy_import
+from colours_of_motion_manifest import picker_note
+from colours_of_motion_png import PALETTE_MODES, save_png, wait_for_writes
+from colours_of_motion_profile import add_profile_args, stage, start_profiling
+from colours_of_motion_similarity import rgb_to_lab
+from colours_of_motion_tonemap import EXTRACTION_FILE
+
+np = lazy_import("numpy")
+
+# === CONFIGURATION ===
+FRAME_ROOT = "frames"
+OUTPUT_ROOT = "outputs"
+EXPERIMENTAL_SUFFIX = "_experimental"
+SAMPLINGS = ("auto", "standard", "experimental")
+GAP_DE = 25.0                 # Cost of a frame present in only one edition, in ΔE
+CHANGED_DE = 25.0             # Aligned frames further apart than this count as changed
+BAND_MIN_S = 300              # Band margin around the length difference, at least 5 minutes...
+BAND_RATIO = 0.05             # ...or 5% of the longer film
+MIN_SPAN_S = 10.0             # Differences shorter than this are not reported
+MERGE_S = 10.0                # Same-kind differences closer than this are one span
+STRIP_WIDTH = 3600
+STRIP_HEIGHT = 600
+RING_RESOLUTION = 4000
+SUPERSAMPLE = 2
+CHUNK_ROWS = 256              # Ring rows rendered per block (before supersampling)
+
+# Alignment moves and step kinds
+DIAG, UP, LEFT = 0, 1, 2      # match / frame only in A / frame only in B
+KINDS = ("match", "changed", "only_a", "only_b")
+BACKGROUND = (255, 255, 255)
+GAP_COLOUR = (228, 228, 228)
+MARK_COLOURS = {
+    "changed": (233, 163, 38),
+    "only_a": (214, 54, 48),
+    "only_b": (38, 120, 214),
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Align two editions of a film by colour and render where they diverge."
+    )
+    parser.add_argument("--film-a", default=None, help="First film folder (prompts if omitted).")
+    parser.add_argument("--film-b", default=None, help="Second film folder (prompts if omitted).")
+    parser.add_argument(
+        "--sampling",
+        choices=SAMPLINGS,
+        default="auto",
+        help="standard: frames/<film>; experimental: frames/<film>_experimental (1 fps); "
+        "auto: experimental when both films have it.",
+    )
+    parser.add_argument("--gap", type=float, default=GAP_DE, help="Cost (ΔE) per frame found in only one film.")
+    parser.add_argument("--changed", type=float, default=CHANGED_DE, help="ΔE above which aligned frames differ.")
+    parser.add_argument(
+        "--band",
+        type=float,
+        default=None,
+        help="Seconds of drift allowed beyond the length difference "
+        f"(default: max({BAND_MIN_S}s, {BAND_RATIO * 100:.0f}%% of the longer film)).",
+    )
+    parser.add_argument("--min-span", type=float, default=MIN_SPAN_S, help="Shortest reported difference, in seconds.")
+    parser.add_argument("--resolution", type=int, default=RING_RESOLUTION, help="Dual-ring image size.")
+    parser.add_argument(
+        "--png-palette",
+        choices=PALETTE_MODES,
+        default="auto",
+        help="Indexed PNG output: auto (only when lossless), quantize (lossy within a bound) or off.",
+    )
+    add_profile_args(parser)
+    return parser.parse_args()
+
+
+# === INPUTS ===
+def list_folders(base_path):
+    return sorted(
+        f for f in os.listdir(base_path)
+        if os.path.isdir(os.path.join(base_path, f)) and not f.endswith(EXPERIMENTAL_SUFFIX)
+    )
+
+
+def select_folder(base_path, label):
+    folders = list_folders(base_path)
+    if not folders:
+        raise FileNotFoundError(f"No folders found in {base_path}")
+
+    print(f"Available films ({label}):")
+    for i, folder in enumerate(folders, start=1):
+        print(f"  {i}. {folder}{picker_note(os.path.join(base_path, folder))}")
+    choice = input("Select folder number: ").strip()
+    if not choice.isdigit():
+        raise ValueError("Invalid folder selection.")
+    idx = int(choice) - 1
+    if idx < 0 or idx >= len(folders):
+        raise ValueError("Invalid folder selection.")
+    return folders[idx]
+
+
+def resolve_sampling(folders, sampling):
+    """Frame directories for each film; auto prefers the 1 fps sets when every film has one."""
+    if sampling == "auto":
+        experimental = all(
+            os.path.exists(os.path.join(FRAME_ROOT, f + EXPERIMENTAL_SUFFIX, "data.json")) for f in folders
+        )
+        sampling = "experimental" if experimental else "standard"
+    suffix = EXPERIMENTAL_SUFFIX if sampling == "experimental" else ""
+    return sampling, [Path(FRAME_ROOT) / f"{f}{suffix}" for f in folders]
+
+
+def load_sequence(frame_dir, default_fps):
+    """Frame colours (uint8 RGB) and sampling rate of one extracted frame set."""
+    data_file = frame_dir / "data.json"
+    if not data_file.exists():
+        raise FileNotFoundError(f"No data.json found in {frame_dir}")
+    with open(data_file, 'r') as f:
+        metadata = json.load(f)
+    if not metadata:
+        raise ValueError(f"data.json is empty in {frame_dir}")
+    fps = None
+    for name in (EXTRACTION_FILE, processing.CUTS_FILE):
+        path = frame_dir / name
+        if fps is None and path.exists():
+            with open(path, 'r') as f:
+                fps = json.load(f).get("sample_fps")
+    colours = np.array([entry["color"] for entry in metadata], dtype=np.uint8)
+    return colours, float(fps or default_fps)
+
+
+# === ALIGNMENT ===
+def band_limits(n, m, margin):
+    """Range of j - i (B index minus A index) the alignment may visit."""
+    return min(0, m - n) - margin, max(0, m - n) + margin
+
+
+def align_sequences(lab_a, lab_b, gap=GAP_DE, margin=None):
+    """Banded alignment of two colour sequences; returns (a index, b index, ΔE) per step and the total cost.
+
+    Dynamic time warping with explicit gap moves: a frame either matches a frame of
+    the other film (cost: their ΔE) or is present in only one film (cost: gap). The
+    DP runs row by row over the band |j - i - drift| <= margin; within a row the
+    horizontal (B-only) recurrence D[j] = min(t[j], D[j-1] + gap) is the min-plus
+    prefix scan min_k(t[k] + (j - k) * gap), i.e. one np.minimum.accumulate.
+    An index of -1 marks the film that has no frame at that step.
+    """
+    lab_a = np.asarray(lab_a, dtype=np.float32)
+    lab_b = np.asarray(lab_b, dtype=np.float32)
+    n, m = len(lab_a), len(lab_b)
+    if margin is None:
+        margin = max(n, m)
+    lo, hi = band_limits(n, m, int(margin))
+    width = hi - lo + 1
+    offsets = np.arange(width)
+    ramp = offsets * float(gap)
+    # Row i, offset d is cell (i, j = i + lo + d); B is padded so each row's B frames are one slice.
+    pad = width + 1
+    padded_b = np.concatenate([np.zeros((pad, 3), np.float32), lab_b, np.zeros((pad, 3), np.float32)])
+
+    moves = np.empty((n + 1, width), dtype=np.uint8)
+    j = lo + offsets
+    prev = np.where((j >= 0) & (j <= m), j * float(gap), np.inf)
+    moves[0] = LEFT
+    prev_up = np.full(width + 1, np.inf)
+    for i in range(1, n + 1):
+        j = i + lo + offsets
+        valid = (j >= 0) & (j <= m)
+        start = i - 1 + lo + pad   # padded index of B frame j - 1 at d = 0
+        delta = padded_b[start:start + width] - lab_a[i - 1]
+        diag = prev + np.sqrt((delta * delta).sum(axis=1))
+        diag[j < 1] = np.inf
+        prev_up[:width] = prev
+        up = prev_up[1:] + gap        # cell (i - 1, j) sits at offset d + 1 of the previous row
+        best = np.minimum(diag, up)
+        best[~valid] = np.inf
+        scanned = np.minimum.accumulate(best - ramp) + ramp
+        left = scanned < best - 1e-6
+        row = np.where(left, scanned, best)
+        row[~valid] = np.inf
+        move = np.where(diag <= up, DIAG, UP).astype(np.uint8)
+        move[left] = LEFT
+        moves[i] = move
+        prev = row
+    total = float(prev[m - n - lo])
+    if not np.isfinite(total):
+        raise ValueError("No alignment fits the band; increase --band.")
+
+    a_index, b_index = [], []
+    i, d = n, m - n - lo
+    while i > 0 or i + lo + d > 0:
+        move = moves[i, d]
+        j = i + lo + d
+        if move == DIAG:
+            a_index.append(i - 1)
+            b_index.append(j - 1)
+            i -= 1
+        elif move == UP:
+            a_index.append(i - 1)
+            b_index.append(-1)
+            i -= 1
+            d += 1
+        else:
+            a_index.append(-1)
+            b_index.append(j - 1)
+            d -= 1
+    a_index = np.array(a_index[::-1], dtype=np.int64)
+    b_index = np.array(b_index[::-1], dtype=np.int64)
+    matched = (a_index >= 0) & (b_index >= 0)
+    delta_e = np.zeros(len(a_index), dtype=np.float32)
+    delta_e[matched] = np.sqrt(((lab_a[a_index[matched]] - lab_b[b_index[matched]]) ** 2).sum(axis=1))
+    return a_index, b_index, delta_e, total
+
+
+def step_kinds(a_index, b_index, delta_e, changed=CHANGED_DE):
+    """Index into KINDS for every alignment step."""
+    kinds = np.where(delta_e > changed, 1, 0)
+    kinds[b_index < 0] = 2
+    kinds[a_index < 0] = 3
+    return kinds
+
+
+def _runs(mask):
+    """(start, stop) of every run of True in a boolean array."""
+    edges = np.diff(np.concatenate([[0], mask.astype(np.int8), [0]]))
+    return list(zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)))
+
+
+def find_spans(kinds, fps, min_span_s=MIN_SPAN_S, merge_s=MERGE_S):
+    """(kind, step start, step stop) of every reported difference, in step order.
+
+    Runs of one kind separated by fewer than merge_s seconds of other steps (e.g. a
+    dark frame inside an inserted scene matching a dark frame of the other film) are
+    merged; spans with fewer than min_span_s seconds of that kind are dropped.
+    """
+    merge_steps = int(round(merge_s * fps))
+    min_steps = max(1, int(round(min_span_s * fps)))
+    spans = []
+    for code in (1, 2, 3):
+        mask = kinds == code
+        merged = []
+        for start, stop in _runs(mask):
+            if merged and start - merged[-1][1] <= merge_steps:
+                merged[-1][1] = stop
+            else:
+                merged.append([start, stop])
+        for start, stop in merged:
+            if mask[start:stop].sum() >= min_steps:
+                spans.append((KINDS[code], int(start), int(stop)))
+    return sorted(spans, key=lambda span: span[1])
+
+
+def _span_range(index, start, stop):
+    """Frame range covered by steps start..stop, or the insertion point if none."""
+    frames = index[start:stop]
+    frames = frames[frames >= 0]
+    if len(frames):
+        return int(frames.min()), int(frames.max()) + 1
+    later = index[stop:]
+    later = later[later >= 0]
+    point = int(later[0]) if len(later) else int(index.max()) + 1
+    return point, point
+
+
+def describe_spans(spans, a_index, b_index, delta_e, fps):
+    """JSON records: each span's frame ranges and times in both films."""
+    records = []
+    for kind, start, stop in spans:
+        a_start, a_stop = _span_range(a_index, start, stop)
+        b_start, b_stop = _span_range(b_index, start, stop)
+        records.append({
+            "kind": kind,
+            "a_start_s": round(a_start / fps, 2),
+            "a_end_s": round(a_stop / fps, 2),
+            "b_start_s": round(b_start / fps, 2),
+            "b_end_s": round(b_stop / fps, 2),
+            "duration_s": round(max(a_stop - a_start, b_stop - b_start) / fps, 2),
+            "a_frames": [a_start, a_stop],
+            "b_frames": [b_start, b_stop],
+        })
+        if kind == "changed":
+            records[-1]["mean_delta_e"] = round(float(delta_e[start:stop].mean()), 2)
+    return records
+
+
+# === RENDERING ===
+def step_colours(colours, index):
+    out = np.empty((len(index), 3), dtype=np.uint8)
+    out[:] = GAP_COLOUR
+    present = index >= 0
+    out[present] = colours[index[present]]
+    return out
+
+
+def step_marks(n_steps, spans):
+    """Marker colour per step: the span colour inside reported differences, else background."""
+    marks = np.empty((n_steps, 3), dtype=np.uint8)
+    marks[:] = BACKGROUND
+    for kind, start, stop in spans:
+        marks[start:stop] = MARK_COLOURS[kind]
+    return marks
+
+
+def render_comparison_strip(top, marks, bottom, width=STRIP_WIDTH, height=STRIP_HEIGHT):
+    """Aligned timelines: film A on top, film B below, differences marked in between.
+
+    Every alignment step gets the same width, so matching material lines up and a
+    span present in one film only sits opposite a grey gap in the other.
+    """
+    n_steps = len(top)
+    column = np.minimum((np.arange(width) * n_steps) // width, n_steps - 1)
+    column_marks = marks[column]
+    # A short span may fall between sampled columns; mark every column it touches.
+    marked = np.flatnonzero((marks != BACKGROUND).any(axis=1))
+    if len(marked):
+        touched = np.minimum(marked * width // n_steps, width - 1)
+        column_marks[touched] = marks[marked]
+    band = height * 9 // 20
+    image = np.empty((height, width, 3), dtype=np.uint8)
+    image[:band] = top[column][None, :, :]
+    image[band:height - band] = column_marks[None, :, :]
+    image[height - band:] = bottom[column][None, :, :]
+    return image
+
+
+def render_dual_rings(outer, marks, inner, resolution=RING_RESOLUTION, supersample=SUPERSAMPLE,
+                      chunk_rows=CHUNK_ROWS):
+    """Film A on the outer ring, film B on the inner ring, differences on a band between them.
+
+    Both rings share one angle per alignment step, clockwise from 3 o'clock like
+    circle_full.png; each block of rows is supersampled and box-filtered down.
+    """
+    n_steps = len(outer)
+    size = resolution * supersample
+    # Ring radii as fractions of the outer radius: (inner edge, outer edge).
+    rings = ((0.64, 1.0, outer), (0.585, 0.615, marks), (0.22, 0.56, inner))
+    image = np.empty((resolution, resolution, 3), dtype=np.uint8)
+    coords = (np.arange(size, dtype=np.float32) + 0.5) / size * 2.0 - 1.0
+    for row in range(0, resolution, chunk_rows):
+        rows = min(chunk_rows, resolution - row)
+        dy = coords[row * supersample:(row + rows) * supersample, None]
+        dx = coords[None, :]
+        radius = np.hypot(dx, dy)
+        turn = (np.arctan2(dy, dx) / (2 * np.pi)) % 1.0
+        step = np.minimum((turn * n_steps).astype(np.int64), n_steps - 1)
+        block = np.empty(radius.shape + (3,), dtype=np.float32)
+        block[:] = BACKGROUND
+        for r_in, r_out, colours in rings:
+            ring = (radius >= r_in) & (radius <= r_out)
+            block[ring] = colours[step[ring]]
+        block = block.reshape(rows, supersample, resolution, supersample, 3).mean(axis=(1, 3))
+        image[row:row + rows] = (block + 0.5).astype(np.uint8)
+    return image
+
+
+# === MAIN ===
+def compare_films(film_a, film_b, sampling="auto", gap=GAP_DE, changed=CHANGED_DE, band_s=None,
+                  min_span_s=MIN_SPAN_S):
+    """Align two films; returns (alignment record, per-step arrays for rendering)."""
+    sampling, (dir_a, dir_b) = resolve_sampling([film_a, film_b], sampling)
+    default_fps = 1.0 if sampling == "experimental" else processing.FPS_STANDARD
+    colours_a, fps_a = load_sequence(dir_a, default_fps)
+    colours_b, fps_b = load_sequence(dir_b, default_fps)
+    if abs(fps_a - fps_b) > 1e-6:
+        raise ValueError(f"Sampling rates differ ({fps_a} vs {fps_b} fps); extract both films at the same rate.")
+    fps = fps_a
+    n, m = len(colours_a), len(colours_b)
+    if band_s is None:
+        margin = max(int(BAND_MIN_S * fps), int(BAND_RATIO * max(n, m)))
+    else:
+        margin = int(round(band_s * fps))
+
+    print(f"[>] Aligning {n} x {m} frames at {fps:g} fps ({sampling}; band ±{margin} frames around the drift)")
+    with stage("align.dtw", items=n):
+        a_index, b_index, delta_e, total = align_sequences(rgb_to_lab(colours_a), rgb_to_lab(colours_b), gap, margin)
+    kinds = step_kinds(a_index, b_index, delta_e, changed)
+    spans = find_spans(kinds, fps, min_span_s)
+    matched = kinds <= 1
+    record = {
+        "film_a": film_a,
+        "film_b": film_b,
+        "sampling": sampling,
+        "sample_fps": fps,
+        "settings": {"gap_de": gap, "changed_de": changed, "band_frames": margin, "min_span_s": min_span_s},
+        "summary": {
+            "steps": int(len(kinds)),
+            "cost": round(total, 2),
+            "matched_s": round(float(matched.sum()) / fps, 2),
+            "mean_matched_delta_e": round(float(delta_e[matched].mean()), 2) if matched.any() else None,
+            **{f"{KINDS[code]}_s": round(float((kinds == code).sum()) / fps, 2) for code in (1, 2, 3)},
+        },
+        "spans": describe_spans(spans, a_index, b_index, delta_e, fps),
+    }
+    steps = {
+        "top": step_colours(colours_a, a_index),
+        "bottom": step_colours(colours_b, b_index),
+        "marks": step_marks(len(kinds), spans),
+    }
+    return record, steps
+
+
+def main():
+    args = parse_args()
+    start_profiling(args, "align")
+    try:
+        film_a = args.film_a or select_folder(FRAME_ROOT, "A")
+        film_b = args.film_b or select_folder(FRAME_ROOT, "B")
+        record, steps = compare_films(
+            film_a, film_b, args.sampling, args.gap, args.changed, args.band, args.min_span
+        )
+    except (FileNotFoundError, ValueError) as e:
+        print(f"[✗] {e}")
+        return
+
+    output_dir = Path(OUTPUT_ROOT) / f"{film_a} vs {film_b}"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    json_path = output_dir / "alignment.json"
+    with open(json_path, 'w') as f:
+        json.dump(record, f, indent=2)
+    summary = record["summary"]
+    print(
+        f"[✓] Saved alignment: {json_path} ({summary['only_a_s']:.0f}s only in A, "
+        f"{summary['only_b_s']:.0f}s only in B, {summary['changed_s']:.0f}s changed)"
+    )
+    for span in record["spans"]:
+        print(
+            f"  {span['kind']:<8} A {span['a_start_s']:>8.0f}-{span['a_end_s']:<8.0f}s  "
+            f"B {span['b_start_s']:>8.0f}-{span['b_end_s']:<8.0f}s  ({span['duration_s']:.0f}s)"
+        )
+
+    with stage("align.strip"):
+        strip = render_comparison_strip(steps["top"], steps["marks"], steps["bottom"])
+    strip_path = output_dir / "comparison_strip.png"
+    save_png(strip, strip_path, background=True, palette=args.png_palette)
+    print(f"[>] Encoding comparison strip in background: {strip_path}")
+
+    with stage("align.rings"):
+        rings = render_dual_rings(steps["top"], steps["marks"], steps["bottom"], args.resolution)
+    rings_path = output_dir / "comparison_rings.png"
+    save_png(rings, rings_path)
+    print(f"[✓] Saved dual-ring comparison: {rings_path}")
+    wait_for_writes()
+    print(f"[✓] Saved comparison strip: {strip_path}")
+
+
+if __name__ == "__main__":
+    main()
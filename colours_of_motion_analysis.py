@@ -0,0 +1,253 @@
+import argparse
+import os
+import subprocess
+from pathlib import Path
+
+import colours_of_motion_circle as circle
+import colours_of_motion_donut as donut
+import colours_of_motion_processing as processing
+import colours_of_motion_vertical as vertical
+import colours_of_motion_watch as watch
+from colours_of_motion_lazy import lazy_import
+from colours_of_motion_png import PALETTE_MODES, save_png, wait_for_writes
+from colours_of_motion_profile import add_profile_args, stage, start_profiling
+from colours_of_motion_tonemap import add_tonemap_args, select_tonemap
+
+np = lazy_import("numpy")
+
+# === CONFIGURATION ===
+FRAME_ROOT = "frames"
+OUTPUT_ROOT = "outputs"
+ANALYSIS_FILE = "analysis.npz"     # Written to frames/<film>/ next to the sampled frames
+STRIP_HEIGHT = processing.STRIP_HEIGHT
+READ_FRAMES = 2048                 # Frames read from the ffmpeg pipe per block
+REPORT_FRAMES = 20000              # Progress line every this many frames
+RENDERS = ("circle", "donut", "vertical", "cinematic")
+OUTPUT_NAMES = {
+    "circle": "circle_full_fullrate.png",
+    "donut": "circle_donut_poster_fullrate.png",
+    "vertical": "vertical_classic_fullrate.png",
+    "cinematic": "vertical_cinematic_fullrate.png",
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Analyse every frame of a film inside ffmpeg (1xH area-scaled columns over a pipe)."
+    )
+    parser.add_argument("--video", default=None, help="Video file. If omitted, prompts for a path.")
+    parser.add_argument(
+        "--folder",
+        default=None,
+        help="Film folder name (default: from a 'Title (Year) - ttXXXXXXX' file name, else prompts).",
+    )
+    parser.add_argument(
+        "--strip-height", type=int, default=STRIP_HEIGHT, help="Rows kept per frame (the circle strip)."
+    )
+    parser.add_argument(
+        "--renders",
+        default="",
+        help=f"Comma-separated renders from the analysis ({','.join(RENDERS)}); "
+        "with --render-only, uses an existing analysis.npz.",
+    )
+    parser.add_argument("--render-only", action="store_true", help="Skip the analysis, render from analysis.npz.")
+    parser.add_argument("--poster_mode", action="store_true", help="Render high-resolution outputs.")
+    parser.add_argument(
+        "--png-palette",
+        choices=PALETTE_MODES,
+        default="auto",
+        help="Indexed PNG output: auto (only when lossless), quantize (lossy within a bound) or off.",
+    )
+    add_tonemap_args(parser)
+    add_profile_args(parser)
+    return parser.parse_args()
+
+
+# === ANALYSIS ===
+def analysis_command(video_path, tonemap_filter, strip_height):
+    """ffmpeg reduces every decoded frame to a 1 x strip_height area average and writes raw RGB."""
+    return [
+        "ffmpeg", "-an", "-sn",
+        "-i", video_path,
+        "-map", "0:v:0",
+        "-vf", f"{tonemap_filter},scale=1:{strip_height}:flags=area,format=rgb24",
+        "-fps_mode", "passthrough",
+        "-f", "rawvideo", "-pix_fmt", "rgb24",
+        "-loglevel", "warning", "-hide_banner", "-stats",
+        "-",
+    ]
+
+
+def read_strips(stream, strip_height, expected=None):
+    """Read rgb24 1 x strip_height frames from a pipe into an (N, strip_height, 3) array."""
+    frame_bytes = strip_height * 3
+    blocks = []
+    count = 0
+    reported = 0
+    while True:
+        data = stream.read(frame_bytes * READ_FRAMES)
+        if not data:
+            break
+        # read() only returns short at EOF; a truncated last frame is dropped.
+        whole = len(data) - len(data) % frame_bytes
+        blocks.append(np.frombuffer(data[:whole], dtype=np.uint8).reshape(-1, strip_height, 3))
+        count += len(blocks[-1])
+        if count - reported >= REPORT_FRAMES:
+            reported = count
+            total = f"/{expected:,}" if expected else ""
+            print(f"  Analysed {count:,}{total} frames...")
+    if not blocks:
+        return np.empty((0, strip_height, 3), dtype=np.uint8)
+    return np.concatenate(blocks)
+
+
+def analyse_video(video_path, strip_height=STRIP_HEIGHT, tonemap="auto", crop="auto"):
+    """Every frame's 1 x strip_height colour column, computed by ffmpeg, plus how it was made.
+
+    The mean colour of a frame is the mean of its column: both are area averages of
+    the same tone-mapped pixels, so no separate 1x1 output is needed.
+    """
+    chain = select_tonemap(video_path, tonemap, crop)
+    probe = chain.get("probe") or {}
+    duration = probe.get("duration_s")
+    frame_rate = probe.get("frame_rate")
+    expected = int(round(duration * frame_rate)) if duration and frame_rate else None
+    cmd = analysis_command(video_path, chain["filter"], strip_height)
+    print(f"[>] Analysing every frame: {' '.join(cmd)}")
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+    try:
+        with stage("analysis.decode", items=expected) as info:
+            strips = read_strips(proc.stdout, strip_height, expected)
+            info["items"] = len(strips)
+    finally:
+        proc.stdout.close()
+        returncode = proc.wait()
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, "ffmpeg")
+    if not len(strips):
+        raise ValueError(f"ffmpeg produced no frames for {video_path}")
+    if not frame_rate and duration:
+        frame_rate = len(strips) / duration
+    return strips, {
+        "source": os.path.basename(video_path),
+        "frame_rate": frame_rate or 0.0,
+        "duration_s": duration or 0.0,
+        "tonemap": chain["tonemap"],
+        "filter": chain["filter"],
+        "crop": chain["crop"] or "",
+    }
+
+
+def frame_colours(strips):
+    """Mean colour (uint8 RGB) of each frame from its column."""
+    return (strips.mean(axis=1, dtype=np.float64) + 0.5).astype(np.uint8)
+
+
+def analysis_path(folder):
+    return Path(FRAME_ROOT) / folder / ANALYSIS_FILE
+
+
+def save_analysis(folder, strips, info):
+    """Write frames/<film>/analysis.npz (compressed; written aside and swapped in)."""
+    path = analysis_path(folder)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with stage("analysis.save"), open(tmp, "wb") as f:
+        fields = {key: np.asarray(value) for key, value in info.items()}
+        np.savez_compressed(f, strips=strips, colours=frame_colours(strips), **fields)
+    os.replace(tmp, path)
+    size_mb = path.stat().st_size / 1e6
+    print(f"[✓] Saved {len(strips):,} frames ({size_mb:.1f} MB): {path}")
+    return path
+
+
+def load_analysis(folder):
+    """(strips, colours, info) from frames/<film>/analysis.npz."""
+    path = analysis_path(folder)
+    if not path.exists():
+        raise FileNotFoundError(f"No {ANALYSIS_FILE} for {folder}; run the analysis first.")
+    with np.load(path) as data:
+        strips = data["strips"]
+        colours = data["colours"]
+        info = {k: data[k].item() for k in data.files if k not in ("strips", "colours")}
+    return strips, colours, info
+
+
+# === RENDERS ===
+def render_outputs(folder, strips, colours, renders, poster_mode=False, palette="auto"):
+    """Full-rate variants of the usual outputs; the binning layer keeps each one output-sized."""
+    output_dir = Path(OUTPUT_ROOT) / folder
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for render in renders:
+        path = output_dir / OUTPUT_NAMES[render]
+        with stage(f"analysis.render_{render}", items=len(colours)):
+            if render == "circle":
+                resolution = circle.HQ_RESOLUTION if poster_mode else circle.QUICK_RESOLUTION
+                save_png(circle.render_circle_image(colours, resolution), path, palette=palette)
+            elif render == "donut":
+                resolution = donut.HQ_RESOLUTION if poster_mode else donut.QUICK_RESOLUTION
+                # Timeline as the donut expects it: height x frames, BGR.
+                timeline = strips[:, :, ::-1].transpose(1, 0, 2)
+                save_png(donut.render_donut(timeline, resolution), path, bgr=True)
+            elif render == "vertical":
+                width, height = (
+                    (vertical.CLASSIC_HQ_WIDTH, vertical.CLASSIC_HQ_HEIGHT) if poster_mode
+                    else (vertical.CLASSIC_QUICK_WIDTH, vertical.CLASSIC_QUICK_HEIGHT)
+                )
+                save_png(vertical.render_vertical_classic(colours, width, height), path, palette=palette)
+            else:
+                width, height = (
+                    (vertical.HQ_WIDTH, vertical.HQ_HEIGHT) if poster_mode
+                    else (vertical.QUICK_WIDTH, vertical.QUICK_HEIGHT)
+                )
+                rgb = colours.astype(np.float64)
+                brightness = rgb @ np.array([0.299, 0.587, 0.114])
+                save_png(vertical.render_vertical_cinematic(rgb, brightness, width, height), path)
+        print(f"[✓] Saved {render}: {path}")
+    wait_for_writes()
+
+
+def parse_renders(text):
+    renders = [r.strip() for r in text.split(",") if r.strip()]
+    unknown = set(renders) - set(RENDERS)
+    if unknown:
+        raise ValueError(f"Unknown render(s): {', '.join(sorted(unknown))}")
+    return renders
+
+
+# === MAIN ===
+def main():
+    args = parse_args()
+    start_profiling(args, "analysis")
+    try:
+        renders = parse_renders(args.renders)
+    except ValueError as e:
+        print(f"[✗] {e}")
+        return
+
+    if args.render_only:
+        folder = args.folder or input("Enter folder name (e.g. 'Aliens (1986) - tt0090605'): ").strip()
+        try:
+            strips, colours, info = load_analysis(folder)
+        except FileNotFoundError as e:
+            print(f"[✗] {e}")
+            return
+        print(f"[>] {len(colours):,} frames at {info['frame_rate']:.3f} fps from {analysis_path(folder)}")
+    else:
+        video_path = args.video or input("Enter full path to video file: ").strip()
+        if not os.path.exists(video_path):
+            print("[✗] Video not found.")
+            return
+        folder = args.folder or watch.folder_from_filename(video_path)
+        if not folder:
+            folder = input("Enter folder name (e.g. 'Aliens (1986) - tt0090605'): ").strip()
+        strips, info = analyse_video(video_path, args.strip_height, args.tonemap, args.crop)
+        save_analysis(folder, strips, info)
+        colours = frame_colours(strips)
+
+    render_outputs(folder, strips, colours, renders, args.poster_mode, args.png_palette)
+    print("[✓] Analysis complete.")
+
+
+if __name__ == "__main__":
+    main()
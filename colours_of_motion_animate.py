@@ -0,0 +1,238 @@
+import argparse
+import json
+import os
+import subprocess
+from pathlib import Path
+
+from colours_of_motion_circle import circle_geometry, render_circle_array
+from colours_of_motion_lazy import lazy_import
+from colours_of_motion_manifest import picker_note, record_output
+from colours_of_motion_profile import add_profile_args, stage, start_profiling
+from colours_of_motion_vertical import render_vertical_classic
+
+np = lazy_import("numpy")
+
+# === CONFIGURATION ===
+FRAME_ROOT = "frames"
+OUTPUT_ROOT = "outputs"
+DEFAULT_FPS = 30
+DEFAULT_DURATION = 12.0       # Seconds for the film to play through
+DEFAULT_HOLD = 2.0            # Seconds the finished image stays on screen
+DEFAULT_CRF = 18
+
+# Kind -> (default width x height, colour of the not-yet-played part)
+KINDS = {
+    "circle": ((1080, 1080), 255),    # Matches the paper-white ground of circle_full.png
+    "vertical": ((1080, 1920), 0),
+    "linear": ((1920, 1080), 0),
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Encode a time-lapse of a Colours of Motion output filling up as the film plays."
+    )
+    parser.add_argument(
+        "--folder",
+        default=None,
+        help="Film folder name under frames/. If omitted, prompts for selection.",
+    )
+    parser.add_argument("--kind", choices=sorted(KINDS), default="circle", help="Output to animate.")
+    parser.add_argument("--fps", type=int, default=DEFAULT_FPS, help="Video frame rate.")
+    parser.add_argument(
+        "--duration", type=float, default=DEFAULT_DURATION, help="Seconds for the whole film to play through."
+    )
+    parser.add_argument("--hold", type=float, default=DEFAULT_HOLD, help="Seconds to hold the finished image.")
+    parser.add_argument("--size", default=None, help="Video size as WIDTHxHEIGHT (default depends on --kind).")
+    parser.add_argument("--crf", type=int, default=DEFAULT_CRF, help="libx264 quality (lower is better).")
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="Output video path (default: outputs/<film>/<kind>_timelapse.mp4).",
+    )
+    add_profile_args(parser)
+    return parser.parse_args()
+
+
+def list_folders(base_path):
+    return sorted(
+        [f for f in os.listdir(base_path) if os.path.isdir(os.path.join(base_path, f))]
+    )
+
+
+def select_folder(base_path):
+    folders = list_folders(base_path)
+    if not folders:
+        raise FileNotFoundError(f"No folders found in {base_path}")
+
+    print("Available films:")
+    for i, folder in enumerate(folders, start=1):
+        print(f"  {i}. {folder}{picker_note(os.path.join(base_path, folder))}")
+    choice = input("Select folder number: ").strip()
+    if not choice.isdigit():
+        raise ValueError("Invalid folder selection.")
+    idx = int(choice) - 1
+    if idx < 0 or idx >= len(folders):
+        raise ValueError("Invalid folder selection.")
+    return folders[idx]
+
+
+def parse_size(text, kind):
+    if not text:
+        width, height = KINDS[kind][0]
+    else:
+        try:
+            width, height = (int(v) for v in text.lower().split("x"))
+        except ValueError:
+            raise ValueError(f"Invalid --size {text!r}; expected WIDTHxHEIGHT") from None
+    # yuv420p needs even dimensions.
+    return max(2, width - width % 2), max(2, height - height % 2)
+
+
+# === REVEAL ORDER ===
+def reveal_plan(kind, colours, width, height):
+    """Finished image plus, for every pixel, the film frame that paints it (-1 = never).
+
+    Each kind reuses its still renderer at video size; only the per-pixel frame index
+    is new, so the last video frame matches the still output exactly.
+    """
+    colours = np.asarray(colours, dtype=np.uint8)
+    key = reveal_key(kind, len(colours), width, height)
+    if kind == "circle":
+        side = min(width, height)
+        top, left = (height - side) // 2, (width - side) // 2
+        final = np.full((height, width, 3), 255, dtype=np.uint8)
+        final[top:top + side, left:left + side] = render_circle_array(colours, side)
+    elif kind == "vertical":
+        final = render_vertical_classic(colours, width, height)
+    else:
+        # One hard-edged stripe per frame, like linear_hq.png.
+        final = colours[np.maximum(key, 0)]
+    return final, key
+
+
+def reveal_key(kind, n_frames, width, height):
+    """Film frame index that paints each pixel of a kind (-1 = never); needs no colours."""
+    if kind == "circle":
+        side = min(width, height)
+        key = np.full((height, width), -1, dtype=np.int32)
+        turn, ring = circle_geometry(side)
+        top, left = (height - side) // 2, (width - side) // 2
+        key[top:top + side, left:left + side] = np.where(
+            ring, np.minimum((turn * n_frames).astype(np.int32), n_frames - 1), -1
+        )
+        return key
+    if kind == "vertical":
+        # render_vertical_classic interpolates; row r sits at film position r / (height - 1).
+        rows = np.rint(np.linspace(0.0, n_frames - 1, num=height)).astype(np.int32)
+        return np.repeat(rows[:, None], width, axis=1)
+    columns = np.minimum((np.arange(width) * n_frames) // width, n_frames - 1).astype(np.int32)
+    return np.repeat(columns[None, :], height, axis=0)
+
+
+class IncrementalCanvas:
+    """One canvas that is painted forward in film order, touching each pixel once."""
+
+    def __init__(self, final, key, fill):
+        flat_key = key.reshape(-1)
+        painted = np.flatnonzero(flat_key >= 0)
+        order = np.argsort(flat_key[painted], kind="stable")
+        self._pixels = painted[order]
+        self._keys = flat_key[self._pixels]
+        self._colours = final.reshape(-1, 3)[self._pixels]
+        self.canvas = final.copy()
+        self.canvas.reshape(-1, 3)[self._pixels] = fill
+        self._done = 0
+
+    def advance(self, frames_played):
+        """Paint every pixel whose frame index is below frames_played; returns pixels painted."""
+        stop = int(np.searchsorted(self._keys, frames_played, side="left"))
+        if stop <= self._done:
+            return 0
+        self.canvas.reshape(-1, 3)[self._pixels[self._done:stop]] = self._colours[self._done:stop]
+        painted, self._done = stop - self._done, stop
+        return painted
+
+
+# === ENCODER ===
+def open_encoder(output_path, width, height, fps, crf=DEFAULT_CRF):
+    """ffmpeg reading raw RGB frames from stdin; nothing touches disk but the video."""
+    cmd = [
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}", "-r", str(fps),
+        "-i", "-",
+        "-c:v", "libx264", "-preset", "medium", "-crf", str(crf),
+        "-pix_fmt", "yuv420p", "-movflags", "+faststart",
+        str(output_path),
+    ]
+    return subprocess.Popen(cmd, stdin=subprocess.PIPE)
+
+
+def build_animation(metadata_path, output_path, kind="circle", width=None, height=None,
+                    fps=DEFAULT_FPS, duration=DEFAULT_DURATION, hold=DEFAULT_HOLD, crf=DEFAULT_CRF):
+    """Stream the time-lapse of one output to ffmpeg, painting only the newly played slices."""
+    with open(metadata_path, "r") as f:
+        data = json.load(f)
+    if not data:
+        print("[✗] Metadata is empty. Nothing to render.")
+        return
+    colours = [frame["color"] for frame in data]
+    n_frames = len(colours)
+    if width is None or height is None:
+        width, height = KINDS[kind][0]
+
+    with stage("animate.plan", items=width * height):
+        final, key = reveal_plan(kind, colours, width, height)
+        canvas = IncrementalCanvas(final, key, KINDS[kind][1])
+    del final, key
+
+    steps = max(1, int(round(duration * fps)))
+    hold_frames = max(0, int(round(hold * fps)))
+    print(f"[>] Encoding {kind} time-lapse: {n_frames} film frames over {steps + hold_frames} video frames "
+          f"({width}x{height} @ {fps} fps)")
+    encoder = open_encoder(output_path, width, height, fps, crf)
+    buffer = memoryview(canvas.canvas.reshape(-1))
+    try:
+        with stage("animate.stream", items=steps + hold_frames):
+            for step in range(1, steps + 1):
+                canvas.advance(-(-step * n_frames // steps))
+                encoder.stdin.write(buffer)
+            for _ in range(hold_frames):
+                encoder.stdin.write(buffer)
+        encoder.stdin.close()
+    except BrokenPipeError:
+        pass
+    finally:
+        returncode = encoder.wait()
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, "ffmpeg")
+    record_output(output_path)
+    print(f"[✓] Saved {kind} time-lapse: {output_path}")
+
+
+def main():
+    args = parse_args()
+    start_profiling(args, "animate")
+    folder = args.folder or select_folder(FRAME_ROOT)
+    metadata_path = Path(FRAME_ROOT) / folder / "data.json"
+    if not metadata_path.exists():
+        print("[✗] Metadata not found. Run processing script first.")
+        return
+    width, height = parse_size(args.size, args.kind)
+    output_path = Path(args.output) if args.output else Path(OUTPUT_ROOT) / folder / f"{args.kind}_timelapse.mp4"
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    build_animation(
+        metadata_path,
+        output_path,
+        kind=args.kind,
+        width=width,
+        height=height,
+        fps=args.fps,
+        duration=args.duration,
+        hold=args.hold,
+        crf=args.crf,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,752 @@
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import queue as queue_module
+import resource
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+from colours_of_motion_lazy import lazy_import
+
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+
+# === CONFIGURATION ===
+HISTORY_FILE = Path("benchmarks") / "history.jsonl"
+SIZES = {"1k": 1000, "10k": 10000, "100k": 100000}
+DEFAULT_SIZES = "1k,10k"
+DEFAULT_SCALES = "quick,poster"
+REGRESSION_THRESHOLD = 0.10   # 10% slower (or bigger) than the base run is flagged
+FRAME_SIZE = (96, 54)         # Synthetic JPEG frame size; real frames are decoded at full size
+STRIP_HEIGHT = 100
+SEED = 1234
+EXTRACT_PATHS = ("frames", "frames_cuts", "strips", "radial")
+CUT_EXCLUSION_S = 0.5         # Samples this close to a cut are not scored for colour
+SCENE_CUT_TOLERANCE_S = 0.1   # Exact (scdet) cuts must land within this of the true cut
+STARTUP_REPEAT = 5            # `com <command> --help` launches per mode; the fastest is recorded
+CASE_TIMEOUT_S = 1800         # A builder run taking longer than this is stopped and reported
+
+# Output sizes per scale, mirroring the quick/poster constants of each script.
+SCALES = {
+    "quick": {
+        "circle": 4000,
+        "donut": 4000,
+        "vertical_classic": (1600, 20000),
+        "vertical_cinematic": (3000, 5000),
+        "radial": 3000,
+        "radial_stripe": 2,
+        "poster": (1800, 2700),
+    },
+    "poster": {
+        "circle": 6000,
+        "donut": 6000,
+        "vertical_classic": (3000, 24000),
+        "vertical_cinematic": (5000, 8000),
+        "radial": 5000,
+        "radial_stripe": 4,
+        "poster": (3600, 5400),
+    },
+}
+
+BUILDERS = [
+    "build_circle_image",
+    "build_donut_poster",
+    "build_vertical_classic",
+    "build_vertical_cinematic",
+    "build_radial_image",
+    "detect_shot_boundaries",
+    "calculate_frame_data",
+    "draw_poster",
+]
+# Builders whose cost does not depend on output resolution.
+RESOLUTION_FREE = {"detect_shot_boundaries", "calculate_frame_data"}
+# Builders whose cost does not depend on frame count.
+FRAME_FREE = {"draw_poster"}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark Colours of Motion builders on synthetic films.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="Time builders and append the results to the history file.")
+    run.add_argument("--sizes", default=DEFAULT_SIZES, help=f"Comma-separated frame counts from {sorted(SIZES)}.")
+    run.add_argument("--scales", default=DEFAULT_SCALES, help="Comma-separated output scales: quick, poster.")
+    run.add_argument("--builders", default=",".join(BUILDERS), help="Comma-separated builder names to run.")
+    run.add_argument("--repeat", type=int, default=1, help="Runs per case; the fastest is recorded.")
+    run.add_argument(
+        "--timeout", type=float, default=CASE_TIMEOUT_S, help="Seconds before a hung builder run is stopped."
+    )
+    run.add_argument("--history", default=str(HISTORY_FILE), help="History JSONL path.")
+    run.add_argument("--label", default="", help="Free-form note stored with the run.")
+    run.add_argument("--work-dir", default=None, help="Directory for synthetic inputs (default: temp dir).")
+
+    extract = sub.add_parser("extract", help="Measure extraction throughput and accuracy on synthetic films.")
+    extract.add_argument("--duration", type=int, default=300, help="Synthetic film duration in seconds.")
+    extract.add_argument("--width", type=int, default=1920, help="Synthetic film width.")
+    extract.add_argument("--height", type=int, default=1080, help="Synthetic film height.")
+    extract.add_argument("--transfers", default="sdr,pq", help="Comma-separated transfers: sdr, pq.")
+    extract.add_argument("--paths", default=",".join(EXTRACT_PATHS), help="Extraction paths to run.")
+    extract.add_argument("--sample-fps", type=float, default=1.0, help="Extraction sampling rate.")
+    extract.add_argument("--tolerance", type=float, default=12.0, help="Max mean channel error for a correct frame.")
+    extract.add_argument("--history", default=str(HISTORY_FILE), help="History JSONL path.")
+    extract.add_argument("--label", default="", help="Free-form note stored with the run.")
+    extract.add_argument("--work-dir", default=None, help="Directory for films and outputs (default: temp dir).")
+
+    startup = sub.add_parser("startup", help="Time `com <command> --help` with lazy versus eager imports.")
+    startup.add_argument("--commands", default=None, help="Comma-separated com subcommands (default: all).")
+    startup.add_argument("--repeat", type=int, default=STARTUP_REPEAT, help="Launches per case; the fastest is recorded.")
+    startup.add_argument("--history", default=str(HISTORY_FILE), help="History JSONL path.")
+    startup.add_argument("--label", default="", help="Free-form note stored with the run.")
+
+    compare = sub.add_parser("compare", help="Compare two runs from the history file and flag regressions.")
+    compare.add_argument("--history", default=str(HISTORY_FILE), help="History JSONL path.")
+    compare.add_argument("--base", default="-2", help="Base run id or negative index (default: previous run).")
+    compare.add_argument("--head", default="-1", help="Head run id or negative index (default: latest run).")
+    compare.add_argument(
+        "--threshold",
+        type=float,
+        default=REGRESSION_THRESHOLD,
+        help="Relative slowdown or memory growth that counts as a regression.",
+    )
+    return parser.parse_args()
+
+
+# === SYNTHETIC DATA ===
+def synthetic_colours(n_frames, seed=SEED):
+    """Deterministic film-like colour sequence: drifting shots separated by hard cuts."""
+    rng = np.random.default_rng(seed)
+    colours = np.empty((n_frames, 3), dtype=np.float32)
+    current = rng.uniform(0, 255, 3)
+    for i in range(n_frames):
+        if rng.random() < 0.08:
+            current = rng.uniform(0, 255, 3)
+        else:
+            current = np.clip(current + rng.normal(0, 4, 3), 0, 255)
+        colours[i] = current
+    return colours.astype(np.uint8)
+
+
+def synthetic_metadata(colours):
+    """Frame records in the data.json layout written by the processing script."""
+    metadata = []
+    for i, colour in enumerate(colours.astype(np.float32)):
+        brightness = 0.299 * colour[0] + 0.587 * colour[1] + 0.114 * colour[2]
+        saturation = (colour.max() - colour.min()) / (colour.max() + 1e-5)
+        metadata.append({
+            "frame": f"frame_{i + 1:04d}.jpg",
+            "color": [int(c) for c in colour],
+            "brightness": float(brightness),
+            "saturation": float(saturation),
+        })
+    return metadata
+
+
+def write_frames(frame_dir, colours, size=FRAME_SIZE, seed=SEED):
+    """Write noisy JPEG frames whose mean colour follows colours."""
+    frame_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    width, height = size
+    for i, colour in enumerate(colours):
+        noise = rng.normal(0, 12, (height, width, 1))
+        frame = np.clip(colour[None, None, :].astype(np.float32) + noise, 0, 255).astype(np.uint8)
+        Image.fromarray(frame).save(frame_dir / f"frame_{i + 1:04d}.jpg", quality=90)
+
+
+def write_strips(strip_dir, colours, height=STRIP_HEIGHT):
+    """Write 1px strips with a vertical falloff, like the circle-mode extraction output."""
+    strip_dir.mkdir(parents=True, exist_ok=True)
+    falloff = np.linspace(1.0, 0.6, height, dtype=np.float32)[:, None]
+    for i, colour in enumerate(colours):
+        strip = (falloff * colour[None, :].astype(np.float32)).astype(np.uint8)[:, None, :]
+        Image.fromarray(strip).save(strip_dir / f"strip_{i + 1:04d}.png")
+
+
+def write_timeline(path, colours, stripe_width, line_height=120):
+    """Write a linear_hq.png-style timeline for the radial builder."""
+    row = np.repeat(colours, stripe_width, axis=0)
+    Image.fromarray(np.repeat(row[None, :, :], line_height, axis=0)).save(path)
+
+
+def prepare_inputs(work_dir, n_frames, builders):
+    """Generate (or reuse) every synthetic input needed for n_frames."""
+    root = Path(work_dir) / f"film_{n_frames}"
+    root.mkdir(parents=True, exist_ok=True)
+    colours = synthetic_colours(n_frames)
+    data_json = root / "data.json"
+    if not data_json.exists():
+        with data_json.open("w", encoding="utf-8") as f:
+            json.dump(synthetic_metadata(colours), f)
+    frames_dir = root / "frames"
+    if {"detect_shot_boundaries", "calculate_frame_data"} & set(builders) and not frames_dir.exists():
+        print(f"[>] Writing {n_frames} synthetic frames...")
+        write_frames(frames_dir, colours)
+    strips_dir = root / "strips"
+    if "build_donut_poster" in builders and not strips_dir.exists():
+        print(f"[>] Writing {n_frames} synthetic strips...")
+        write_strips(strips_dir, colours)
+    for scale in SCALES.values():
+        timeline = root / f"linear_{scale['radial_stripe']}.png"
+        if "build_radial_image" in builders and not timeline.exists():
+            write_timeline(timeline, colours, scale["radial_stripe"])
+    return root
+
+
+def prepare_poster_inputs(work_dir):
+    """Circle image and dot strip used by draw_poster."""
+    import ozonelab_style
+
+    root = Path(work_dir) / "poster"
+    root.mkdir(parents=True, exist_ok=True)
+    circle_path = root / "circle_full.png"
+    if not circle_path.exists():
+        import colours_of_motion_circle
+
+        metadata_path = Path(work_dir) / "poster_data.json"
+        with metadata_path.open("w", encoding="utf-8") as f:
+            json.dump(synthetic_metadata(synthetic_colours(1000)), f)
+        with contextlib.redirect_stdout(io.StringIO()):
+            colours_of_motion_circle.build_circle_image(str(metadata_path), str(circle_path), resolution=2000)
+    dotstrip = root / "dotstrip_light.png"
+    ozonelab_style.render_dotstrip_png(
+        stream=ozonelab_style.build_stream(1000, 8220),
+        output_path=dotstrip,
+        dot_radius=8,
+        dx=25.6,
+        row_gap=54.0,
+        gap_mult=ozonelab_style.DOTSTRIP_GAP_MULT,
+    )
+    return root
+
+
+# === CASES ===
+def run_builder(builder, input_root, scale, output_dir):
+    """Invoke one builder exactly as its script would. Returns the number of items processed."""
+    sizes = SCALES[scale]
+    out = Path(output_dir)
+    if builder == "build_circle_image":
+        from colours_of_motion_circle import build_circle_image
+
+        build_circle_image(str(input_root / "data.json"), str(out / "circle.png"), resolution=sizes["circle"])
+    elif builder == "build_donut_poster":
+        from colours_of_motion_donut import build_donut_poster
+
+        build_donut_poster(str(input_root / "strips"), str(out / "donut.png"), sizes["donut"])
+    elif builder in ("build_vertical_classic", "build_vertical_cinematic"):
+        import colours_of_motion_vertical
+
+        with (input_root / "data.json").open("r", encoding="utf-8") as f:
+            metadata = json.load(f)
+        width, height = sizes[builder.replace("build_", "")]
+        getattr(colours_of_motion_vertical, builder)(
+            metadata, str(out / "vertical.png"), target_width=width, target_height=height
+        )
+    elif builder == "build_radial_image":
+        from colours_of_motion_radial import build_radial_image
+
+        timeline = input_root / f"linear_{sizes['radial_stripe']}.png"
+        build_radial_image(str(timeline), str(out / "radial.png"), sizes["radial"])
+    elif builder == "detect_shot_boundaries":
+        from colours_of_motion_shots import detect_shot_boundaries, frame_files_for_folder
+
+        detect_shot_boundaries(frame_files_for_folder(input_root / "frames"))
+    elif builder == "calculate_frame_data":
+        from colours_of_motion_processing import calculate_frame_data
+
+        frames_dir = input_root / "frames"
+        for name in sorted(os.listdir(frames_dir)):
+            calculate_frame_data(str(frames_dir / name))
+    elif builder == "draw_poster":
+        import ozonelab_style
+
+        width, height = sizes["poster"]
+        ozonelab_style.draw_poster(
+            circle_img=Image.open(input_root / "circle_full.png").convert("RGB"),
+            output_path=out / "poster.png",
+            palette=ozonelab_style.LIGHT_THEME,
+            title="SYNTHETIC FILM",
+            subtitle="A deterministic benchmark input with drifting shots and hard cuts.",
+            meta_row=["MOTION PICTURE", "FILM PROJECT", "COLOUR", "2.39:1", "137MIN", "01.01.2000"],
+            dotstrip_asset_path=input_root / "dotstrip_light.png",
+            width=width,
+            height=height,
+        )
+    else:
+        raise ValueError(f"Unknown builder: {builder}")
+
+
+def _case_worker(builder, input_root, scale, queue, trace=False):
+    """Child-process body: one builder call, reporting wall, CPU and peak RSS (or, with trace, the Python heap peak)."""
+    output_dir = tempfile.mkdtemp(prefix="com_bench_out_")
+    try:
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if trace:
+            # tracemalloc hooks every allocation, so it gets a run of its own and never touches the timings.
+            tracemalloc.start()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        with contextlib.redirect_stdout(io.StringIO()):
+            run_builder(builder, Path(input_root), scale, output_dir)
+        cpu = time.process_time() - cpu_start
+        wall = time.perf_counter() - wall_start
+        if trace:
+            _, traced_peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            queue.put({"peak_traced_mb": traced_peak / 1e6})
+            return
+        rss_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is bytes on macOS and KiB on Linux.
+        rss_unit = 1 if sys.platform == "darwin" else 1024
+        queue.put({
+            "wall_s": wall,
+            "cpu_s": cpu,
+            "peak_rss_mb": rss_peak * rss_unit / 1e6,
+            "rss_growth_mb": (rss_peak - rss_before) * rss_unit / 1e6,
+        })
+    except Exception as exc:
+        queue.put({"error": f"{type(exc).__name__}: {exc}"})
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+
+def _run_child(ctx, builder, input_root, scale, trace, timeout):
+    """One _case_worker in a fresh process; a child that dies or hangs becomes an error result."""
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_case_worker, args=(builder, str(input_root), scale, queue, trace))
+    proc.start()
+    deadline = time.monotonic() + timeout
+    result = None
+    while result is None:
+        try:
+            result = queue.get(timeout=1.0)
+        except queue_module.Empty:
+            if not proc.is_alive():
+                # The child may have put its result just before exiting.
+                try:
+                    result = queue.get(timeout=1.0)
+                except queue_module.Empty:
+                    break
+            elif time.monotonic() > deadline:
+                proc.terminate()
+                proc.join()
+                return {"error": f"timed out after {timeout:g}s"}
+    proc.join()
+    if result is not None:
+        return result
+    code = proc.exitcode
+    if code is not None and code < 0:
+        name = signal.Signals(-code).name
+        hint = " (likely out of memory)" if -code == signal.SIGKILL else ""
+        return {"error": f"worker killed by {name}{hint}"}
+    return {"error": f"worker exited with code {code} without a result"}
+
+
+def time_case(builder, input_root, scale, repeat=1, timeout=CASE_TIMEOUT_S):
+    """Run a case in fresh processes so peak RSS belongs to this builder alone.
+
+    The timed runs are untraced; the Python heap peak comes from one extra traced run.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    best = None
+    for _ in range(max(1, repeat)):
+        result = _run_child(ctx, builder, input_root, scale, False, timeout)
+        if "error" in result:
+            return result
+        if best is None or result["wall_s"] < best["wall_s"]:
+            best = result
+    traced = _run_child(ctx, builder, input_root, scale, True, timeout)
+    if "error" in traced:
+        return traced
+    best.update(traced)
+    return best
+
+
+# === EXTRACTION ===
+def children_usage():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    rss_unit = 1 if sys.platform == "darwin" else 1024
+    return usage.ru_utime + usage.ru_stime, usage.ru_maxrss * rss_unit / 1e6
+
+
+def score_colours(colours, sample_fps, truth, tolerance):
+    """Compare per-sample RGB against the ground-truth colour of the second it was taken in."""
+    per_second = np.array(truth["per_second"], dtype=np.float32)
+    cuts = np.array([0] + truth["cuts_s"], dtype=np.float32)
+    errors = []
+    for k, colour in enumerate(colours):
+        t = k / sample_fps
+        second = int(t)
+        if second >= len(per_second) or (t > 0 and np.abs(cuts - t).min() < CUT_EXCLUSION_S):
+            continue
+        errors.append(np.abs(np.asarray(colour, dtype=np.float32) - per_second[second]).mean())
+    if not errors:
+        return {"scored_samples": 0}
+    errors = np.array(errors)
+    return {
+        "scored_samples": int(errors.size),
+        "mean_abs_error": float(errors.mean()),
+        "max_abs_error": float(errors.max()),
+        "within_tolerance": float((errors <= tolerance).mean()),
+    }
+
+
+def score_cuts(predicted_s, truth_cuts_s, tolerance_s):
+    """Greedy one-to-one matching of predicted and true cut times."""
+    remaining = list(truth_cuts_s)
+    matched = 0
+    for t in predicted_s:
+        if not remaining:
+            break
+        nearest = min(remaining, key=lambda c: abs(c - t))
+        if abs(nearest - t) <= tolerance_s:
+            remaining.remove(nearest)
+            matched += 1
+    return {
+        "predicted_cuts": len(predicted_s),
+        "true_cuts": len(truth_cuts_s),
+        "cut_precision": matched / len(predicted_s) if predicted_s else 1.0,
+        "cut_recall": matched / len(truth_cuts_s) if truth_cuts_s else 1.0,
+    }
+
+
+def run_extraction(path_name, video_path, out_dir, sample_fps):
+    """Run one extraction path exactly as its script does."""
+    if path_name in ("frames", "frames_cuts"):
+        from colours_of_motion_processing import extract_frames
+
+        extract_frames(str(video_path), str(out_dir), sample_fps, scene_cuts=path_name == "frames_cuts")
+    elif path_name == "strips":
+        from colours_of_motion_processing import STRIP_HEIGHT as CIRCLE_STRIP_HEIGHT
+        from colours_of_motion_processing import extract_circle_strips
+
+        extract_circle_strips(str(video_path), str(out_dir), sample_fps, CIRCLE_STRIP_HEIGHT)
+    elif path_name == "radial":
+        from colours_of_motion_radial import extract_frames
+
+        extract_frames(str(video_path), str(out_dir), sample_fps)
+    else:
+        raise ValueError(f"Unknown extraction path: {path_name}")
+
+
+def analyse_extraction(path_name, out_dir, sample_fps, truth, tolerance):
+    """Build data.json (or strip means) from the extracted files and score against truth."""
+    from colours_of_motion_processing import calculate_frame_data, save_metadata
+    from colours_of_motion_shots import detect_shot_boundaries, frame_files_for_folder, load_cuts, shots_from_cuts
+
+    files = sorted(p for p in Path(out_dir).iterdir() if p.suffix.lower() in (".jpg", ".png"))
+    metrics = {"sampled_frames": len(files)}
+    if path_name == "strips":
+        colours = [np.array(Image.open(p).convert("RGB"), dtype=np.float32).mean(axis=(0, 1)) for p in files]
+        metrics.update(score_colours(colours, sample_fps, truth, tolerance))
+        return metrics
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        metadata = [calculate_frame_data(str(p)) for p in files]
+        save_metadata(metadata, str(out_dir))
+    metrics.update(score_colours([m["color"] for m in metadata], sample_fps, truth, tolerance))
+    if path_name == "frames_cuts":
+        shots = shots_from_cuts(load_cuts(out_dir), metadata)
+        predicted = [s["start_s"] for s in shots[1:]]
+        metrics.update(score_cuts(predicted, truth["cuts_s"], SCENE_CUT_TOLERANCE_S))
+        return metrics
+    shots = detect_shot_boundaries(frame_files_for_folder(out_dir), min_shot_len=1)
+    predicted = [s["start_frame_index"] / sample_fps for s in shots[1:]]
+    metrics.update(score_cuts(predicted, truth["cuts_s"], 1.0 / sample_fps + CUT_EXCLUSION_S))
+    return metrics
+
+
+def cmd_extract(args):
+    from colours_of_motion_testfilm import generate_test_film, load_ground_truth
+
+    transfers = [t.strip() for t in args.transfers.split(",") if t.strip()]
+    paths = [p.strip() for p in args.paths.split(",") if p.strip()]
+    for name in paths:
+        if name not in EXTRACT_PATHS:
+            raise ValueError(f"Unknown extraction path {name!r}; choose from {EXTRACT_PATHS}")
+    work_dir = Path(args.work_dir or tempfile.mkdtemp(prefix="com_extract_"))
+    print(f"[>] Synthetic films in {work_dir}")
+
+    results = []
+    for transfer in transfers:
+        video = work_dir / f"testfilm_{transfer}_{args.duration}s_{args.width}x{args.height}.mkv"
+        if not video.exists():
+            try:
+                generate_test_film(
+                    video, duration=args.duration, width=args.width, height=args.height, transfer=transfer
+                )
+            except (OSError, subprocess.CalledProcessError) as exc:
+                print(f"[✗] Could not generate {transfer} test film (is ffmpeg installed?): {exc}")
+                return 1
+        truth = load_ground_truth(video)
+        source_frames = truth["duration_s"] * truth["fps"]
+        for path_name in paths:
+            out_dir = work_dir / f"out_{transfer}_{path_name}"
+            shutil.rmtree(out_dir, ignore_errors=True)
+            case = f"extract/{path_name}/{transfer}"
+            cpu_before, _ = children_usage()
+            wall_start = time.perf_counter()
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    run_extraction(path_name, video, out_dir, args.sample_fps)
+            except (OSError, subprocess.CalledProcessError) as exc:
+                result = {"case": case, "error": f"{type(exc).__name__}: {exc}"}
+                results.append(result)
+                print(f"[✗] {case}: {result['error']}")
+                continue
+            wall = time.perf_counter() - wall_start
+            cpu_after, rss_peak = children_usage()
+            result = {
+                "case": case,
+                "builder": f"extract_{path_name}",
+                "transfer": transfer,
+                "wall_s": wall,
+                "cpu_s": cpu_after - cpu_before,
+                "peak_rss_mb": rss_peak,
+                "source_frames": source_frames,
+                "decode_fps": source_frames / wall,
+            }
+            result.update(analyse_extraction(path_name, out_dir, args.sample_fps, truth, args.tolerance))
+            result["sampled_fps"] = result["sampled_frames"] / wall
+            results.append(result)
+            accuracy = (
+                f"err {result['mean_abs_error']:.1f} (max {result['max_abs_error']:.1f})"
+                if "mean_abs_error" in result else "err n/a"
+            )
+            cuts = (
+                f" cuts P {result['cut_precision']:.2f} R {result['cut_recall']:.2f}"
+                if "cut_precision" in result else ""
+            )
+            print(f"[✓] {case:24s} {wall:8.2f}s  {result['decode_fps']:8.1f} src fps  {accuracy}{cuts}")
+
+    record_run(args.history, args.label, results)
+    if not args.work_dir:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def time_launch(cmd, env):
+    """Wall time and peak RSS of one child process, measured with wait4 so runs do not mix."""
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    _, status, usage = os.wait4(proc.pid, 0)
+    wall = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+    return wall, usage.ru_maxrss / 1024.0
+
+
+def cmd_startup(args):
+    from com import COMMANDS
+    from colours_of_motion_lazy import EAGER_ENV
+
+    commands = [c.strip() for c in (args.commands or ",".join(COMMANDS)).split(",") if c.strip()]
+    for name in commands:
+        if name not in COMMANDS:
+            raise ValueError(f"Unknown command {name!r}; choose from {list(COMMANDS)}")
+    script = Path(__file__).with_name("com.py")
+
+    results = []
+    for name in commands:
+        timings = {}
+        for mode in ("lazy", "eager"):
+            env = dict(os.environ)
+            env.pop(EAGER_ENV, None)
+            if mode == "eager":
+                env[EAGER_ENV] = "1"
+            case = f"startup/{name}/{mode}"
+            try:
+                runs = [time_launch([sys.executable, str(script), name, "--help"], env) for _ in range(args.repeat)]
+            except (OSError, subprocess.CalledProcessError) as exc:
+                results.append({"case": case, "error": f"{type(exc).__name__}: {exc}"})
+                print(f"[✗] {case}: {results[-1]['error']}")
+                continue
+            wall = min(r[0] for r in runs)
+            timings[mode] = wall
+            results.append({
+                "case": case,
+                "builder": f"startup_{name}",
+                "mode": mode,
+                "wall_s": wall,
+                "cpu_s": None,
+                "peak_rss_mb": min(r[1] for r in runs),
+            })
+        if len(timings) == 2:
+            print(
+                f"[✓] {name:10s} lazy {timings['lazy'] * 1000:7.1f} ms   eager {timings['eager'] * 1000:7.1f} ms   "
+                f"({timings['eager'] / timings['lazy']:.1f}x)"
+            )
+
+    record_run(args.history, args.label, results)
+
+
+# === HISTORY ===
+def git_commit():
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        )
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def record_run(path, label, results):
+    """Append one run (results plus where and on what it ran) to the history; every command records through here."""
+    now = datetime.now(timezone.utc)
+    record = {
+        "run_id": now.strftime("%Y%m%dT%H%M%SZ"),
+        "ts_utc": now.isoformat(),
+        "git_commit": git_commit(),
+        "label": label,
+        "host": platform.node(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+    append_history(path, record)
+    print(f"[✓] Appended run {record['run_id']} to {path}")
+    return record
+
+
+def append_history(path, record):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=True) + "\n")
+
+
+def load_history(path):
+    path = Path(path)
+    if not path.exists():
+        return []
+    with path.open("r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def pick_run(runs, ref):
+    """Find a run by run_id, or by (negative) index into the history."""
+    for run in runs:
+        if run.get("run_id") == ref:
+            return run
+    try:
+        return runs[int(ref)]
+    except (ValueError, IndexError):
+        raise ValueError(f"Run not found in history: {ref}")
+
+
+# === COMMANDS ===
+def cmd_run(args):
+    sizes = [s.strip() for s in args.sizes.split(",") if s.strip()]
+    scales = [s.strip() for s in args.scales.split(",") if s.strip()]
+    builders = [b.strip() for b in args.builders.split(",") if b.strip()]
+    for name in sizes:
+        if name not in SIZES:
+            raise ValueError(f"Unknown size {name!r}; choose from {sorted(SIZES)}")
+    for name in scales:
+        if name not in SCALES:
+            raise ValueError(f"Unknown scale {name!r}; choose from {sorted(SCALES)}")
+    for name in builders:
+        if name not in BUILDERS:
+            raise ValueError(f"Unknown builder {name!r}; choose from {BUILDERS}")
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="com_bench_")
+    print(f"[>] Synthetic inputs in {work_dir}")
+    poster_root = prepare_poster_inputs(work_dir) if "draw_poster" in builders else None
+
+    results = []
+    for size in sizes:
+        n_frames = SIZES[size]
+        frame_builders = [b for b in builders if b not in FRAME_FREE]
+        input_root = prepare_inputs(work_dir, n_frames, frame_builders) if frame_builders else None
+        for builder in builders:
+            if builder in FRAME_FREE and size != sizes[0]:
+                continue
+            for scale in scales:
+                if builder in RESOLUTION_FREE and scale != scales[0]:
+                    continue
+                root = poster_root if builder in FRAME_FREE else input_root
+                case = f"{builder}/{'-' if builder in FRAME_FREE else size}/{'-' if builder in RESOLUTION_FREE else scale}"
+                result = time_case(builder, root, scale, repeat=args.repeat, timeout=args.timeout)
+                result.update({
+                    "case": case,
+                    "builder": builder,
+                    "frames": None if builder in FRAME_FREE else n_frames,
+                    "scale": None if builder in RESOLUTION_FREE else scale,
+                })
+                results.append(result)
+                if "error" in result:
+                    print(f"[✗] {case}: {result['error']}")
+                else:
+                    print(
+                        f"[✓] {case:48s} {result['wall_s']:8.3f}s wall "
+                        f"{result['cpu_s']:8.3f}s cpu {result['peak_rss_mb']:8.1f} MB rss"
+                    )
+
+    record_run(args.history, args.label, results)
+    if not args.work_dir:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def cmd_compare(args):
+    runs = load_history(args.history)
+    if len(runs) < 2 and args.base == "-2":
+        print("[✗] Need at least two runs in history to compare.")
+        return 1
+    base = pick_run(runs, args.base)
+    head = pick_run(runs, args.head)
+    base_cases = {r["case"]: r for r in base["results"] if "error" not in r}
+    print(f"[>] Base {base['run_id']} ({base.get('git_commit')})  ->  head {head['run_id']} ({head.get('git_commit')})")
+
+    regressions = 0
+    for result in head["results"]:
+        case = result["case"]
+        if "error" in result:
+            print(f"  [✗] {case:48s} error: {result['error']}")
+            regressions += 1
+            continue
+        before = base_cases.get(case)
+        if before is None:
+            print(f"  [ ] {case:48s} {result['wall_s']:8.3f}s (new)")
+            continue
+        time_ratio = result["wall_s"] / max(before["wall_s"], 1e-9)
+        mem_ratio = result["peak_rss_mb"] / max(before["peak_rss_mb"], 1e-9)
+        flagged = time_ratio > 1 + args.threshold or mem_ratio > 1 + args.threshold
+        regressions += int(flagged)
+        marker = "!" if flagged else "✓"
+        print(
+            f"  [{marker}] {case:48s} {before['wall_s']:8.3f}s -> {result['wall_s']:8.3f}s "
+            f"({(time_ratio - 1) * 100:+6.1f}%)  rss {before['peak_rss_mb']:7.1f} -> "
+            f"{result['peak_rss_mb']:7.1f} MB ({(mem_ratio - 1) * 100:+6.1f}%)"
+        )
+    if regressions:
+        print(f"[!] {regressions} regression(s) above {args.threshold:.0%}.")
+        return 1
+    print("[✓] No regressions.")
+    return 0
+
+
+def main():
+    args = parse_args()
+    if args.command == "run":
+        cmd_run(args)
+        return 0
+    if args.command == "extract":
+        return cmd_extract(args) or 0
+    if args.command == "startup":
+        return cmd_startup(args) or 0
+    return cmd_compare(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
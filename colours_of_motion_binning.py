@@ -0,0 +1,79 @@
+import math
+from functools import lru_cache
+
+from colours_of_motion_lazy import lazy_import
+
+np = lazy_import("numpy")
+
+# === CONFIGURATION ===
+SRGB_KNEE = 0.04045        # sRGB transfer: linear segment below this encoded value...
+LINEAR_KNEE = 0.0031308    # ...and below this linear value
+SRGB_GAMMA = 2.4
+
+
+# === sRGB <-> LINEAR LIGHT ===
+@lru_cache(maxsize=1)
+def _linear_lut():
+    v = np.arange(256, dtype=np.float64) / 255.0
+    return np.where(v <= SRGB_KNEE, v / 12.92, ((v + 0.055) / 1.055) ** SRGB_GAMMA)
+
+
+def srgb_to_linear(values):
+    """Linear-light intensity (0..1) of sRGB channel values in 0..255 (a table lookup for uint8)."""
+    values = np.asarray(values)
+    if values.dtype == np.uint8:
+        return _linear_lut()[values]
+    v = values.astype(np.float64) / 255.0
+    return np.where(v <= SRGB_KNEE, v / 12.92, ((v + 0.055) / 1.055) ** SRGB_GAMMA)
+
+
+def linear_to_srgb(values):
+    """sRGB channel values (float, 0..255) of linear-light intensities in 0..1."""
+    v = np.clip(np.asarray(values, dtype=np.float64), 0.0, 1.0)
+    return 255.0 * np.where(v <= LINEAR_KNEE, v * 12.92, 1.055 * v ** (1.0 / SRGB_GAMMA) - 0.055)
+
+
+# === BINNING ===
+def area_average(values, n_bins):
+    """Area-average values along axis 0 onto n_bins equal bins so every element contributes.
+
+    Elements are treated as equal-length spans; each bin takes the mean of the spans it
+    covers (an element straddling two bins is split between them). Works for any trailing
+    shape, shrinking or stretching, in O(len + n_bins) per trailing element.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = values.shape[0]
+    cumulative = np.concatenate([np.zeros((1,) + values.shape[1:]), np.cumsum(values, axis=0)])
+    edges = np.linspace(0.0, n, num=n_bins + 1)
+    whole = np.minimum(edges.astype(np.int64), n - 1)
+    frac = (edges - whole).reshape((-1,) + (1,) * (values.ndim - 1))
+    integral = cumulative[whole] + frac * (cumulative[whole + 1] - cumulative[whole])
+    widths = np.diff(edges).reshape((-1,) + (1,) * (values.ndim - 1))
+    return np.diff(integral, axis=0) / widths
+
+
+def bin_colours(colours, n_bins):
+    """Mean colour of n_bins equal spans of the colours (0..255, any channel order), in linear light.
+
+    Averaging encoded sRGB values darkens mixes of bright and dark frames; averaging
+    the light itself keeps a bin as bright as the frames it stands for.
+    """
+    return linear_to_srgb(area_average(srgb_to_linear(colours), n_bins))
+
+
+def fit_colours(colours, max_bins):
+    """At most max_bins uint8 colours: unchanged when they already fit, else binned in linear light.
+
+    Builders call this with the number of distinct positions the output can show, so
+    their cost follows the output size rather than the frame count (a 24 fps analysis
+    of a feature is ~250k frames).
+    """
+    colours = np.asarray(colours)
+    if len(colours) <= max_bins:
+        return colours.astype(np.uint8, copy=False)
+    return (bin_colours(colours, max_bins) + 0.5).astype(np.uint8)
+
+
+def ring_bins(diameter):
+    """Pixels around the outside of a circle of this diameter: the most slices it can show."""
+    return max(1, math.ceil(math.pi * diameter))
@@ -1,8 +1,19 @@
 import os
 import json
-import numpy as np
-from PIL import Image, ImageDraw
 import argparse
+from functools import lru_cache
+
+from colours_of_motion_binning import fit_colours, ring_bins
+from colours_of_motion_lazy import lazy_import
+from colours_of_motion_manifest import picker_note
+from colours_of_motion_png import PALETTE_MODES, save_png
+from colours_of_motion_preview import PREVIEW_SIZE, add_preview_args, preview_path, render_progressive
+from colours_of_motion_profile import add_profile_args, stage, start_profiling
+from colours_of_motion_vector import SEAM_OVERLAP, VectorDrawing, add_vector_args, colour_runs, save_vector
+
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+ImageDraw = lazy_import("PIL.ImageDraw")
 
 FRAME_ROOT = "frames"
 OUTPUT_ROOT = "outputs"
@@ -17,6 +28,15 @@ def parse_args():
         action="store_true",
         help="Render higher-resolution, anti-aliased output.",
     )
+    parser.add_argument(
+        "--png-palette",
+        choices=PALETTE_MODES,
+        default="auto",
+        help="Indexed PNG output: auto (only when lossless), quantize (lossy within a bound) or off.",
+    )
+    add_preview_args(parser)
+    add_vector_args(parser)
+    add_profile_args(parser)
     return parser.parse_args()
 
 def select_folder(root):
@@ -26,7 +46,7 @@ def select_folder(root):
         print("No processed folders found.")
         return None
     for i, folder in enumerate(folders, 1):
-        print(f"{i}: {folder}")
+        print(f"{i}: {folder}{picker_note(os.path.join(root, folder))}")
     choice = input("Select folder: ").strip()
     if not choice.isdigit():
         print("[✗] Invalid selection.")
@@ -43,11 +63,12 @@ def build_circle_image(
     resolution=HQ_RESOLUTION,
     inner_radius_ratio=0.25,
     supersample=SUPERSAMPLE,
+    palette="auto",
 ):
     """Create a full circular image based on frame colours."""
-    with open(metadata_path, 'r') as f:
+    with stage("circle.load_metadata"), open(metadata_path, 'r') as f:
         data = json.load(f)
-    
+
     colours = [tuple(frame["color"]) for frame in data]
     n_frames = len(colours)
     if n_frames == 0:
@@ -55,34 +76,155 @@ def build_circle_image(
         return
     print(f"[>] Building full circle with {n_frames} frames")
 
-    render_size = max(1, int(resolution * supersample))
-    # Render larger then downsample for smoother edges.
-    img = Image.new("RGB", (render_size, render_size), "white")
-    draw = ImageDraw.Draw(img)
-    center = render_size // 2
-    outer_radius = render_size // 2
-    inner_radius = int(outer_radius * inner_radius_ratio)
-
-    # Draw each slice
-    for i, color in enumerate(colours):
-        start_angle = (i / n_frames) * 360
-        end_angle = ((i + 1) / n_frames) * 360
-        draw.pieslice([center - outer_radius, center - outer_radius,
-                       center + outer_radius, center + outer_radius],
-                      start=start_angle, end=end_angle, fill=color, outline=None)
-
-    # Draw white circle in center (donut effect)
-    draw.ellipse([center - inner_radius, center - inner_radius,
-                  center + inner_radius, center + inner_radius], fill="white")
-
-    if supersample > 1:
-        img = img.resize((resolution, resolution), Image.LANCZOS)
-
-    img.save(output_path, "PNG", optimize=False, compress_level=1)
+    img = render_circle_image(colours, resolution, inner_radius_ratio, supersample)
+    save_png(img, output_path, palette=palette)
     print(f"[✓] Saved full circle image: {output_path}")
 
+def render_circle_image(colours, resolution, inner_radius_ratio=0.25, supersample=SUPERSAMPLE):
+    """Draw one pie slice per frame colour and return the anti-aliased PIL image.
+
+    Frames beyond what the supersampled rim can show are binned first (in linear light),
+    so no sub-pixel slices are drawn.
+    """
+    colours = fit_colours(colours, ring_bins(max(1, int(resolution * supersample))))
+    canvas = CircleCanvas(len(colours), resolution, inner_radius_ratio, supersample)
+    with stage("circle.pieslice", items=len(colours)):
+        canvas.draw(0, colours)
+    return canvas.finish()
+
+class CircleCanvas:
+    """Supersampled pie-slice canvas for a known frame count, painted in any number of steps.
+
+    A slice only depends on its own colour and the frame count, so slices can be
+    drawn as frames arrive; finish() adds the centre and downsamples.
+    """
+
+    def __init__(self, n_frames, resolution, inner_radius_ratio=0.25, supersample=SUPERSAMPLE):
+        self.n_frames = n_frames
+        self.resolution = resolution
+        self.inner_radius_ratio = inner_radius_ratio
+        self.supersample = supersample
+        render_size = max(1, int(resolution * supersample))
+        # Render larger then downsample for smoother edges.
+        self.image = Image.new("RGB", (render_size, render_size), "white")
+        self._draw = ImageDraw.Draw(self.image)
+        self.drawn = 0
+
+    def draw(self, start, colours):
+        """Draw the slices of frames start, start + 1, ... with the given colours."""
+        center = self.image.size[0] // 2
+        outer_radius = self.image.size[0] // 2
+        for i, color in enumerate(colours, start):
+            start_angle = (i / self.n_frames) * 360
+            end_angle = ((i + 1) / self.n_frames) * 360
+            self._draw.pieslice([center - outer_radius, center - outer_radius,
+                                 center + outer_radius, center + outer_radius],
+                                start=start_angle, end=end_angle,
+                                fill=tuple(int(c) for c in color), outline=None)
+        self.drawn = max(self.drawn, start + len(colours))
+
+    def finish(self):
+        """Return the anti-aliased image with the centre cut out."""
+        img = self.image
+        center = img.size[0] // 2
+        inner_radius = int((img.size[0] // 2) * self.inner_radius_ratio)
+        # Draw white circle in center (donut effect)
+        self._draw.ellipse([center - inner_radius, center - inner_radius,
+                            center + inner_radius, center + inner_radius], fill="white")
+
+        if self.supersample > 1:
+            with stage("circle.resize"):
+                img = img.resize((self.resolution, self.resolution), Image.LANCZOS)
+        return img
+
+def _circle_band(resolution, inner_radius_ratio, start, stop):
+    """Angle (as a fraction of a turn) and ring mask for rows start..stop of the circle."""
+    coords = np.arange(resolution, dtype=np.float32) + 0.5 - resolution / 2.0
+    dx = coords[None, :]
+    dy = coords[start:stop, None]
+    radius = np.hypot(dx, dy)
+    turn = (np.degrees(np.arctan2(dy, dx)) % 360.0) / 360.0
+    outer_radius = resolution / 2.0
+    ring = (radius <= outer_radius) & (radius >= outer_radius * inner_radius_ratio)
+    return turn, ring
+
+@lru_cache(maxsize=4)
+def circle_geometry(resolution, inner_radius_ratio=0.25):
+    """Per-pixel angle (as a fraction of a turn) and ring mask, reused across films."""
+    turn, ring = _circle_band(resolution, inner_radius_ratio, 0, resolution)
+    turn.setflags(write=False)
+    ring.setflags(write=False)
+    return turn, ring
+
+def render_circle_array(colours, resolution, inner_radius_ratio=0.25):
+    """Vectorised circle: every ring pixel takes the colour of the frame at its angle.
+
+    Angles follow PIL's pieslice convention (0 degrees at 3 o'clock, clockwise), so the
+    result matches build_circle_image without its supersampled anti-aliasing.
+    """
+    colours = fit_colours(colours, ring_bins(resolution))
+    n_frames = len(colours)
+    turn, ring = circle_geometry(resolution, inner_radius_ratio)
+    index = np.minimum((turn * n_frames).astype(np.int32), n_frames - 1)
+    image = np.full((resolution, resolution, 3), 255, dtype=np.uint8)
+    image[ring] = colours[index[ring]]
+    return image
+
+def iter_circle_rows(colours, resolution, inner_radius_ratio=0.25, chunk_rows=128, supersample=SUPERSAMPLE):
+    """Yield (start_row, rows) bands of the circle without holding the full image.
+
+    Each band is rendered at supersample x and box-filtered down, so edges are
+    anti-aliased like build_circle_image while memory stays at one band.
+    """
+    size = resolution * supersample
+    colours = fit_colours(colours, ring_bins(size))
+    n_frames = len(colours)
+    for start in range(0, resolution, chunk_rows):
+        stop = min(resolution, start + chunk_rows)
+        turn, ring = _circle_band(size, inner_radius_ratio, start * supersample, stop * supersample)
+        index = np.minimum((turn * n_frames).astype(np.int32), n_frames - 1)
+        band = np.where(ring[:, :, None], colours[index], np.uint8(255)).astype(np.uint16)
+        band = band.reshape(stop - start, supersample, resolution, supersample, 3).sum(axis=(1, 3))
+        samples = supersample * supersample
+        yield start, ((band + samples // 2) // samples).astype(np.uint8)
+
+def circle_drawing(colours, resolution, inner_radius_ratio=0.25, background=(255, 255, 255)):
+    """Vector circle: one annular wedge per run of equal frame colours, pieslice angles."""
+    colours = fit_colours(colours, ring_bins(resolution))
+    n_frames = len(colours)
+    drawing = VectorDrawing(resolution, resolution, background)
+    centre = resolution / 2.0
+    for start, stop, colour in colour_runs(colours):
+        end = stop / n_frames + (SEAM_OVERLAP if stop < n_frames else 0.0)
+        drawing.wedge(centre, centre, centre * inner_radius_ratio, centre, start / n_frames, end, colour)
+    return drawing
+
+def build_circle_vector(metadata_path, output_path, fmt, resolution=HQ_RESOLUTION, inner_radius_ratio=0.25):
+    """Write circle_full as SVG/PDF; resolution only sets the nominal page size."""
+    with open(metadata_path, 'r') as f:
+        data = json.load(f)
+    if not data:
+        print("[✗] Metadata is empty. Nothing to render.")
+        return
+    with stage("circle.vector", items=len(data)):
+        drawing = circle_drawing([frame["color"] for frame in data], resolution, inner_radius_ratio)
+        save_vector(drawing, output_path, fmt)
+
+def build_circle_preview(metadata_path, output_path, resolution=PREVIEW_SIZE, palette="auto"):
+    """Fast screen-resolution circle straight from data.json (no pieslice, no supersampling)."""
+    with open(metadata_path, 'r') as f:
+        data = json.load(f)
+    if not data:
+        print("[✗] Metadata is empty. Nothing to render.")
+        return
+    with stage("circle.preview", items=len(data)):
+        image = render_circle_array([frame["color"] for frame in data], resolution)
+    save_png(image, output_path, palette=palette)
+    print(f"[✓] Saved circle preview: {output_path}")
+
 def main():
     args = parse_args()
+    start_profiling(args, "circle")
     folder = select_folder(FRAME_ROOT)
     if not folder:
         return
@@ -97,7 +239,20 @@ def main():
     output_path = os.path.join(output_dir, "circle_full.png")
     
     resolution = HQ_RESOLUTION if args.poster_mode else QUICK_RESOLUTION
-    build_circle_image(metadata_path, output_path, resolution=resolution)
+    if args.vector:
+        build_circle_vector(metadata_path, output_path, args.vector, resolution=resolution)
+        return
+    if args.preview:
+        build_circle_preview(metadata_path, preview_path(output_path), palette=args.png_palette)
+        return
+    if args.progressive:
+        refine = render_progressive(
+            lambda: build_circle_preview(metadata_path, preview_path(output_path), palette=args.png_palette),
+            lambda: build_circle_image(metadata_path, output_path, resolution=resolution, palette=args.png_palette),
+        )
+        refine.join()
+        return
+    build_circle_image(metadata_path, output_path, resolution=resolution, palette=args.png_palette)
 
 if __name__ == "__main__":
     main()
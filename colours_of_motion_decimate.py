@@ -0,0 +1,275 @@
+import argparse
+import json
+import math
+import os
+import shutil
+
+import colours_of_motion_processing as processing
+from colours_of_motion_lazy import lazy_import
+from colours_of_motion_manifest import begin_dataset, picker_note, record_extraction
+from colours_of_motion_profile import add_profile_args, stage, start_profiling
+from colours_of_motion_tonemap import EXTRACTION_FILE
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+# === CONFIGURATION ===
+FRAME_ROOT = processing.FRAME_ROOT
+CIRCLE_ROOT = processing.CIRCLE_ROOT
+EXPERIMENTAL_SUFFIX = "_experimental"
+METHODS = ("pick", "average")
+MAX_WORKERS = os.cpu_count() or 4
+
+# Sampling profile -> (root, folder suffix, fps, dataset kind). Every profile lands in
+# the folder layout its renderers already read.
+PROFILES = {
+    "standard": (FRAME_ROOT, "", processing.FPS_STANDARD, "frames"),
+    "experimental": (FRAME_ROOT, EXPERIMENTAL_SUFFIX, 1, "frames"),
+    "circle": (CIRCLE_ROOT, "", processing.FPS_CIRCLE, "strips"),
+}
+MASTER_PROFILE = "experimental"   # Highest rate any profile needs; extracted once
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Derive lower-rate frame sets, data.json and circle strips from one high-rate extraction."
+    )
+    parser.add_argument(
+        "--folder",
+        default=None,
+        help="Film folder name (without suffix). If omitted, prompts for selection.",
+    )
+    parser.add_argument(
+        "--sampling",
+        choices=sorted(PROFILES),
+        action="append",
+        default=None,
+        help="Sampling profile to derive (repeatable; default: every profile except the master).",
+    )
+    parser.add_argument(
+        "--method",
+        choices=METHODS,
+        default="pick",
+        help="pick: keep the sample at each target time (what a direct ffmpeg fps= run keeps); "
+        "average: average every master sample in the target interval.",
+    )
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="Worker processes for strips.")
+    add_profile_args(parser)
+    return parser.parse_args()
+
+
+def profile_dir(profile, folder):
+    root, suffix, _, _ = PROFILES[profile]
+    return os.path.join(root, f"{folder}{suffix}")
+
+
+def select_folder():
+    """Films with a master extraction, listed by base name."""
+    master_root, suffix, _, _ = PROFILES[MASTER_PROFILE]
+    folders = sorted(
+        f[:len(f) - len(suffix)] if suffix else f
+        for f in os.listdir(master_root)
+        if f.endswith(suffix) and os.path.isdir(os.path.join(master_root, f))
+    )
+    if not folders:
+        raise FileNotFoundError(f"No {MASTER_PROFILE} extractions found in {master_root}")
+
+    print("Available films:")
+    for i, folder in enumerate(folders, start=1):
+        print(f"  {i}. {folder}{picker_note(profile_dir(MASTER_PROFILE, folder))}")
+    choice = input("Select folder number: ").strip()
+    if not choice.isdigit():
+        raise ValueError("Invalid folder selection.")
+    idx = int(choice) - 1
+    if idx < 0 or idx >= len(folders):
+        raise ValueError("Invalid folder selection.")
+    return folders[idx]
+
+
+# === DECIMATION ===
+def decimation_windows(n_master, master_fps, target_fps):
+    """(start, stop) master indices for every target sample.
+
+    Target sample k sits at k / target_fps seconds, which is master sample
+    k * master_fps / target_fps; ffmpeg's fps filter keeps exactly that frame, so
+    the window start is the frame a direct extraction would have produced. The
+    window runs up to the next target sample.
+    """
+    if target_fps > master_fps:
+        raise ValueError(f"Cannot derive {target_fps} fps from a {master_fps} fps extraction")
+    ratio = master_fps / target_fps
+    n_target = max(1, math.ceil(n_master / ratio - 1e-9))
+    starts = [min(n_master - 1, round(k * ratio)) for k in range(n_target + 1)]
+    starts[-1] = n_master
+    return [(starts[k], max(starts[k] + 1, starts[k + 1])) for k in range(n_target)]
+
+
+def _average_entry(entries):
+    """data.json entry for the mean of equal-sized frames: the mean of their mean colours."""
+    colour = np.mean([entry["color"] for entry in entries], axis=0)
+    brightness = (0.299 * colour[0]) + (0.587 * colour[1]) + (0.114 * colour[2])
+    max_c, min_c = np.max(colour), np.min(colour)
+    return {
+        "color": [int(colour[0]), int(colour[1]), int(colour[2])],
+        "brightness": float(brightness),
+        "saturation": float((max_c - min_c) / (max_c + 1e-5)),
+    }
+
+
+def _clear_dataset(directory, prefix):
+    for name in os.listdir(directory):
+        if name.startswith(prefix):
+            os.remove(os.path.join(directory, name))
+
+
+def _link_or_copy(src, dst):
+    try:
+        os.link(src, dst)
+    except OSError:
+        # Different filesystem or no hard-link support.
+        shutil.copy2(src, dst)
+
+
+def derive_frames(master_dir, master_meta, out_dir, windows, fps, method="pick"):
+    """Frame set + data.json: sampled frames are hard links into the master, nothing is decoded."""
+    os.makedirs(out_dir, exist_ok=True)
+    _clear_dataset(out_dir, "frame_")
+    metadata = []
+    with stage("decimate.frames", items=len(windows)):
+        for k, (start, stop) in enumerate(windows, 1):
+            name = f"frame_{k:04d}.jpg"
+            _link_or_copy(os.path.join(master_dir, master_meta[start]["frame"]), os.path.join(out_dir, name))
+            if method == "average":
+                entry = {"frame": name, **_average_entry(master_meta[start:stop])}
+            else:
+                entry = {**master_meta[start], "frame": name}
+            metadata.append(entry)
+    processing.save_metadata(metadata, out_dir)
+    derive_cuts(master_dir, out_dir, fps)
+
+
+def derive_cuts(master_dir, out_dir, fps):
+    """Cut timestamps do not depend on the sampling rate; only sample_fps changes."""
+    master_cuts = os.path.join(master_dir, processing.CUTS_FILE)
+    if not os.path.exists(master_cuts):
+        return
+    with open(master_cuts, 'r') as f:
+        cuts = json.load(f)
+    cuts["sample_fps"] = fps
+    with open(os.path.join(out_dir, processing.CUTS_FILE), 'w') as f:
+        json.dump(cuts, f, indent=2)
+
+
+def derive_extraction_info(master_dir, out_dir, fps, method, kind):
+    """Carry the master's extraction record (tone-map chain etc.) over to a derived set."""
+    master_info = os.path.join(master_dir, EXTRACTION_FILE)
+    info = {}
+    if os.path.exists(master_info):
+        with open(master_info, 'r') as f:
+            info = json.load(f)
+    info["derived_from"] = {"folder": os.path.basename(master_dir), "sample_fps": info.get("sample_fps")}
+    info["sample_fps"] = fps
+    info["decimation"] = method
+    if kind == "strips":
+        info["strip_height"] = processing.STRIP_HEIGHT
+    if os.path.exists(master_info):
+        with open(os.path.join(out_dir, EXTRACTION_FILE), 'w') as f:
+            json.dump(info, f, indent=2)
+    record_extraction(out_dir, info)
+
+
+def _strip(path, strip_height):
+    """1 x strip_height area average of a frame (what ffmpeg scale=1:H produces)."""
+    img = cv2.imread(path, cv2.IMREAD_REDUCED_COLOR_4)
+    if img is None:
+        img = cv2.imread(path, cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError(f"Could not read frame: {path}")
+    return cv2.resize(img, (1, strip_height), interpolation=cv2.INTER_AREA).astype(np.float32)
+
+
+def _write_strips(jobs, strip_height):
+    for out_path, paths in jobs:
+        strip = np.mean([_strip(path, strip_height) for path in paths], axis=0)
+        cv2.imwrite(out_path, (strip + 0.5).astype(np.uint8))
+    return len(jobs)
+
+
+def derive_strips(master_dir, master_meta, out_dir, windows, method="pick",
+                  strip_height=processing.STRIP_HEIGHT, workers=MAX_WORKERS, batch=256):
+    """Circle strips from the master frames, area-averaged down to one column."""
+    os.makedirs(out_dir, exist_ok=True)
+    _clear_dataset(out_dir, "strip_")
+    jobs = []
+    for k, (start, stop) in enumerate(windows, 1):
+        picked = master_meta[start:stop] if method == "average" else master_meta[start:start + 1]
+        jobs.append((
+            os.path.join(out_dir, f"strip_{k:04d}.png"),
+            [os.path.join(master_dir, entry["frame"]) for entry in picked],
+        ))
+    batches = [jobs[i:i + batch] for i in range(0, len(jobs), batch)]
+    from concurrent.futures import ProcessPoolExecutor
+
+    with stage("decimate.strips", items=len(jobs)):
+        if workers <= 1:
+            for chunk in batches:
+                _write_strips(chunk, strip_height)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                done = 0
+                for written in pool.map(_write_strips, batches, [strip_height] * len(batches)):
+                    done += written
+                    print(f"  Wrote {done}/{len(jobs)} strips...")
+
+
+def load_master(folder):
+    """Master frame directory and its data.json, building the metadata if it is missing."""
+    master_dir = profile_dir(MASTER_PROFILE, folder)
+    data_file = os.path.join(master_dir, "data.json")
+    if not os.path.isdir(master_dir):
+        raise FileNotFoundError(f"No {MASTER_PROFILE} extraction in {master_dir}")
+    if not os.path.exists(data_file):
+        processing.save_metadata(processing.build_metadata(master_dir), master_dir)
+    with open(data_file, 'r') as f:
+        master_meta = json.load(f)
+    if not master_meta:
+        raise ValueError(f"data.json is empty in {master_dir}")
+    return master_dir, master_meta
+
+
+def derive_profiles(folder, profiles=None, method="pick", workers=MAX_WORKERS):
+    """Derive every requested profile of a film from its master extraction."""
+    master_dir, master_meta = load_master(folder)
+    master_fps = PROFILES[MASTER_PROFILE][2]
+    for profile in profiles or [p for p in PROFILES if p != MASTER_PROFILE]:
+        if profile == MASTER_PROFILE:
+            continue
+        _, _, fps, kind = PROFILES[profile]
+        out_dir = profile_dir(profile, folder)
+        os.makedirs(out_dir, exist_ok=True)
+        begin_dataset(out_dir)
+        windows = decimation_windows(len(master_meta), master_fps, fps)
+        print(f"[>] Deriving {profile} ({fps} fps, {len(windows)} {kind}) from {len(master_meta)} "
+              f"{MASTER_PROFILE} frames: {out_dir}")
+        if kind == "strips":
+            derive_strips(master_dir, master_meta, out_dir, windows, method, workers=workers)
+        else:
+            derive_frames(master_dir, master_meta, out_dir, windows, fps, method)
+        derive_extraction_info(master_dir, out_dir, fps, method, kind)
+        print(f"[✓] Derived {profile}: {out_dir}")
+
+
+def main():
+    args = parse_args()
+    start_profiling(args, "decimate")
+    folder = args.folder or select_folder()
+    if folder.endswith(EXPERIMENTAL_SUFFIX):
+        folder = folder[:-len(EXPERIMENTAL_SUFFIX)]
+    try:
+        derive_profiles(folder, args.sampling, args.method, args.workers)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"[✗] {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,23 @@
 import os
-import cv2
-import numpy as np
-from PIL import Image
 import argparse
 
+from colours_of_motion_binning import fit_colours
+from colours_of_motion_lazy import lazy_import
+from colours_of_motion_manifest import dataset_files, picker_note
+from colours_of_motion_png import save_png
+from colours_of_motion_preview import PREVIEW_SIZE, add_preview_args, preview_path, render_progressive
+from colours_of_motion_profile import add_profile_args, stage, start_profiling
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+
 # === CONFIGURATION ===
 CIRCLE_ROOT = "circle_data"
 OUTPUT_ROOT = "outputs"
 QUICK_RESOLUTION = 4000
 HQ_RESOLUTION = 6000
+BIN_ROWS = 8              # Strip rows binned per block to bound float temporaries
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Generate donut poster Colours of Motion output.")
@@ -17,33 +26,54 @@ def parse_args():
         action="store_true",
         help="Render higher-resolution donut poster.",
     )
+    add_preview_args(parser)
+    add_profile_args(parser)
     return parser.parse_args()
 
 def list_movie_folders(base_dir):
     """List available processed movie folders."""
     return [f for f in os.listdir(base_dir) if os.path.isdir(os.path.join(base_dir, f))]
 
-def build_donut_poster(input_dir, output_path, resolution=HQ_RESOLUTION):
-    """Builds a full circle 'donut poster' from 1px strips."""
+def build_donut_poster(input_dir, output_path, resolution=HQ_RESOLUTION, max_strips=None):
+    """Builds a full circle 'donut poster' from 1px strips.
+
+    max_strips loads only that many evenly spaced strips (used for previews, where
+    the timeline is downsampled to a few hundred pixels anyway).
+    """
     print(f"[>] Building donut poster from {input_dir}")
+    base_img = load_strip_timeline(input_dir, max_strips)
+    donut_rotated = render_donut(base_img, resolution)
+
+    # Save result
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    save_png(donut_rotated, output_path, bgr=True)
+    print(f"[✓] Saved donut poster: {output_path}")
 
+def load_strip_timeline(input_dir, max_strips=None):
+    """Stack the colour column of every strip into a (height x strips) timeline image."""
     # Collect strips
-    strips = sorted(
-        [os.path.join(input_dir, f) for f in os.listdir(input_dir) if f.endswith('.png')]
-    )
+    names = dataset_files(input_dir)
+    if names is None:
+        names = sorted(f for f in os.listdir(input_dir) if f.endswith('.png'))
+    strips = [os.path.join(input_dir, f) for f in names]
     if not strips:
         raise ValueError("No strip images found in folder!")
 
     print(f"[>] Found {len(strips)} strips")
+    if max_strips and len(strips) > max_strips:
+        keep = np.linspace(0, len(strips) - 1, num=max_strips).round().astype(int)
+        strips = [strips[i] for i in keep]
+        print(f"[>] Sampling {len(strips)} strips for preview")
 
     # Load strips into a list
     frames = []
-    for i, file in enumerate(strips, 1):
-        img = Image.open(file).convert('RGB')
-        np_img = np.array(img)
-        frames.append(np_img[:, 0, :])  # Extract color column
-        if i % 1000 == 0:
-            print(f"  Loaded {i} strips...")
+    with stage("donut.load_strips", items=len(strips)):
+        for i, file in enumerate(strips, 1):
+            img = Image.open(file).convert('RGB')
+            np_img = np.array(img)
+            frames.append(np_img[:, 0, :])  # Extract color column
+            if i % 1000 == 0:
+                print(f"  Loaded {i} strips...")
 
     # Convert list to array (num_strips x height x 3)
     frame_array = np.stack(frames, axis=0)
@@ -52,38 +82,44 @@ def build_donut_poster(input_dir, output_path, resolution=HQ_RESOLUTION):
     height = frame_array.shape[1]
     num_strips = frame_array.shape[0]
     print(f"[>] Creating base timeline image: {num_strips}x{height}")
-    base_img = np.zeros((height, num_strips, 3), dtype=np.uint8)
-    for i in range(num_strips):
-        base_img[:, i, :] = frame_array[i]
+    return np.ascontiguousarray(frame_array.transpose(1, 0, 2))
 
+def render_donut(base_img, resolution):
+    """Warp a timeline image into the donut, start of the film at 12 o'clock."""
+    # More strips than output columns: bin the time axis in linear light first.
+    if base_img.shape[1] > resolution:
+        binned = np.empty((base_img.shape[0], resolution, 3), dtype=np.uint8)
+        with stage("donut.bin", items=base_img.shape[1]):
+            for start in range(0, base_img.shape[0], BIN_ROWS):
+                rows = base_img[start:start + BIN_ROWS].transpose(1, 0, 2)
+                binned[start:start + BIN_ROWS] = fit_colours(rows, resolution).transpose(1, 0, 2)
+        base_img = binned
     # Resize to final resolution x radius
     # Use area downsampling when shrinking to reduce aliasing.
-    if base_img.shape[1] > resolution:
+    if base_img.shape[0] > resolution // 2:
         interp = cv2.INTER_AREA
     else:
         interp = cv2.INTER_CUBIC
-    base_img_resized = cv2.resize(base_img, (resolution, resolution // 2), interpolation=interp)
+    with stage("donut.resize"):
+        base_img_resized = cv2.resize(base_img, (resolution, resolution // 2), interpolation=interp)
 
     # Warp to polar coordinates (full circle)
     print("[>] Transforming to circular donut poster...")
-    donut = cv2.warpPolar(
-        base_img_resized,
-        (resolution, resolution),
-        (resolution // 2, resolution // 2),
-        resolution // 2,
-        cv2.WARP_FILL_OUTLIERS + cv2.WARP_POLAR_LINEAR
-    )
+    with stage("donut.warp_polar"):
+        donut = cv2.warpPolar(
+            base_img_resized,
+            (resolution, resolution),
+            (resolution // 2, resolution // 2),
+            resolution // 2,
+            cv2.WARP_FILL_OUTLIERS + cv2.WARP_POLAR_LINEAR
+        )
 
     # Rotate so start of movie is at 12 o'clock
-    donut_rotated = np.rot90(donut, k=3)
-
-    # Save result
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    cv2.imwrite(output_path, donut_rotated, [cv2.IMWRITE_PNG_COMPRESSION, 1])
-    print(f"[✓] Saved donut poster: {output_path}")
+    return np.rot90(donut, k=3)
 
 def main():
     args = parse_args()
+    start_profiling(args, "donut")
     # List available movies
     movies = list_movie_folders(CIRCLE_ROOT)
     if not movies:
@@ -92,7 +128,7 @@ def main():
 
     print("Available movies:")
     for idx, movie in enumerate(movies, 1):
-        print(f"  {idx}. {movie}")
+        print(f"  {idx}. {movie}{picker_note(os.path.join(CIRCLE_ROOT, movie))}")
 
     choice = input("Select a movie number: ").strip()
     if not choice.isdigit() or int(choice) < 1 or int(choice) > len(movies):
@@ -106,6 +142,16 @@ def main():
     output_path = os.path.join(output_dir, "circle_donut_poster.png")
 
     resolution = HQ_RESOLUTION if args.poster_mode else QUICK_RESOLUTION
+
+    def build_preview():
+        build_donut_poster(input_dir, preview_path(output_path), PREVIEW_SIZE, max_strips=PREVIEW_SIZE)
+
+    if args.preview:
+        build_preview()
+        return
+    if args.progressive:
+        render_progressive(build_preview, lambda: build_donut_poster(input_dir, output_path, resolution)).join()
+        return
     build_donut_poster(input_dir, output_path, resolution)
 
 if __name__ == "__main__":
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+import subprocess
+
+# === CONFIGURATION ===
+CHUNK_BYTES = 1 << 20                          # Bytes hashed at each sample point
+CHUNK_POSITIONS = (0.0, 0.25, 0.5, 0.75, 1.0)  # Sample points as fractions of the file (1.0 = last chunk)
+STREAM_ENTRIES = (
+    "stream=index,codec_type,codec_name,profile,width,height,pix_fmt,r_frame_rate,"
+    "sample_rate,channels:format=duration,bit_rate"
+)
+
+
+# === FINGERPRINT ===
+def sample_ranges(size, chunk=CHUNK_BYTES):
+    """(offset, length) of each sampled chunk; files smaller than all the chunks are read whole."""
+    if size <= chunk * len(CHUNK_POSITIONS):
+        return [(0, size)]
+    last = size - chunk
+    return [(int(last * position), chunk) for position in CHUNK_POSITIONS]
+
+
+def stream_summary(path):
+    """Container duration and per-stream codec layout from ffprobe, or None when it cannot read the file."""
+    cmd = ["ffprobe", "-v", "error", "-show_entries", STREAM_ENTRIES, "-of", "json", path]
+    try:
+        result = subprocess.run(cmd, check=True, capture_output=True, text=True)
+        probed = json.loads(result.stdout)
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        return None
+    return {"streams": probed.get("streams") or [], "format": probed.get("format") or {}}
+
+
+def source_fingerprint(path, chunk=CHUNK_BYTES, probe=True):
+    """Identify a video by content in milliseconds, whatever its name or location.
+
+    Hashes the size, five 1 MiB chunks at fixed fractions of the file and (when ffprobe
+    can read it) the stream layout, so a 60 GB remux costs 5 MiB of reads and one probe.
+    Raises OSError if the file cannot be read.
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.sha256(f"size={size}".encode("ascii"))
+    with open(path, "rb") as f:
+        for offset, length in sample_ranges(size, chunk):
+            f.seek(offset)
+            digest.update(f.read(length))
+    summary = stream_summary(path) if probe else None
+    if summary is not None:
+        digest.update(json.dumps(summary, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+# === PROCESSED-FILES REGISTRY ===
+def load_registry(path):
+    """processed_files.json: {"sources": {fingerprint: {...}}, "last_video": {...}}; older path-keyed files load too."""
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            registry = json.load(f)
+    else:
+        registry = {}
+    registry.setdefault("sources", {})
+    return registry
+
+
+def save_registry(path, registry):
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(registry, f, indent=2)
+    os.replace(tmp, path)
+
+
+def registered_folder(registry, fingerprint, video_path=None):
+    """Folder this exact source was processed into, or None.
+
+    Registries written before fingerprints only know paths; a path match there is
+    trusted once (as before) and replaced by a fingerprint entry on the next save.
+    """
+    entry = registry["sources"].get(fingerprint)
+    if entry is not None:
+        return entry["folder"]
+    if video_path is None:
+        return None
+    last = registry.get("last_video") or {}
+    if "fingerprint" not in last and last.get("path") == video_path:
+        return last.get("folder")
+    legacy = registry.get(video_path)
+    return legacy if isinstance(legacy, str) else None
+
+
+def register_source(registry, fingerprint, video_path, folder):
+    """Record that `video_path` (identified by `fingerprint`) was processed into `folder`."""
+    registry.pop(video_path, None)
+    st = os.stat(video_path)
+    registry["sources"][fingerprint] = {
+        "folder": folder,
+        "path": os.path.abspath(video_path),
+        "size": st.st_size,
+    }
+    registry["last_video"] = {"path": video_path, "folder": folder, "fingerprint": fingerprint}
+    return registry
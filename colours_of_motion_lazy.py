@@ -0,0 +1,45 @@
+import importlib
+import importlib.util
+import os
+import sys
+
+# === CONFIGURATION ===
+EAGER_ENV = "COM_EAGER_IMPORTS"   # Set to 1 to import everything up front (debugging, startup benchmark)
+
+_pending = []   # Names bound lazily and not necessarily loaded yet
+
+
+def lazy_import(name):
+    """Return module `name`, deferring its execution until an attribute is first used.
+
+    NumPy, Pillow and OpenCV cost 50-150 ms each to import; scripts bind them at module
+    top with this so --help, interactive menus and metadata-only runs never pay for them.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    if os.environ.get(EAGER_ENV) == "1":
+        return importlib.import_module(name)
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    _pending.append(name)
+    if "." in name:
+        parent, _, child = name.rpartition(".")
+        setattr(sys.modules[parent], child, module)
+    return module
+
+
+def load_now():
+    """Finish loading every lazily imported module; call before starting worker threads.
+
+    LazyLoader is not thread-safe before Python 3.12: a second thread touching a module
+    while the first is still executing it sees a half-initialised module.
+    """
+    while _pending:
+        # Any attribute access runs the deferred import.
+        getattr(sys.modules[_pending.pop()], "__spec__")
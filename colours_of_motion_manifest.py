@@ -0,0 +1,476 @@
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+from colours_of_motion_fingerprint import source_fingerprint
+from colours_of_motion_profile import add_profile_args, stage, start_profiling
+
+try:
+    import fcntl
+except ImportError:   # Windows: no flock; only writers within one process are serialised
+    fcntl = None
+
+# === CONFIGURATION ===
+FRAME_ROOT = "frames"
+CIRCLE_ROOT = "circle_data"
+OUTPUT_ROOT = "outputs"
+MANIFEST_FILE = "manifest.json"          # outputs/<film>/manifest.json
+LOCK_SUFFIX = ".lock"                    # manifest.json.lock: flock'd by every writer, in any process
+MANIFEST_VERSION = 1
+EXPERIMENTAL_SUFFIX = "_experimental"
+EXTRACTION_FILE = "extraction.json"
+FILE_PATTERNS = {"frames": "frame_{:04d}.jpg", "strips": "strip_{:04d}.png"}
+HASH_CHUNK = 1 << 20
+
+# Dataset name -> (root, folder suffix, kind, nominal fps). standard/experimental/circle
+# match the sampling profiles in colours_of_motion_decimate.py; the fps is only used for
+# sets extracted before extraction.json existed.
+DATASETS = {
+    "standard": (FRAME_ROOT, "", "frames", 0.1),
+    "experimental": (FRAME_ROOT, EXPERIMENTAL_SUFFIX, "frames", 1),
+    "circle": (CIRCLE_ROOT, "", "strips", 1),
+    "circle_experimental": (CIRCLE_ROOT, EXPERIMENTAL_SUFFIX, "strips", 1),
+}
+
+# Manifests are rewritten from PNG writer threads as well as the main thread, and from
+# subprocesses (watch runs the poster render as one) through the sidecar lock file.
+_lock = threading.Lock()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Check, rebuild or verify the per-film manifests (outputs/<film>/manifest.json)."
+    )
+    parser.add_argument("--folder", default=None, help="Film folder name (default: every film).")
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Recreate manifests by scanning the frame/strip folders and outputs once (for films "
+        "processed before manifests existed).",
+    )
+    parser.add_argument("--verify", action="store_true", help="Re-hash every recorded output.")
+    add_profile_args(parser)
+    return parser.parse_args()
+
+
+# === LOCATION ===
+def locate(directory):
+    """(film, dataset) for a folder under frames/ or circle_data/, else (None, None)."""
+    path = Path(directory).resolve()
+    for dataset, (root, suffix, _, _) in DATASETS.items():
+        if path.parent != Path(root).resolve():
+            continue
+        if suffix and path.name.endswith(suffix):
+            return path.name[:-len(suffix)], dataset
+        if not suffix and not path.name.endswith(EXPERIMENTAL_SUFFIX):
+            return path.name, dataset
+    return None, None
+
+
+def dataset_dir(film, dataset):
+    root, suffix, _, _ = DATASETS[dataset]
+    return Path(root) / f"{film}{suffix}"
+
+
+def manifest_path(film):
+    return Path(OUTPUT_ROOT) / film / MANIFEST_FILE
+
+
+def list_films():
+    """Base names of every film with a frame or strip folder."""
+    films = set()
+    for root in (FRAME_ROOT, CIRCLE_ROOT):
+        if os.path.isdir(root):
+            for name in os.listdir(root):
+                if os.path.isdir(os.path.join(root, name)):
+                    films.add(name[:-len(EXPERIMENTAL_SUFFIX)] if name.endswith(EXPERIMENTAL_SUFFIX) else name)
+    return sorted(films)
+
+
+# === STORAGE ===
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def _stamp(path):
+    """{"mtime_ns", "size"} of a file, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return {"mtime_ns": st.st_mtime_ns, "size": st.st_size}
+
+
+def load_manifest(film):
+    try:
+        with open(manifest_path(film), 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        pass
+    except ValueError:
+        print(f"[!] Unreadable manifest for {film}; starting a new one.")
+    return {"film": film, "version": MANIFEST_VERSION, "source": None, "datasets": {}, "outputs": {}}
+
+
+def _update(film, change):
+    """Read-modify-write one film's manifest under a thread and a file lock; written aside and swapped in."""
+    path = manifest_path(film)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with _lock, open(path.with_name(path.name + LOCK_SUFFIX), 'a') as lock_file:
+        if fcntl is not None:
+            # Released when the lock file is closed.
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        manifest = load_manifest(film)
+        change(manifest)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(manifest, f, indent=2)
+            os.replace(tmp, path)
+        except BaseException:
+            os.remove(tmp)
+            raise
+    return manifest
+
+
+class HashingWriter:
+    """Binary file wrapper that hashes everything written through it."""
+
+    def __init__(self, f):
+        self._f = f
+        self._sha = hashlib.sha256()
+
+    def write(self, data):
+        self._sha.update(data)
+        return self._f.write(data)
+
+    def hexdigest(self):
+        return self._sha.hexdigest()
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# === DATASETS ===
+def _count_files(directory, kind):
+    """Files of a frame/strip set and whether they are exactly 1..count of the naming pattern."""
+    pattern = FILE_PATTERNS[kind]
+    prefix, suffix = pattern.split("{")[0], Path(pattern).suffix
+    names = {e.name for e in os.scandir(directory) if e.name.startswith(prefix) and e.name.endswith(suffix)}
+    count = len(names)
+    return count, names == {pattern.format(i) for i in range(1, count + 1)}
+
+
+def _settle(entry):
+    """Status from what has been recorded: complete once the files are counted and, for
+    frame sets, data.json holds one entry per frame."""
+    if "count" not in entry:
+        return
+    if entry["kind"] == "strips":
+        entry["status"] = "complete" if entry["count"] else "empty"
+    elif entry.get("metadata") is None:
+        entry["status"] = "extracted"
+    elif entry["metadata"]["count"] != entry["count"]:
+        entry["status"] = "mismatch"
+    else:
+        entry["status"] = "complete" if entry["count"] else "empty"
+
+
+def source_record(video_path, probe=None):
+    """Name, size and sampled fingerprint of the source film."""
+    try:
+        st = os.stat(video_path)
+        fingerprint = source_fingerprint(video_path)
+    except OSError:
+        return None
+    return {
+        "name": os.path.basename(video_path),
+        "path": os.path.abspath(video_path),
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "fingerprint": fingerprint,
+        "duration_s": (probe or {}).get("duration_s"),
+    }
+
+
+def begin_dataset(directory):
+    """Mark a frame/strip set as being (re)written; it reads as incomplete until recorded."""
+    film, dataset = locate(directory)
+    if film is None:
+        return
+
+    def change(manifest):
+        manifest["datasets"][dataset] = {
+            "dir": str(directory),
+            "kind": DATASETS[dataset][2],
+            "status": "extracting",
+            "started": _now(),
+        }
+
+    _update(film, change)
+
+
+def record_extraction(directory, info, video_path=None):
+    """Count a finished frame/strip set once and record how it was extracted.
+
+    info is the extraction.json payload (sample rate, tone-map chain, probe).
+    """
+    film, dataset = locate(directory)
+    if film is None:
+        return
+    kind = DATASETS[dataset][2]
+    count, contiguous = _count_files(directory, kind)
+    probe = info.get("probe") or {}
+    source = source_record(video_path, probe) if video_path else None
+    fps = info.get("sample_fps") or DATASETS[dataset][3]
+    duration = probe.get("duration_s") or (count / fps if fps else None)
+
+    def change(manifest):
+        if source:
+            manifest["source"] = source
+        entry = manifest["datasets"].setdefault(dataset, {"dir": str(directory), "kind": kind})
+        entry.update({
+            "count": count,
+            "contiguous": contiguous,
+            "sample_fps": fps,
+            "duration_s": round(duration, 3) if duration else None,
+            "tonemap": info.get("tonemap"),
+            "crop": info.get("crop"),
+            "source_fingerprint": (manifest["source"] or {}).get("fingerprint"),
+            "extracted": _now(),
+        })
+        for name in ("strip_height", "derived_from", "decimation"):
+            if name in info:
+                entry[name] = info[name]
+        _settle(entry)
+
+    _update(film, change)
+
+
+def record_metadata(frame_dir, count):
+    """data.json was (re)written with count entries."""
+    film, dataset = locate(frame_dir)
+    if film is None:
+        return
+    stamp = _stamp(Path(frame_dir) / "data.json")
+
+    def change(manifest):
+        entry = manifest["datasets"].setdefault(dataset, {"dir": str(frame_dir), "kind": "frames"})
+        entry["metadata"] = {"count": count, **(stamp or {}), "written": _now()}
+        _settle(entry)
+
+    _update(film, change)
+
+
+def dataset_entry(directory):
+    film, dataset = locate(directory)
+    if film is None:
+        return None
+    return load_manifest(film)["datasets"].get(dataset)
+
+
+def dataset_status(directory):
+    """Recorded status of a frame/strip set, or None when no manifest covers it."""
+    entry = dataset_entry(directory)
+    return entry.get("status") if entry else None
+
+
+def dataset_problems(manifest, dataset):
+    """Why a dataset cannot be trusted (status, data.json edited since, other source); O(1)."""
+    entry = manifest["datasets"].get(dataset)
+    if entry is None:
+        return []
+    problems = []
+    if entry.get("status") != "complete":
+        problems.append(entry.get("status") or "unrecorded")
+    metadata = entry.get("metadata")
+    if metadata is not None:
+        stamp = _stamp(Path(entry["dir"]) / "data.json")
+        if stamp is None or any(stamp[k] != metadata.get(k) for k in stamp):
+            problems.append("data.json changed since it was recorded")
+    source = (manifest.get("source") or {}).get("fingerprint")
+    if source and entry.get("source_fingerprint") and entry["source_fingerprint"] != source:
+        problems.append("extracted from a different source file")
+    return problems
+
+
+def dataset_files(directory):
+    """Frame/strip file names in film order from the manifest, or None if it cannot vouch for them."""
+    film, dataset = locate(directory)
+    if film is None:
+        return None
+    manifest = load_manifest(film)
+    entry = manifest["datasets"].get(dataset)
+    if entry is None or not entry.get("contiguous") or dataset_problems(manifest, dataset):
+        return None
+    pattern = FILE_PATTERNS[entry["kind"]]
+    return [pattern.format(i) for i in range(1, entry["count"] + 1)]
+
+
+def frame_count(directory):
+    """Number of frames (or strips) in a complete, unchanged set; None if the manifest cannot tell."""
+    film, dataset = locate(directory)
+    if film is None:
+        return None
+    manifest = load_manifest(film)
+    entry = manifest["datasets"].get(dataset)
+    if entry is None or dataset_problems(manifest, dataset):
+        return None
+    return entry["count"]
+
+
+def picker_note(directory):
+    """Short suffix for folder menus: size and rate, or what is wrong; empty without a manifest."""
+    film, dataset = locate(directory)
+    if film is None:
+        return ""
+    manifest = load_manifest(film)
+    entry = manifest["datasets"].get(dataset)
+    if entry is None:
+        return ""
+    problems = dataset_problems(manifest, dataset)
+    if problems:
+        return f"  [! {'; '.join(problems)}]"
+    noun = "strips" if entry["kind"] == "strips" else "frames"
+    return f"  [{entry['count']:,} {noun} @ {entry['sample_fps']:g} fps]"
+
+
+# === OUTPUTS ===
+def _output_dataset(folder, name):
+    """Dataset an output under outputs/<folder>/ was rendered from."""
+    experimental = folder.endswith(EXPERIMENTAL_SUFFIX)
+    if name.startswith("circle_donut"):
+        return "circle_experimental" if experimental else "circle"
+    return "experimental" if experimental else "standard"
+
+
+def _dataset_version(entry):
+    """Changes whenever a dataset is re-extracted or its data.json is rewritten."""
+    if not entry:
+        return None
+    return (entry.get("metadata") or {}).get("written") or entry.get("extracted")
+
+
+def record_output(path, sha256=None):
+    """Hash (unless given) and timestamp a file written to outputs/<folder>/."""
+    path = Path(path)
+    try:
+        rel = path.resolve().relative_to(Path(OUTPUT_ROOT).resolve())
+    except ValueError:
+        return
+    if len(rel.parts) != 2 or rel.name.startswith(MANIFEST_FILE):
+        return
+    folder = rel.parts[0]
+    film = folder[:-len(EXPERIMENTAL_SUFFIX)] if folder.endswith(EXPERIMENTAL_SUFFIX) else folder
+    dataset = _output_dataset(folder, rel.name)
+    stamp = _stamp(path)
+    if stamp is None:
+        return
+    sha256 = sha256 or file_sha256(path)
+
+    def change(manifest):
+        manifest["outputs"][rel.as_posix()] = {
+            "sha256": sha256,
+            **stamp,
+            "written": _now(),
+            "dataset": dataset,
+            "dataset_version": _dataset_version(manifest["datasets"].get(dataset)),
+        }
+
+    _update(film, change)
+
+
+def output_problems(manifest, verify=False):
+    """{output: problem} for outputs that are missing, modified or older than their dataset."""
+    problems = {}
+    for rel, record in manifest["outputs"].items():
+        path = Path(OUTPUT_ROOT) / rel
+        stamp = _stamp(path)
+        if stamp is None:
+            problems[rel] = "missing"
+        elif stamp["size"] != record["size"]:
+            problems[rel] = "modified since it was recorded"
+        elif verify and file_sha256(path) != record["sha256"]:
+            problems[rel] = "content differs from the recorded hash"
+        elif not verify and stamp["mtime_ns"] != record["mtime_ns"]:
+            problems[rel] = "modified since it was recorded"
+        else:
+            current = _dataset_version(manifest["datasets"].get(record["dataset"]))
+            if record.get("dataset_version") and current and current != record["dataset_version"]:
+                problems[rel] = f"stale: {record['dataset']} data changed after it was rendered"
+    return problems
+
+
+# === REBUILD ===
+def rebuild_manifest(film):
+    """Record existing datasets and outputs of a film processed before manifests existed; drop deleted outputs."""
+    for dataset in DATASETS:
+        directory = dataset_dir(film, dataset)
+        if not directory.is_dir():
+            continue
+        info = {}
+        if (directory / EXTRACTION_FILE).exists():
+            with open(directory / EXTRACTION_FILE, 'r') as f:
+                info = json.load(f)
+        record_extraction(directory, info)
+        data_file = directory / "data.json"
+        if DATASETS[dataset][2] == "frames" and data_file.exists():
+            with open(data_file, 'r') as f:
+                record_metadata(directory, len(json.load(f)))
+    for folder in (film, film + EXPERIMENTAL_SUFFIX):
+        out_dir = Path(OUTPUT_ROOT) / folder
+        if out_dir.is_dir():
+            for entry in sorted(os.scandir(out_dir), key=lambda e: e.name):
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    record_output(entry.path)
+
+    def prune(manifest):
+        for rel in [rel for rel in manifest["outputs"] if not (Path(OUTPUT_ROOT) / rel).exists()]:
+            del manifest["outputs"][rel]
+
+    _update(film, prune)
+
+
+# === MAIN ===
+def main():
+    args = parse_args()
+    start_profiling(args, "manifest")
+    films = [args.folder] if args.folder else list_films()
+    if not films:
+        print("[✗] No processed films found.")
+        return
+    for film in films:
+        if args.rebuild:
+            with stage("manifest.rebuild"):
+                rebuild_manifest(film)
+        if not manifest_path(film).exists():
+            print(f"[!] {film}: no manifest (run with --rebuild)")
+            continue
+        manifest = load_manifest(film)
+        issues = []
+        for dataset, entry in manifest["datasets"].items():
+            problems = dataset_problems(manifest, dataset)
+            if problems:
+                issues.append(f"{dataset}: {'; '.join(problems)}")
+            else:
+                print(f"[✓] {film} {dataset}: {entry['count']:,} {entry['kind']} @ {entry['sample_fps']:g} fps")
+        with stage("manifest.outputs", items=len(manifest["outputs"])):
+            for rel, problem in output_problems(manifest, args.verify).items():
+                issues.append(f"{rel}: {problem}")
+        for issue in issues:
+            print(f"[!] {film} {issue}")
+        print(f"[✓] {film}: {len(manifest['outputs'])} output(s) recorded, {len(issues)} issue(s)")
+
+
+if __name__ == "__main__":
+    main()
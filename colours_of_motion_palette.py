@@ -0,0 +1,319 @@
+import argparse
+import json
+import os
+from pathlib import Path
+
+from colours_of_motion_lazy import lazy_import
+from colours_of_motion_manifest import picker_note
+from colours_of_motion_png import PALETTE_MODES, save_png
+from colours_of_motion_profile import add_profile_args, stage, start_profiling
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+# === CONFIGURATION ===
+FRAME_ROOT = "frames"
+OUTPUT_ROOT = "outputs"
+PALETTE_FILE = "palettes.npz"
+DEFAULT_K = 5                 # Dominant colours kept per frame and per shot
+SAMPLE_SIDE = 64              # Frames are clustered at 64x64 pixels
+MINIBATCH_PIXELS = 1024       # Pixels drawn per frame for each k-means step
+KMEANS_STEPS = 12             # Mini-batch steps per frame
+BATCH_FRAMES = 64             # Frames clustered together in one vectorised batch
+MAX_WORKERS = os.cpu_count() or 4
+STRIP_WIDTH = 3600
+STRIP_HEIGHT = 600
+SEED = 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Extract dominant-colour palettes per frame and per shot and render palette strips."
+    )
+    parser.add_argument(
+        "--folder",
+        default=None,
+        help="Film folder name under frames/. If omitted, prompts for selection.",
+    )
+    parser.add_argument("--k", type=int, default=DEFAULT_K, help="Dominant colours per frame and per shot.")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="Worker processes for clustering.")
+    parser.add_argument("--strip-width", type=int, default=STRIP_WIDTH, help="Palette strip width.")
+    parser.add_argument("--strip-height", type=int, default=STRIP_HEIGHT, help="Palette strip height.")
+    parser.add_argument(
+        "--png-palette",
+        choices=PALETTE_MODES,
+        default="auto",
+        help="Indexed PNG output: auto (only when lossless), quantize (lossy within a bound) or off.",
+    )
+    add_profile_args(parser)
+    return parser.parse_args()
+
+
+def list_folders(base_path):
+    return sorted(
+        [f for f in os.listdir(base_path) if os.path.isdir(os.path.join(base_path, f))]
+    )
+
+
+def select_folder(base_path):
+    folders = list_folders(base_path)
+    if not folders:
+        raise FileNotFoundError(f"No folders found in {base_path}")
+
+    print("Available films:")
+    for i, folder in enumerate(folders, start=1):
+        print(f"  {i}. {folder}{picker_note(os.path.join(base_path, folder))}")
+    choice = input("Select folder number: ").strip()
+    if not choice.isdigit():
+        raise ValueError("Invalid folder selection.")
+    idx = int(choice) - 1
+    if idx < 0 or idx >= len(folders):
+        raise ValueError("Invalid folder selection.")
+    return folders[idx]
+
+
+# === PIXEL SAMPLING ===
+def load_pixels(path, side=SAMPLE_SIDE):
+    """side*side RGB pixels of a frame; JPEGs are decoded at 1/4 scale by libjpeg itself."""
+    img = cv2.imread(str(path), cv2.IMREAD_REDUCED_COLOR_4)
+    if img is None:
+        img = cv2.imread(str(path), cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError(f"Could not read frame: {path}")
+    img = cv2.resize(img, (side, side), interpolation=cv2.INTER_AREA)
+    return img[:, :, ::-1].reshape(-1, 3)
+
+
+# === K-MEANS ===
+def _initial_centroids(points, k):
+    """Deterministic start: means of k equal-size luminance quantiles of each point set."""
+    luma = points @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    order = np.argsort(luma, axis=1)
+    n = points.shape[1]
+    edges = np.linspace(0, n, k + 1).astype(int)
+    ranked = np.take_along_axis(points, order[:, :, None], axis=1)
+    return np.stack([ranked[:, edges[i]:max(edges[i + 1], edges[i] + 1)].mean(axis=1) for i in range(k)], axis=1)
+
+
+def _assign(points, centroids):
+    """Nearest centroid for every point: (B, N, 3) x (B, K, 3) -> (B, N)."""
+    distances = (
+        np.einsum("bkc,bkc->bk", centroids, centroids)[:, None, :]
+        - 2.0 * np.einsum("bnc,bkc->bnk", points, centroids)
+    )
+    return distances.argmin(axis=2)
+
+
+def minibatch_kmeans(points, k, steps=KMEANS_STEPS, batch=MINIBATCH_PIXELS, seed=SEED):
+    """Cluster B point sets at once; returns centroids (B, k, 3) and pixel shares (B, k).
+
+    Mini-batch k-means (Sculley 2010): every step draws `batch` pixels per frame and
+    moves each centre towards the mean of its pixels with a per-centre rate of
+    1 / pixels-seen, so early steps move far and later steps settle.
+    """
+    points = np.asarray(points, dtype=np.float32)
+    n_sets, n_points, _ = points.shape
+    rng = np.random.default_rng(seed)
+    centroids = _initial_centroids(points, k)
+    seen = np.zeros((n_sets, k), dtype=np.float32)
+    rows = np.arange(n_sets)[:, None]
+    for _ in range(steps):
+        sample = points[rows, rng.integers(0, n_points, size=(n_sets, min(batch, n_points)))]
+        labels = _assign(sample, centroids)
+        onehot = (labels[:, :, None] == np.arange(k)).astype(np.float32)
+        counts = onehot.sum(axis=1)
+        sums = np.einsum("bnk,bnc->bkc", onehot, sample)
+        seen += counts
+        rate = np.divide(counts, seen, out=np.zeros_like(counts), where=seen > 0)[:, :, None]
+        means = sums / np.maximum(counts, 1.0)[:, :, None]
+        centroids += rate * (means - centroids)
+    labels = _assign(points, centroids)
+    shares = (labels[:, :, None] == np.arange(k)).mean(axis=1)
+    return centroids, shares
+
+
+def weighted_kmeans(points, weights, k, steps=KMEANS_STEPS):
+    """Full-batch weighted k-means for one small point set (a shot's frame palettes)."""
+    points = np.asarray(points, dtype=np.float32)
+    weights = np.asarray(weights, dtype=np.float32)
+    if len(points) <= k:
+        pad = k - len(points)
+        centroids = np.concatenate([points, np.repeat(points[-1:], pad, axis=0)])
+        shares = np.concatenate([weights, np.zeros(pad, dtype=np.float32)])
+        return centroids, shares / max(shares.sum(), 1e-9)
+    centroids = _initial_centroids(points[None], k)[0]
+    for _ in range(steps):
+        labels = _assign(points[None], centroids[None])[0]
+        onehot = (labels[:, None] == np.arange(k)).astype(np.float32) * weights[:, None]
+        mass = onehot.sum(axis=0)
+        updated = (onehot.T @ points) / np.maximum(mass, 1e-9)[:, None]
+        centroids = np.where(mass[:, None] > 0, updated, centroids)
+    labels = _assign(points[None], centroids[None])[0]
+    shares = np.bincount(labels, weights=weights, minlength=k).astype(np.float32)
+    return centroids, shares / max(shares.sum(), 1e-9)
+
+
+def _sorted_by_share(centroids, shares):
+    order = np.argsort(-shares, axis=-1)
+    centroids = np.take_along_axis(centroids, order[..., None], axis=-2)
+    shares = np.take_along_axis(shares, order, axis=-1)
+    return np.clip(np.rint(centroids), 0, 255).astype(np.uint8), shares.astype(np.float32)
+
+
+def _palette_batch(paths, k, seed):
+    """Worker: load and cluster one batch of frames."""
+    points = np.stack([load_pixels(p) for p in paths])
+    return _sorted_by_share(*minibatch_kmeans(points, k, seed=seed))
+
+
+def frame_palettes(paths, k=DEFAULT_K, workers=MAX_WORKERS, batch_frames=BATCH_FRAMES):
+    """Palettes for every frame: colours (N, k, 3) uint8 and shares (N, k) float32."""
+    batches = [paths[i:i + batch_frames] for i in range(0, len(paths), batch_frames)]
+    colours = np.zeros((len(paths), k, 3), dtype=np.uint8)
+    shares = np.zeros((len(paths), k), dtype=np.float32)
+    from concurrent.futures import ProcessPoolExecutor
+
+    with stage("palette.frames", items=len(paths)):
+        if workers <= 1:
+            results = (_palette_batch(batch, k, SEED + i) for i, batch in enumerate(batches))
+            for i, (c, s) in enumerate(results):
+                start = i * batch_frames
+                colours[start:start + len(c)], shares[start:start + len(c)] = c, s
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(_palette_batch, batch, k, SEED + i) for i, batch in enumerate(batches)]
+                for i, future in enumerate(futures):
+                    c, s = future.result()
+                    start = i * batch_frames
+                    colours[start:start + len(c)], shares[start:start + len(c)] = c, s
+                    if (i + 1) % 10 == 0:
+                        print(f"  Clustered {min(len(paths), (i + 1) * batch_frames)} frames...")
+    return colours, shares
+
+
+def shot_palettes(colours, shares, shots, k=DEFAULT_K):
+    """Merge the frame palettes inside each shot, weighted by pixel share."""
+    n_frames = len(colours)
+    shot_colours = np.zeros((len(shots), k, 3), dtype=np.uint8)
+    shot_shares = np.zeros((len(shots), k), dtype=np.float32)
+    with stage("palette.shots", items=len(shots)):
+        for i, shot in enumerate(shots):
+            start = min(shot["start_frame_index"], n_frames - 1)
+            # Shots shorter than the sampling interval hold no frame; use the next one.
+            stop = min(max(shot["end_frame_index_exclusive"], start + 1), n_frames)
+            points = colours[start:stop].reshape(-1, 3)
+            weights = shares[start:stop].reshape(-1)
+            shot_colours[i], shot_shares[i] = _sorted_by_share(*weighted_kmeans(points, weights, k))
+    return shot_colours, shot_shares
+
+
+# === STORAGE ===
+def save_palettes(path, frame_names, colours, shares, shots=None, shot_colours=None, shot_shares=None):
+    """One compressed .npz next to data.json; shares are stored as float16."""
+    arrays = {
+        "frame_names": np.array(frame_names),
+        "frame_colours": colours,
+        "frame_shares": shares.astype(np.float16),
+    }
+    if shots is not None:
+        arrays["shot_bounds"] = np.array(
+            [[s["start_frame_index"], s["end_frame_index_exclusive"]] for s in shots], dtype=np.int32
+        ).reshape(-1, 2)
+        arrays["shot_lengths"] = np.array(
+            [s.get("duration_s", s["frame_count"]) for s in shots], dtype=np.float32
+        )
+        arrays["shot_colours"] = shot_colours
+        arrays["shot_shares"] = shot_shares.astype(np.float16)
+    np.savez_compressed(path, **arrays)
+    print(f"[✓] Saved palettes: {path}")
+
+
+def load_palettes(path):
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+
+# === STRIPED OUTPUT ===
+def render_palette_strip(colours, shares, lengths=None, width=STRIP_WIDTH, height=STRIP_HEIGHT):
+    """Columns over time; each column stacks its palette top-down in proportion to pixel share.
+
+    lengths gives each palette's share of the width (shot durations); by default every
+    palette gets the same width (frames sampled at a fixed rate).
+    """
+    n = len(colours)
+    if lengths is None:
+        column = np.minimum((np.arange(width) * n) // width, n - 1)
+    else:
+        edges = np.cumsum(np.asarray(lengths, dtype=np.float64))
+        centres = (np.arange(width) + 0.5) * (edges[-1] / width)
+        column = np.minimum(np.searchsorted(edges, centres, side="right"), n - 1)
+    shares = shares.astype(np.float32)
+    cumulative = np.cumsum(shares / np.maximum(shares.sum(axis=1, keepdims=True), 1e-9), axis=1)
+    rows = (np.arange(height, dtype=np.float32) + 0.5) / height
+    # Band index per pixel = number of cumulative shares the row has passed.
+    band = (rows[:, None, None] >= cumulative[column][None, :, :]).sum(axis=2)
+    band = np.minimum(band, colours.shape[1] - 1)
+    return colours[column[None, :], band]
+
+
+def build_palettes(frame_dir, output_dir, k=DEFAULT_K, workers=MAX_WORKERS,
+                   width=STRIP_WIDTH, height=STRIP_HEIGHT, palette="auto"):
+    """Cluster every frame in data.json order, merge per shot, save palettes.npz and strips."""
+    frame_dir = Path(frame_dir)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    data_path = frame_dir / "data.json"
+    if data_path.exists():
+        with data_path.open("r", encoding="utf-8") as f:
+            names = [frame["frame"] for frame in json.load(f)]
+    else:
+        names = sorted(p.name for p in frame_dir.iterdir() if p.suffix.lower() in {".jpg", ".jpeg", ".png"})
+    if not names:
+        raise FileNotFoundError(f"No frames found in {frame_dir}")
+
+    print(f"[>] Clustering {len(names)} frames into {k} colours each ({workers} worker(s))")
+    colours, shares = frame_palettes([frame_dir / n for n in names], k=k, workers=workers)
+
+    shots = None
+    shot_colours = shot_shares = None
+    shots_path = output_dir / "shot_palettes.json"
+    if shots_path.exists():
+        with shots_path.open("r", encoding="utf-8") as f:
+            shots = json.load(f)["shots"]
+        shot_colours, shot_shares = shot_palettes(colours, shares, shots, k=k)
+    else:
+        print("[!] No shot_palettes.json – run colours_of_motion_shots.py for per-shot palettes.")
+
+    save_palettes(frame_dir / PALETTE_FILE, names, colours, shares, shots, shot_colours, shot_shares)
+
+    with stage("palette.render"):
+        strip = render_palette_strip(colours, shares, width=width, height=height)
+    frames_out = output_dir / "palette_frames.png"
+    save_png(strip, frames_out, palette=palette)
+    print(f"[✓] Saved frame palette strip: {frames_out}")
+    if shots is not None:
+        lengths = [s.get("duration_s", s["frame_count"]) for s in shots]
+        with stage("palette.render"):
+            strip = render_palette_strip(shot_colours, shot_shares, lengths, width=width, height=height)
+        shots_out = output_dir / "palette_shots.png"
+        save_png(strip, shots_out, palette=palette)
+        print(f"[✓] Saved shot palette strip: {shots_out}")
+
+
+def main():
+    args = parse_args()
+    start_profiling(args, "palette")
+    folder = args.folder or select_folder(FRAME_ROOT)
+    build_palettes(
+        Path(FRAME_ROOT) / folder,
+        Path(OUTPUT_ROOT) / folder,
+        k=args.k,
+        workers=args.workers,
+        width=args.strip_width,
+        height=args.strip_height,
+        palette=args.png_palette,
+    )
+
+
+if __name__ == "__main__":
+    main()
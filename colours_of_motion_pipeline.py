@@ -0,0 +1,469 @@
+import argparse
+import math
+import os
+import queue
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import colours_of_motion_circle as circle
+import colours_of_motion_processing as processing
+import colours_of_motion_radial as radial
+import colours_of_motion_watch as watch
+from colours_of_motion_animate import reveal_key
+from colours_of_motion_lazy import lazy_import, load_now
+from colours_of_motion_manifest import begin_dataset
+from colours_of_motion_png import save_png, wait_for_writes
+from colours_of_motion_preview import PREVIEW_SIZE, preview_path
+from colours_of_motion_profile import add_profile_args, stage, start_profiling
+from colours_of_motion_tonemap import add_tonemap_args, save_extraction_info, select_tonemap
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+# === CONFIGURATION ===
+FRAME_ROOT = "frames"
+OUTPUT_ROOT = "outputs"
+QUEUE_FRAMES = 16             # Encoded frames buffered between ffmpeg and analysis
+ANALYSIS_WORKERS = 2
+PREVIEW_SECONDS = 2.0         # How often the live previews are rewritten
+READ_CHUNK = 1 << 20
+LINEAR_PREVIEW_HEIGHT = PREVIEW_SIZE // 8
+RENDERS = ("circle", "vertical", "radial", "shots", "palette", "poster")
+DEFAULT_RENDERS = "circle,vertical,radial"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Extract, analyse and render a film in one overlapped pass (standard mode)."
+    )
+    parser.add_argument("--video", default=None, help="Video file. If omitted, prompts for a path.")
+    parser.add_argument(
+        "--folder",
+        default=None,
+        help="Film folder name (default: from a 'Title (Year) - ttXXXXXXX' file name, else prompts).",
+    )
+    parser.add_argument(
+        "--renders",
+        default=DEFAULT_RENDERS,
+        help=f"Comma-separated final renders ({','.join(RENDERS)}).",
+    )
+    parser.add_argument("--poster_mode", action="store_true", help="Render high-resolution outputs.")
+    parser.add_argument(
+        "--scene-cuts",
+        action="store_true",
+        help="Detect scene cuts on the full-rate stream in the same ffmpeg pass (writes cuts.json).",
+    )
+    parser.add_argument(
+        "--scene-threshold",
+        type=float,
+        default=processing.SCENE_THRESHOLD,
+        help="scdet score (0-100) that counts as a cut.",
+    )
+    parser.add_argument(
+        "--queue-frames",
+        type=int,
+        default=QUEUE_FRAMES,
+        help="Frames buffered between ffmpeg and analysis; ffmpeg waits when the queue is full.",
+    )
+    parser.add_argument("--workers", type=int, default=ANALYSIS_WORKERS, help="Analysis threads.")
+    add_tonemap_args(parser)
+    add_profile_args(parser)
+    return parser.parse_args()
+
+
+# === SOURCE ===
+def probe_duration(video_path):
+    """Container duration in seconds, or None if ffprobe cannot tell."""
+    cmd = [
+        "ffprobe", "-v", "error", "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1", video_path,
+    ]
+    try:
+        result = subprocess.run(cmd, check=True, capture_output=True, text=True)
+        return float(result.stdout.strip())
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        return None
+
+
+def _jpeg_length(buffer):
+    """Size of the complete JPEG at the start of buffer, or 0 if more bytes are needed.
+
+    Header segments are skipped by their lengths, so only the entropy-coded data is
+    searched for the end-of-image marker (0xFF is always escaped inside it).
+    """
+    pos = 2
+    while pos + 4 <= len(buffer):
+        if buffer[pos] != 0xFF:
+            raise ValueError("Corrupt JPEG stream from ffmpeg")
+        marker = buffer[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        length = (buffer[pos + 2] << 8) | buffer[pos + 3]
+        if marker == 0xDA:
+            end = buffer.find(b"\xff\xd9", pos + 2 + length)
+            return end + 2 if end >= 0 else 0
+        pos += 2 + length
+    return 0
+
+
+def iter_jpegs(stream, chunk=READ_CHUNK):
+    """Split ffmpeg's image2pipe MJPEG output into one bytes object per frame."""
+    buffer = bytearray()
+    while True:
+        data = stream.read(chunk)
+        if not data:
+            break
+        buffer += data
+        while len(buffer) > 4:
+            length = _jpeg_length(buffer)
+            if not length:
+                break
+            yield bytes(buffer[:length])
+            del buffer[:length]
+    if buffer.strip(b"\x00"):
+        raise ValueError(f"ffmpeg output ended inside a frame ({len(buffer)} bytes left)")
+
+
+# === ANALYSIS ===
+class FrameResults:
+    """Per-frame analysis finished out of order, read back as the prefix in film order."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._linear = {}
+        self._prefix = 0
+
+    def add(self, index, entry, linear_bgr):
+        with self._lock:
+            self._entries[index] = entry
+            self._linear[index] = linear_bgr
+            while self._prefix in self._entries:
+                self._prefix += 1
+
+    def prefix(self):
+        """Metadata entries of frames 0..n-1 that are all analysed."""
+        with self._lock:
+            return [self._entries[i] for i in range(self._prefix)]
+
+    def linear_colours(self):
+        with self._lock:
+            return [self._linear[i] for i in range(self._prefix)]
+
+
+def analyse_frame(path, data):
+    """data.json entry (as build_metadata computes it) plus the cv2 mean linear_hq.png uses."""
+    entry = processing.calculate_frame_data(path)
+    frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    return entry, frame.mean(axis=(0, 1)).astype(np.uint8)
+
+
+def analysis_worker(frames, results, errors):
+    while True:
+        item = frames.get()
+        if item is None:
+            return
+        if errors:
+            continue
+        index, path, data = item
+        try:
+            results.add(index, *analyse_frame(path, data))
+        except Exception as e:  # Reported by the reader, which stops ffmpeg.
+            errors.append(e)
+
+
+# === LIVE PREVIEWS ===
+class LiveCanvas:
+    """Preview painted from a per-pixel frame key as colours arrive; each pixel is set once."""
+
+    def __init__(self, key, fill):
+        flat_key = key.reshape(-1)
+        painted = np.flatnonzero(flat_key >= 0)
+        order = np.argsort(flat_key[painted], kind="stable")
+        self._pixels = painted[order]
+        self._keys = flat_key[self._pixels]
+        self.canvas = np.full(key.shape + (3,), fill, dtype=np.uint8)
+        self._done = 0
+
+    def update(self, colours):
+        """Paint the pixels of every frame below len(colours); returns True if anything changed."""
+        stop = int(np.searchsorted(self._keys, len(colours), side="left"))
+        if stop <= self._done:
+            return False
+        keys = self._keys[self._done:stop]
+        palette = np.asarray(colours[keys[0]:keys[-1] + 1], dtype=np.uint8)
+        self.canvas.reshape(-1, 3)[self._pixels[self._done:stop]] = palette[keys - keys[0]]
+        self._done = stop
+        return True
+
+
+class LivePreviews:
+    """Circle/linear previews and the full-size circle, advanced as analysed frames arrive."""
+
+    def __init__(self, output_dir, expected_frames, circle_canvas=None):
+        self.output_dir = output_dir
+        self.n_frames = expected_frames
+        self.canvases = self._layout(expected_frames) if expected_frames else {}
+        self.circle_canvas = circle_canvas
+
+    def _layout(self, n_frames):
+        side = PREVIEW_SIZE
+        return {
+            preview_path(self.output_dir / "circle_full.png"): LiveCanvas(
+                reveal_key("circle", n_frames, side, side), 255
+            ),
+            preview_path(self.output_dir / "linear_hq.png"): LiveCanvas(
+                reveal_key("linear", n_frames, side, LINEAR_PREVIEW_HEIGHT), 0
+            ),
+        }
+
+    def finish(self, entries):
+        """Last refresh; canvases laid out for the ffprobe estimate are redrawn for the real count."""
+        if entries and len(entries) != self.n_frames:
+            self.n_frames = len(entries)
+            self.canvases = self._layout(self.n_frames)
+        self.refresh(entries)
+
+    def refresh(self, entries):
+        colours = [entry["color"] for entry in entries]
+        for path, canvas in self.canvases.items():
+            if canvas.update(colours):
+                save_png(canvas.canvas, path)
+        if self.circle_canvas is not None:
+            drawn = self.circle_canvas.drawn
+            stop = min(len(colours), self.circle_canvas.n_frames)
+            if stop > drawn:
+                self.circle_canvas.draw(drawn, colours[drawn:stop])
+
+
+def preview_loop(previews, results, done, period=PREVIEW_SECONDS):
+    while not done.wait(period):
+        with stage("pipeline.live_preview"):
+            previews.refresh(results.prefix())
+
+
+# === PIPELINE ===
+def stream_extract(video_path, frame_dir, fps, chain, results, scdet_log=None,
+                   scene_threshold=processing.SCENE_THRESHOLD, queue_frames=QUEUE_FRAMES, workers=ANALYSIS_WORKERS):
+    """Run ffmpeg to stdout, write each frame to disk and hand it to the analysis threads.
+
+    The queue is bounded: when analysis falls behind, the reader stops reading and
+    ffmpeg blocks on the full pipe instead of frames piling up in memory.
+    """
+    cmd = [
+        "ffmpeg", "-an", "-sn",
+        "-i", video_path,
+        *processing.sample_filter_args(fps, chain["filter"], scdet_log, scene_threshold),
+        "-c:v", "mjpeg", "-q:v", "1", "-fps_mode", "vfr",
+        "-f", "image2pipe",
+        "-loglevel", "warning", "-hide_banner", "-stats",
+        "-",
+    ]
+    print(f"[>] Extracting frames (pipelined): {' '.join(cmd)}")
+    frames = queue.Queue(maxsize=max(1, queue_frames))
+    errors = []
+    threads = [
+        threading.Thread(target=analysis_worker, args=(frames, results, errors), name=f"analysis-{i}")
+        for i in range(max(1, workers))
+    ]
+    for thread in threads:
+        thread.start()
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+    count = 0
+    try:
+        for data in iter_jpegs(proc.stdout):
+            if errors:
+                break
+            path = os.path.join(frame_dir, f"frame_{count + 1:04d}.jpg")
+            with open(path, "wb") as f:
+                f.write(data)
+            frames.put((count, path, data))
+            count += 1
+    finally:
+        if errors and proc.poll() is None:
+            proc.kill()
+        proc.stdout.close()
+        returncode = proc.wait()
+        for _ in threads:
+            frames.put(None)
+        for thread in threads:
+            thread.join()
+    if errors:
+        raise errors[0]
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, "ffmpeg")
+    return count
+
+
+def run_pipeline(video_path, folder, renders, poster_mode=False, scene_cuts=False,
+                 scene_threshold=processing.SCENE_THRESHOLD, tonemap="auto", crop="auto",
+                 queue_frames=QUEUE_FRAMES, workers=ANALYSIS_WORKERS, fps=processing.FPS_STANDARD):
+    """Extract + analyse + render with every stage overlapped; returns the output folder."""
+    frame_dir = Path(FRAME_ROOT) / folder
+    output_dir = Path(OUTPUT_ROOT) / folder
+    frame_dir.mkdir(parents=True, exist_ok=True)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    for old in frame_dir.glob("frame_*"):
+        old.unlink()
+    begin_dataset(frame_dir)
+
+    started = time.perf_counter()
+    load_now()
+    chain = select_tonemap(video_path, tonemap, crop)
+    duration = probe_duration(video_path)
+    expected = math.ceil(duration * fps - 1e-9) if duration else None
+    circle_size = circle.HQ_RESOLUTION if poster_mode else circle.QUICK_RESOLUTION
+    radial_size = radial.POSTER_RESOLUTION if poster_mode else radial.QUICK_RESOLUTION
+    if expected:
+        print(f"[>] Expecting {expected} frames ({duration:.1f} s at {fps} fps); previews update as they arrive")
+    else:
+        print("[!] Unknown duration: live previews are off and the circle is drawn after decoding.")
+    circle_canvas = circle.CircleCanvas(expected, circle_size) if expected and "circle" in renders else None
+
+    # Colour-independent setup runs while ffmpeg decodes.
+    warm = threading.Thread(target=radial.radial_positions, args=(radial_size,), name="warm-radial")
+    if "radial" in renders:
+        warm.start()
+
+    results = FrameResults()
+    previews = LivePreviews(output_dir, expected, circle_canvas)
+    done = threading.Event()
+    live = threading.Thread(target=preview_loop, args=(previews, results, done), name="live-preview")
+    live.start()
+    log_path = processing.scdet_log_path() if scene_cuts else None
+    try:
+        with stage("pipeline.extract_analyse") as info:
+            count = stream_extract(
+                video_path, str(frame_dir), fps, chain, results, log_path, scene_threshold, queue_frames, workers
+            )
+            info["items"] = count
+        if scene_cuts:
+            with stage("processing.scene_cuts"):
+                cuts = processing.parse_scdet_log(log_path)
+                processing.save_cuts(cuts, str(frame_dir), video_path, fps, scene_threshold)
+    finally:
+        done.set()
+        live.join()
+        if log_path:
+            os.remove(log_path)
+    decoded = time.perf_counter() - started
+    print(f"[✓] Extracted and analysed {count} frames in {decoded:.1f} s")
+
+    metadata = results.prefix()
+    save_extraction_info(str(frame_dir), video_path, fps, chain)
+    processing.save_metadata(metadata, str(frame_dir))
+    with stage("pipeline.live_preview"):
+        previews.finish(metadata)
+    if not metadata:
+        print("[✗] No frames extracted. Nothing to render.")
+        return output_dir
+
+    render_finals(video_path, folder, output_dir, metadata, results.linear_colours(),
+                  renders, poster_mode, circle_canvas, circle_size, radial_size)
+    if "radial" in renders:
+        warm.join()
+    wait_for_writes()
+    total = time.perf_counter() - started
+    print(f"[✓] Pipeline complete in {total:.1f} s ({total - decoded:.1f} s after decoding finished)")
+    return output_dir
+
+
+def render_finals(video_path, folder, output_dir, metadata, linear_colours, renders, poster_mode,
+                  circle_canvas, circle_size, radial_size):
+    """Final renders side by side; a render waits for its prerequisite (watch.JOB_GRAPH)."""
+    options = {"poster_mode": poster_mode}
+
+    def render_circle():
+        colours = [entry["color"] for entry in metadata]
+        with stage("pipeline.circle", items=len(colours)):
+            if circle_canvas is not None and circle_canvas.n_frames == len(colours):
+                image = circle_canvas.finish()
+            else:
+                # The duration estimate was off by a frame or more: slice angles change.
+                image = circle.render_circle_image(colours, circle_size)
+        save_png(image, output_dir / "circle_full.png", palette="auto")
+        print(f"[✓] Saved full circle image: {output_dir / 'circle_full.png'}")
+
+    def render_radial():
+        if poster_mode:
+            line_height, stripe_width = radial.HQ_LINE_HEIGHT, radial.HQ_STRIPE_WIDTH
+        else:
+            line_height, stripe_width = radial.QUICK_LINE_HEIGHT, radial.QUICK_STRIPE_WIDTH
+        horizontal_path = output_dir / "linear_hq.png"
+        # The frames were already averaged during analysis; nothing is decoded again.
+        timeline = radial.render_horizontal_timeline(linear_colours, line_height, stripe_width)
+        save_png(timeline, horizontal_path, bgr=True, palette="auto")
+        print(f"[✓] Saved horizontal timeline: {horizontal_path}")
+        radial.build_radial_image(str(horizontal_path), str(output_dir / "radial_hq.png"), radial_size)
+
+    jobs = {"circle": render_circle, "radial": render_radial}
+    for render in ("vertical", "shots", "palette", "poster"):
+        jobs[render] = lambda kind=f"render_{render}": watch.run_job(kind, video_path, folder, options)
+    selected = [render for render in RENDERS if render in renders]
+    futures = {}
+
+    def run(render):
+        prerequisite = watch.JOB_GRAPH[f"render_{render}"].replace("render_", "")
+        if prerequisite in futures:
+            futures[prerequisite].result()
+        jobs[render]()
+
+    with stage("pipeline.render", items=len(selected)):
+        # One thread per render, so waiting on a prerequisite never starves the pool.
+        with ThreadPoolExecutor(max_workers=max(1, len(selected)), thread_name_prefix="render") as pool:
+            for render in selected:
+                futures[render] = pool.submit(run, render)
+            for future in futures.values():
+                future.result()
+
+
+def parse_renders(text):
+    renders = [r.strip() for r in text.split(",") if r.strip()]
+    unknown = set(renders) - set(RENDERS)
+    if unknown:
+        raise ValueError(f"Unknown render(s): {', '.join(sorted(unknown))}")
+    # Pull in prerequisites too, e.g. a poster needs the circle render.
+    for render in list(renders):
+        kind = watch.JOB_GRAPH[f"render_{render}"]
+        while kind and kind.startswith("render_"):
+            if kind[len("render_"):] not in renders:
+                renders.append(kind[len("render_"):])
+            kind = watch.JOB_GRAPH[kind]
+    return renders
+
+
+def main():
+    args = parse_args()
+    start_profiling(args, "pipeline")
+    try:
+        renders = parse_renders(args.renders)
+    except ValueError as e:
+        print(f"[✗] {e}")
+        return
+    video_path = args.video or input("Enter full path to video file: ").strip()
+    if not os.path.exists(video_path):
+        print("[✗] Video not found.")
+        return
+    folder = args.folder or watch.folder_from_filename(video_path)
+    if not folder:
+        folder = input("Enter folder name (e.g. 'Aliens (1986) - tt0090605'): ").strip()
+    run_pipeline(
+        video_path,
+        folder,
+        renders,
+        poster_mode=args.poster_mode,
+        scene_cuts=args.scene_cuts,
+        scene_threshold=args.scene_threshold,
+        tonemap=args.tonemap,
+        crop=args.crop,
+        queue_frames=args.queue_frames,
+        workers=args.workers,
+    )
+
+
+if __name__ == "__main__":
+    main()
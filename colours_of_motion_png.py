@@ -0,0 +1,358 @@
+import io
+import os
+import struct
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from colours_of_motion_lazy import lazy_import
+from colours_of_motion_manifest import HashingWriter, record_output
+from colours_of_motion_profile import stage
+
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+
+# === CONFIGURATION ===
+DEFAULT_COMPRESS_LEVEL = 6   # Parallel bands make the higher level affordable
+BAND_ROWS = 128              # Rows per independently compressed IDAT band
+WINDOW_SIZE = 32768          # Deflate window carried between bands as a preset dictionary
+MAX_WORKERS = os.cpu_count() or 4
+PALETTE_SIZE = 256           # Largest PNG palette
+PALETTE_SAMPLE = 65536       # Pixels checked before a full unique-colour scan
+DEFAULT_PALETTE_MAX_ERROR = 6  # Max per-channel error accepted from quantisation
+
+# Palette modes: "off" always writes truecolour, "auto" writes indexed PNGs only when
+# the image fits a palette exactly, "quantize" also reduces larger images to 256
+# colours when the worst per-channel error stays within the configured limit.
+PALETTE_MODES = ("off", "auto", "quantize")
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+COLOUR_TYPES = {1: 0, 3: 2, 4: 6}  # channels -> PNG colour type (grey, RGB, RGBA)
+INDEXED_COLOUR_TYPE = 3
+ZLIB_FLG = {1: 0x01, 2: 0x5E, 3: 0x5E, 4: 0x5E, 5: 0x5E, 6: 0x9C}  # 7-9 -> 0xDA
+
+_band_pool = None
+_writer_pool = None
+_pending = []
+_lock = threading.Lock()
+
+
+def _get_band_pool():
+    global _band_pool
+    with _lock:
+        if _band_pool is None:
+            _band_pool = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="png-band")
+        return _band_pool
+
+
+def _get_writer_pool():
+    global _writer_pool
+    with _lock:
+        if _writer_pool is None:
+            _writer_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="png-writer")
+        return _writer_pool
+
+
+# === INPUT NORMALISATION ===
+def to_array(image, bgr=False):
+    """Return a contiguous uint8 HxW or HxWxC array for a PIL image or ndarray."""
+    if isinstance(image, Image.Image):
+        if image.mode not in ("L", "RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+        arr = np.asarray(image)
+    else:
+        arr = np.asarray(image)
+        if arr.dtype != np.uint8:
+            arr = np.clip(arr, 0, 255).astype(np.uint8)
+        if bgr and arr.ndim == 3:
+            # cv2 arrays are BGR(A); PNG wants RGB(A).
+            order = [2, 1, 0, 3] if arr.shape[2] == 4 else [2, 1, 0]
+            arr = arr[:, :, order]
+    if arr.ndim == 3 and arr.shape[2] == 1:
+        arr = arr[:, :, 0]
+    if arr.ndim not in (2, 3) or (arr.ndim == 3 and arr.shape[2] not in (3, 4)):
+        raise ValueError(f"Unsupported image shape for PNG output: {arr.shape}")
+    return np.ascontiguousarray(arr)
+
+
+# === ROW FILTERS ===
+def filter_band(rows, prev_row, bpp):
+    """Apply the cheapest PNG filter per row (min sum of absolute signed residuals).
+
+    rows is an (n, stride) uint8 array and prev_row the scanline above it (or None
+    for the first band). Flat renders compress best with Up (identical rows) or
+    Sub (identical columns); Average picks up smooth gradients. Paeth is skipped:
+    on these images it rarely wins and costs three times the other filters.
+    Returns the filtered bytes with the filter type byte prepended to each row.
+    """
+    n, stride = rows.shape
+    up = np.empty_like(rows)
+    up[0] = prev_row if prev_row is not None else 0
+    up[1:] = rows[:-1]
+    left = np.zeros_like(rows)
+    left[:, bpp:] = rows[:, :-bpp]
+
+    # uint8 arithmetic wraps modulo 256 exactly as the PNG filters require.
+    candidates = [
+        rows,
+        rows - left,
+        rows - up,
+        rows - ((left >> 1) + (up >> 1) + (left & up & 1)),
+    ]
+    # min(v, 256 - v) is |v| when the byte is read as signed.
+    scores = np.stack([np.minimum(c, 0 - c).sum(axis=1, dtype=np.uint32) for c in candidates])
+    choice = scores.argmin(axis=0)
+
+    out = np.empty((n, stride + 1), dtype=np.uint8)
+    out[:, 0] = choice
+    body = out[:, 1:]
+    for filter_type, candidate in enumerate(candidates):
+        selected = choice == filter_type
+        if selected.any():
+            body[selected] = candidate[selected]
+    return out.tobytes()
+
+
+# === PALETTE ===
+def _pack_colours(arr):
+    """Pack RGB(A) pixels into one uint32 per pixel."""
+    packed = arr[..., 0].astype(np.uint32) << 16
+    packed |= arr[..., 1].astype(np.uint32) << 8
+    packed |= arr[..., 2]
+    if arr.shape[-1] == 4:
+        packed = (packed << 8) | arr[..., 3]
+    return packed.reshape(-1)
+
+
+def _unpack_colours(packed, channels):
+    shifts = [24, 16, 8, 0] if channels == 4 else [16, 8, 0]
+    return np.stack([(packed >> s) & 0xFF for s in shifts], axis=1).astype(np.uint8)
+
+
+def _runs(flat):
+    """Split a flat array into run starts, so flat renders are handled run by run."""
+    return np.concatenate(([0], np.flatnonzero(flat[1:] != flat[:-1]) + 1))
+
+
+def unique_colours(arr, limit=PALETTE_SIZE, band_rows=1024):
+    """Return the sorted packed colours of arr, or None once more than limit are found."""
+    flat_sample = _pack_colours(arr.reshape(-1, arr.shape[-1])[:: max(1, arr.shape[0] * arr.shape[1] // PALETTE_SAMPLE)])
+    if np.unique(flat_sample).size > limit:
+        return None
+    found = np.empty(0, dtype=np.uint32)
+    for start in range(0, arr.shape[0], band_rows):
+        flat = _pack_colours(arr[start:start + band_rows])
+        found = np.union1d(found, flat[_runs(flat)])
+        if found.size > limit:
+            return None
+    return found
+
+
+def index_pixels(arr, packed_palette):
+    """Map every pixel to its palette index; colours must be present in the palette."""
+    flat = _pack_colours(arr)
+    starts = _runs(flat)
+    lengths = np.diff(np.append(starts, flat.size))
+    run_index = np.searchsorted(packed_palette, flat[starts]).astype(np.uint8)
+    return np.repeat(run_index, lengths).reshape(arr.shape[:2])
+
+
+def quantize_pixels(arr, max_error=DEFAULT_PALETTE_MAX_ERROR):
+    """Reduce arr to a 256-colour palette; returns (indices, palette) or None if too lossy."""
+    image = Image.fromarray(arr)
+    method = Image.Quantize.FASTOCTREE if arr.shape[-1] == 4 else Image.Quantize.MEDIANCUT
+    quantized = image.quantize(colors=PALETTE_SIZE, method=method, dither=Image.Dither.NONE)
+    indices = np.asarray(quantized)
+    channels = arr.shape[-1]
+    raw_palette = quantized.getpalette(rawmode="RGBA" if channels == 4 else "RGB")
+    palette = np.array(raw_palette, dtype=np.uint8).reshape(-1, channels)[: int(indices.max()) + 1]
+    for start in range(0, arr.shape[0], 1024):
+        band = arr[start:start + 1024].astype(np.int16)
+        error = np.abs(palette[indices[start:start + 1024]].astype(np.int16) - band).max()
+        if error > max_error:
+            return None
+    return indices, palette
+
+
+def _bit_depth(n_colours):
+    for depth in (1, 2, 4):
+        if n_colours <= (1 << depth):
+            return depth
+    return 8
+
+
+def _pack_indices(indices, depth):
+    """Pack 8-bit palette indices into rows of depth-bit samples."""
+    if depth == 8:
+        return np.ascontiguousarray(indices)
+    per_byte = 8 // depth
+    height, width = indices.shape
+    padded_width = -(-width // per_byte) * per_byte
+    padded = np.zeros((height, padded_width), dtype=np.uint8)
+    padded[:, :width] = indices
+    shifts = ((per_byte - 1 - np.arange(per_byte)) * depth).astype(np.uint8)
+    groups = padded.reshape(height, padded_width // per_byte, per_byte) << shifts
+    return np.bitwise_or.reduce(groups, axis=2)
+
+
+def to_indexed(arr, palette_mode, max_error=DEFAULT_PALETTE_MAX_ERROR):
+    """Return (packed indices, bit depth, palette colours) for arr, or None to stay truecolour.
+
+    Exact mode only succeeds when every pixel colour is in the palette, so decoding the
+    indexed PNG reproduces the input bit for bit.
+    """
+    if palette_mode not in PALETTE_MODES:
+        raise ValueError(f"Unknown palette mode: {palette_mode!r}")
+    if palette_mode == "off" or arr.ndim != 3:
+        return None
+    packed_palette = unique_colours(arr)
+    if packed_palette is not None:
+        indices = index_pixels(arr, packed_palette)
+        palette = _unpack_colours(packed_palette, arr.shape[-1])
+    elif palette_mode == "quantize":
+        result = quantize_pixels(arr, max_error=max_error)
+        if result is None:
+            print(f"[!] Palette quantisation exceeds max error {max_error}; writing truecolour PNG.")
+            return None
+        indices, palette = result
+    else:
+        return None
+    depth = _bit_depth(len(palette))
+    return _pack_indices(indices, depth), depth, palette
+
+
+# === COMPRESSION ===
+def _compress_band(arr, start, stop, bpp, level, last):
+    stride = arr.shape[1] * bpp if arr.ndim == 3 else arr.shape[1]
+    rows = arr[start:stop].reshape(stop - start, stride)
+    prev_row = arr[start - 1].reshape(stride) if start > 0 else None
+    raw = filter_band(rows, prev_row, bpp)
+
+    # Seed each band with the tail of the previous one so splitting costs little ratio.
+    if start > 0:
+        prev_start = max(0, start - (WINDOW_SIZE // (stride + 1) + 1))
+        prev_rows = arr[prev_start:start].reshape(start - prev_start, stride)
+        prev_prev = arr[prev_start - 1].reshape(stride) if prev_start > 0 else None
+        zdict = filter_band(prev_rows, prev_prev, bpp)[-WINDOW_SIZE:]
+        comp = zlib.compressobj(level, zlib.DEFLATED, -15, zdict=zdict)
+    else:
+        comp = zlib.compressobj(level, zlib.DEFLATED, -15)
+    data = comp.compress(raw) + comp.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+    return raw, data
+
+
+def _chunk(tag, payload):
+    body = tag + payload
+    return struct.pack(">I", len(payload)) + body + struct.pack(">I", zlib.crc32(body) & 0xFFFFFFFF)
+
+
+def write_png(image, path, **options):
+    """Encode image as PNG, compressing IDAT bands in parallel threads.
+
+    The bytes are hashed as they are written; files under outputs/<film>/ are
+    recorded in that film's manifest.
+    """
+    tmp_path = f"{path}.tmp"
+    with stage("png.encode") as info, open(tmp_path, "wb") as f:
+        writer = HashingWriter(f)
+        info["items"] = _encode_png(image, writer, **options)
+    os.replace(tmp_path, path)
+    record_output(path, writer.hexdigest())
+    return path
+
+
+def encode_png(image, **options):
+    """Encode image as PNG and return the file contents as bytes."""
+    buffer = io.BytesIO()
+    with stage("png.encode") as info:
+        info["items"] = _encode_png(image, buffer, **options)
+    return buffer.getvalue()
+
+
+def _encode_png(
+    image,
+    f,
+    compress_level=DEFAULT_COMPRESS_LEVEL,
+    bgr=False,
+    band_rows=BAND_ROWS,
+    palette="off",
+    palette_max_error=DEFAULT_PALETTE_MAX_ERROR,
+):
+    """Write the PNG to the binary stream f and return the number of pixels encoded."""
+    arr = to_array(image, bgr=bgr)
+    height, width = arr.shape[:2]
+    channels = 1 if arr.ndim == 2 else arr.shape[2]
+    level = int(np.clip(compress_level, 1, 9))
+
+    extra_chunks = []
+    with stage("png.palette"):
+        indexed = to_indexed(arr, palette, max_error=palette_max_error)
+    if indexed is not None:
+        arr, bit_depth, colours = indexed
+        channels = 1
+        colour_type = INDEXED_COLOUR_TYPE
+        extra_chunks.append(_chunk(b"PLTE", colours[:, :3].tobytes()))
+        if colours.shape[1] == 4:
+            extra_chunks.append(_chunk(b"tRNS", colours[:, 3].tobytes()))
+    else:
+        bit_depth = 8
+        colour_type = COLOUR_TYPES[channels]
+
+    header = struct.pack(">IIBBBBB", width, height, bit_depth, colour_type, 0, 0, 0)
+    bands = [(s, min(height, s + band_rows)) for s in range(0, height, band_rows)]
+    pool = _get_band_pool()
+    # Keep a bounded window of bands in flight so filtered data never exceeds a few bands.
+    in_flight = deque()
+    next_band = 0
+
+    adler = 1
+    f.write(PNG_SIGNATURE)
+    f.write(_chunk(b"IHDR", header))
+    for chunk in extra_chunks:
+        f.write(chunk)
+    f.write(_chunk(b"IDAT", bytes([0x78, ZLIB_FLG.get(level, 0xDA)])))
+    while next_band < len(bands) or in_flight:
+        while next_band < len(bands) and len(in_flight) < 2 * MAX_WORKERS:
+            start, stop = bands[next_band]
+            last = next_band == len(bands) - 1
+            in_flight.append(pool.submit(_compress_band, arr, start, stop, channels, level, last))
+            next_band += 1
+        raw, data = in_flight.popleft().result()
+        adler = zlib.adler32(raw, adler)
+        f.write(_chunk(b"IDAT", data))
+    f.write(_chunk(b"IDAT", struct.pack(">I", adler & 0xFFFFFFFF)))
+    f.write(_chunk(b"IEND", b""))
+    return height * width
+
+
+def save_png(
+    image,
+    path,
+    compress_level=DEFAULT_COMPRESS_LEVEL,
+    bgr=False,
+    background=False,
+    palette="off",
+    palette_max_error=DEFAULT_PALETTE_MAX_ERROR,
+):
+    """Save image as PNG; with background=True, encode on a writer thread and return a Future.
+
+    The array is snapshotted before returning, so the caller may reuse its buffers.
+    """
+    options = {"compress_level": compress_level, "palette": palette, "palette_max_error": palette_max_error}
+    if not background:
+        return write_png(image, path, bgr=bgr, **options)
+    arr = to_array(image, bgr=bgr).copy()
+    future = _get_writer_pool().submit(write_png, arr, path, **options)
+    with _lock:
+        _pending.append(future)
+    return future
+
+
+def wait_for_writes():
+    """Block until every background PNG write has finished, re-raising the first error."""
+    with _lock:
+        pending = list(_pending)
+        _pending.clear()
+    for future in pending:
+        future.result()
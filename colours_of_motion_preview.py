@@ -0,0 +1,46 @@
+import os
+import threading
+from pathlib import Path
+
+# === CONFIGURATION ===
+PREVIEW_SIZE = 1024   # Longest side of a preview render (screen resolution)
+
+
+def add_preview_args(parser):
+    """Add the shared --preview / --progressive flags to an entry point's parser."""
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument(
+        "--preview",
+        action="store_true",
+        help=f"Only render a fast {PREVIEW_SIZE}px preview (*_preview.png) from cached colour data.",
+    )
+    group.add_argument(
+        "--progressive",
+        action="store_true",
+        help="Write the preview first, then refine to full resolution in the background.",
+    )
+    return parser
+
+
+def preview_path(output_path):
+    """circle_full.png -> circle_full_preview.png, keeping the caller's path type."""
+    root, ext = os.path.splitext(os.fspath(output_path))
+    path = f"{root}_preview{ext}"
+    return Path(path) if isinstance(output_path, Path) else path
+
+
+def fit_preview(width, height, size=PREVIEW_SIZE):
+    """Scale (width, height) so the longest side is at most size, keeping the aspect ratio."""
+    scale = min(1.0, size / max(width, height))
+    return max(1, int(round(width * scale))), max(1, int(round(height * scale)))
+
+
+def render_progressive(preview_fn, full_fn):
+    """Run preview_fn now, then full_fn on a background thread; returns that thread.
+
+    The thread is not a daemon, so a script exits only once the full render is written.
+    """
+    preview_fn()
+    thread = threading.Thread(target=full_fn, name="progressive-refine")
+    thread.start()
+    return thread
@@ -1,8 +1,19 @@
+import argparse
 import os
 import subprocess
 import json
-from PIL import Image
-import numpy as np
+import tempfile
+
+from colours_of_motion_lazy import lazy_import
+from colours_of_motion_fingerprint import (
+    load_registry, register_source, registered_folder, save_registry, source_fingerprint,
+)
+from colours_of_motion_manifest import begin_dataset, dataset_status, record_metadata
+from colours_of_motion_profile import add_profile_args, stage, start_profiling
+from colours_of_motion_tonemap import add_tonemap_args, save_extraction_info, select_tonemap
+
+Image = lazy_import("PIL.Image")
+np = lazy_import("numpy")
 
 # === CONFIGURATION ===
 FPS_STANDARD = 0.1   # 1 frame every 10 seconds
@@ -11,32 +22,122 @@ STRIP_HEIGHT = 100   # Height of 1px-wide strips
 PROCESSED_FILE = "processed_files.json"
 FRAME_ROOT = "frames"
 CIRCLE_ROOT = "circle_data"
+CUTS_FILE = "cuts.json"
+SCENE_THRESHOLD = 10.0  # scdet score (0-100) at which a frame starts a new shot
+SCENE_SCAN_WIDTH = 256  # cut detection runs on a downscaled copy of every source frame
 
 # === FRAME EXTRACTION (STANDARD MODE) ===
-def extract_frames(video_path, output_dir, fps):
-    """Extract full frames using ffmpeg with HDR tone mapping."""
+def clear_dataset(directory, prefix):
+    """Remove frames/strips of an earlier extraction so indices start at 1 and nothing stale remains."""
+    for name in os.listdir(directory):
+        if name.startswith(prefix):
+            os.remove(os.path.join(directory, name))
+
+def extract_frames(
+    video_path, output_dir, fps, scene_cuts=False, scene_threshold=SCENE_THRESHOLD, tonemap="auto", crop="auto"
+):
+    """Extract full frames using ffmpeg, tone-mapping HDR sources.
+
+    With scene_cuts, the same pass also scores every source frame with scdet and
+    writes the cut timestamps to cuts.json next to the frames.
+    """
     os.makedirs(output_dir, exist_ok=True)
+    # A re-run (e.g. to add cuts.json) must not keep frames from a longer earlier extraction.
+    clear_dataset(output_dir, "frame_")
+    begin_dataset(output_dir)
+    chain = select_tonemap(video_path, tonemap, crop)
+    log_path = scdet_log_path() if scene_cuts else None
     cmd = [
-        "ffmpeg", "-an", "-sn",
+        "ffmpeg", "-y", "-an", "-sn",
         "-i", video_path,
-        "-map", "0:v",
-        "-vf", (
-            f"fps={fps},"
-            "zscale=t=linear:npl=100,"
-            "format=gbrpf32le,"
-            "zscale=p=bt709,"
-            "tonemap=hable,"
-            "zscale=t=bt709,"
-            "format=yuv420p"
-        ),
+        *sample_filter_args(fps, chain["filter"], log_path, scene_threshold),
         "-q:v", "1", "-fps_mode", "vfr",
         "-loglevel", "warning", "-hide_banner", "-stats",
         os.path.join(output_dir, "frame_%04d.jpg")
     ]
     print(f"[>] Extracting frames (standard): {' '.join(cmd)}")
-    subprocess.run(cmd, check=True)
+    try:
+        with stage("processing.extract_frames"):
+            subprocess.run(cmd, check=True)
+        save_extraction_info(output_dir, video_path, fps, chain)
+        if scene_cuts:
+            with stage("processing.scene_cuts"):
+                cuts = parse_scdet_log(log_path)
+                save_cuts(cuts, output_dir, video_path, fps, scene_threshold)
+    finally:
+        if log_path:
+            os.remove(log_path)
     print("[✓] Frame extraction complete.")
 
+def sample_filter_args(fps, tonemap_filter, scdet_log=None, scene_threshold=SCENE_THRESHOLD):
+    """ffmpeg filter/map arguments that sample at fps; with scdet_log, also score every source frame."""
+    sample_filter = f"fps={fps},{tonemap_filter}"
+    if not scdet_log:
+        return ["-map", "0:v", "-vf", sample_filter]
+    return [
+        "-filter_complex", (
+            "[0:v:0]split=2[scan][keep];"
+            f"[scan]scale={SCENE_SCAN_WIDTH}:-2:flags=fast_bilinear,"
+            f"scdet=threshold={scene_threshold},"
+            f"metadata=mode=print:file={scdet_log},nullsink;"
+            f"[keep]{sample_filter}[out]"
+        ),
+        "-map", "[out]",
+    ]
+
+def scdet_log_path():
+    # Filter option values cannot safely carry film names, so log to a plain temp path.
+    log_fd, log_path = tempfile.mkstemp(prefix="scdet_", suffix=".log")
+    os.close(log_fd)
+    return log_path
+
+# === SCENE CUTS ===
+def parse_scdet_log(log_path):
+    """Read ffmpeg metadata=print output: per-frame times and scores, plus the cuts."""
+    times = []
+    scores = []
+    cuts = []
+    with open(log_path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("frame:"):
+                fields = dict(part.split(":", 1) for part in line.split() if ":" in part)
+                times.append(float(fields["pts_time"]))
+                scores.append(0.0)
+            elif line.startswith("lavfi.scd.score=") and times:
+                scores[-1] = float(line.split("=", 1)[1])
+            elif line.startswith("lavfi.scd.time=") and times:
+                cuts.append(len(times) - 1)
+    return {
+        "times": times,
+        "scores": scores,
+        "cuts": [{"time_s": times[i], "score": scores[i]} for i in cuts],
+    }
+
+def save_cuts(cuts, frame_dir, video_path, fps, threshold):
+    """Write cuts.json: cut timestamps relative to the first frame, next to data.json."""
+    times = cuts["times"]
+    start = times[0] if times else 0.0
+    # The last frame lasts one frame interval; use the typical spacing between frames.
+    interval = float(np.median(np.diff(times))) if len(times) > 1 else 0.0
+    duration = (times[-1] - start + interval) if times else 0.0
+    payload = {
+        "source": os.path.basename(video_path),
+        "sample_fps": fps,
+        "threshold": threshold,
+        "frames_scanned": len(times),
+        "start_s": start,
+        "duration_s": round(duration, 6),
+        "cuts": [
+            {"time_s": round(cut["time_s"] - start, 6), "score": round(cut["score"], 3)}
+            for cut in cuts["cuts"]
+        ],
+    }
+    output_file = os.path.join(frame_dir, CUTS_FILE)
+    with open(output_file, 'w') as f:
+        json.dump(payload, f, indent=2)
+    print(f"[✓] Saved {len(payload['cuts'])} scene cuts to {output_file}")
+
 # === METADATA (Standard mode) ===
 def calculate_frame_data(image_path):
     img = Image.open(image_path).convert('RGB')
@@ -52,51 +153,90 @@ def calculate_frame_data(image_path):
         "saturation": float(saturation)
     }
 
+def build_metadata(frame_dir):
+    """Average colour, brightness and saturation for every extracted frame, in order."""
+    print("[>] Processing metadata...")
+    metadata = []
+    with stage("processing.metadata") as info:
+        for i, file in enumerate(sorted(os.listdir(frame_dir)), 1):
+            if file.lower().endswith(('.jpg', '.jpeg', '.png')):
+                data = calculate_frame_data(os.path.join(frame_dir, file))
+                metadata.append(data)
+                if i % 100 == 0:
+                    print(f"  Processed {i} frames...")
+        info["items"] = len(metadata)
+    return metadata
+
 def save_metadata(metadata, frame_dir):
     output_file = os.path.join(frame_dir, "data.json")
     with open(output_file, 'w') as f:
         json.dump(metadata, f, indent=2)
+    record_metadata(frame_dir, len(metadata))
     print(f"[✓] Metadata saved to {output_file}")
 
 # === CIRCLE MODE EXTRACTION (Direct HDR Tone-Mapped Strips) ===
-def extract_circle_strips(video_path, output_dir, fps=1, strip_height=100):
+def extract_circle_strips(video_path, output_dir, fps=1, strip_height=100, tonemap="auto", crop="auto"):
     """Extract 1px-wide tone-mapped strips directly using ffmpeg."""
     os.makedirs(output_dir, exist_ok=True)
+    clear_dataset(output_dir, "strip_")
+    begin_dataset(output_dir)
+    chain = select_tonemap(video_path, tonemap, crop)
     cmd = [
-        "ffmpeg", "-an", "-sn",
+        "ffmpeg", "-y", "-an", "-sn",
         "-i", video_path,
         "-map", "0:v",
-        "-vf", (
-            f"fps={fps},"
-            "zscale=t=linear:npl=100,"
-            "format=gbrpf32le,"
-            "zscale=p=bt709,"
-            "tonemap=hable,"
-            "zscale=t=bt709,"
-            "format=yuv420p,"
-            f"scale=1:{strip_height}"
-        ),
+        "-vf", f"fps={fps},{chain['filter']},scale=1:{strip_height}",
         "-q:v", "1", "-fps_mode", "vfr",
         "-loglevel", "warning", "-hide_banner", "-stats",
         os.path.join(output_dir, "strip_%04d.png")
     ]
     print(f"[>] Extracting 1px strips (circle mode): {' '.join(cmd)}")
-    subprocess.run(cmd, check=True)
+    with stage("processing.extract_strips"):
+        subprocess.run(cmd, check=True)
+    save_extraction_info(output_dir, video_path, fps, chain, strip_height=strip_height)
     print("[✓] 1px strips extraction complete.")
 
 # === TRACKING PROCESSED FILES ===
 def load_processed():
-    if os.path.exists(PROCESSED_FILE):
-        with open(PROCESSED_FILE, 'r') as f:
-            return json.load(f)
-    return {}
+    return load_registry(PROCESSED_FILE)
 
 def save_processed(data):
-    with open(PROCESSED_FILE, 'w') as f:
-        json.dump(data, f, indent=2)
+    save_registry(PROCESSED_FILE, data)
+
+def frames_extracted(frame_dir):
+    """Whether a finished frame extraction is on disk; the manifest knows if one was interrupted."""
+    status = dataset_status(frame_dir)
+    if status is not None:
+        return status in ("extracted", "complete")
+    return any(file.lower().endswith((".jpg", ".jpeg", ".png")) for file in os.listdir(frame_dir))
+
+def strips_extracted(circle_dir):
+    status = dataset_status(circle_dir)
+    if status is not None:
+        return status == "complete"
+    return bool(os.listdir(circle_dir))
 
 # === MAIN ===
+def parse_args():
+    parser = argparse.ArgumentParser(description="Extract frames or circle strips from a video file.")
+    parser.add_argument(
+        "--scene-cuts",
+        action="store_true",
+        help="Standard mode: detect scene cuts on the full-rate stream in the same ffmpeg pass (writes cuts.json).",
+    )
+    parser.add_argument(
+        "--scene-threshold",
+        type=float,
+        default=SCENE_THRESHOLD,
+        help="scdet score (0-100) that counts as a cut.",
+    )
+    add_tonemap_args(parser)
+    add_profile_args(parser)
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
+    start_profiling(args, "processing")
     processed = load_processed()
     reuse = "n"
     video_path = ""
@@ -114,42 +254,61 @@ def main():
             print("[✗] Video not found.")
             return
         folder_name = input("Enter folder name (e.g. 'Aliens (1986) - tt0090605'): ").strip()
+    elif not os.path.exists(video_path):
+        print("[✗] Last video is no longer there; answer n and give its new path.")
+        return
+
+    # Skips are keyed by content: a moved file is still known, a replaced one is not.
+    with stage("processing.fingerprint"):
+        fingerprint = source_fingerprint(video_path)
+    known_folder = registered_folder(processed, fingerprint, video_path)
+    if known_folder and known_folder != folder_name:
+        print(f"[!] This file was already processed as {known_folder}.")
+    same_source = known_folder == folder_name
 
     # Choose mode
-    mode = input("Choose mode: [1] Standard (radial/vertical) [2] Circle (donut poster): ").strip()
-    mode = "2" if mode == "2" else "1"
+    mode = input(
+        "Choose mode: [1] Standard (radial/vertical) [2] Circle (donut poster) "
+        "[3] All (one 1 fps extraction, derive the rest): "
+    ).strip()
+    mode = mode if mode in ("2", "3") else "1"
+
+    if mode == "3":
+        import colours_of_motion_decimate as decimate
 
-    if mode == "1":
+        master_dir = decimate.profile_dir(decimate.MASTER_PROFILE, folder_name)
+        os.makedirs(master_dir, exist_ok=True)
+        has_frames = frames_extracted(master_dir)
+        needs_cuts = args.scene_cuts and not os.path.exists(os.path.join(master_dir, CUTS_FILE))
+        if same_source and has_frames and not needs_cuts:
+            print("[!] Video previously processed – skipping extraction.")
+        else:
+            master_fps = decimate.PROFILES[decimate.MASTER_PROFILE][2]
+            extract_frames(video_path, master_dir, master_fps, args.scene_cuts, args.scene_threshold, args.tonemap, args.crop)
+        save_metadata(build_metadata(master_dir), master_dir)
+        decimate.derive_profiles(folder_name)
+
+    elif mode == "1":
         frame_dir = os.path.join(FRAME_ROOT, folder_name)
         os.makedirs(frame_dir, exist_ok=True)
-        has_frames = any(
-            file.lower().endswith((".jpg", ".jpeg", ".png"))
-            for file in os.listdir(frame_dir)
-        )
-        if processed.get("last_video", {}).get("folder") == folder_name and has_frames:
+        has_frames = frames_extracted(frame_dir)
+        needs_cuts = args.scene_cuts and not os.path.exists(os.path.join(frame_dir, CUTS_FILE))
+        if same_source and has_frames and not needs_cuts:
             print("[!] Video previously processed – skipping extraction.")
         else:
-            extract_frames(video_path, frame_dir, FPS_STANDARD)
-        print("[>] Processing metadata...")
-        metadata = []
-        for i, file in enumerate(sorted(os.listdir(frame_dir)), 1):
-            if file.lower().endswith(('.jpg', '.jpeg', '.png')):
-                data = calculate_frame_data(os.path.join(frame_dir, file))
-                metadata.append(data)
-                if i % 100 == 0:
-                    print(f"  Processed {i} frames...")
-        save_metadata(metadata, frame_dir)
+            extract_frames(video_path, frame_dir, FPS_STANDARD, args.scene_cuts, args.scene_threshold, args.tonemap, args.crop)
+        save_metadata(build_metadata(frame_dir), frame_dir)
 
     else:
         circle_dir = os.path.join(CIRCLE_ROOT, folder_name)
         os.makedirs(circle_dir, exist_ok=True)
-        if os.listdir(circle_dir):
+        if same_source and strips_extracted(circle_dir):
             print("[!] Circle data already processed – skipping extraction.")
         else:
-            extract_circle_strips(video_path, circle_dir, FPS_CIRCLE, STRIP_HEIGHT)
+            extract_circle_strips(video_path, circle_dir, FPS_CIRCLE, STRIP_HEIGHT, args.tonemap, args.crop)
 
     # Save last video info
-    processed["last_video"] = {"path": video_path, "folder": folder_name}
+    register_source(processed, fingerprint, video_path, folder_name)
     save_processed(processed)
     print("[✓] Processing complete.")
 
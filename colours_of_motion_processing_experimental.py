@@ -1,8 +1,18 @@
+import argparse
 import os
 import subprocess
 import json
-from PIL import Image
-import numpy as np
+
+from colours_of_motion_lazy import lazy_import
+from colours_of_motion_fingerprint import (
+    load_registry, register_source, registered_folder, save_registry, source_fingerprint,
+)
+from colours_of_motion_manifest import begin_dataset, dataset_status, record_metadata
+from colours_of_motion_profile import add_profile_args, stage, start_profiling
+from colours_of_motion_tonemap import add_tonemap_args, save_extraction_info, select_tonemap
+
+Image = lazy_import("PIL.Image")
+np = lazy_import("numpy")
 
 # === CONFIGURATION ===
 FPS_STANDARD = 1     # Experimental: 1 frame every second
@@ -14,28 +24,24 @@ CIRCLE_ROOT = "circle_data"
 EXPERIMENTAL_SUFFIX = "_experimental"
 
 # === FRAME EXTRACTION (STANDARD MODE) ===
-def extract_frames(video_path, output_dir, fps):
-    """Extract full frames using ffmpeg with HDR tone mapping."""
+def extract_frames(video_path, output_dir, fps, tonemap="auto", crop="auto"):
+    """Extract full frames using ffmpeg, tone-mapping HDR sources."""
     os.makedirs(output_dir, exist_ok=True)
+    begin_dataset(output_dir)
+    chain = select_tonemap(video_path, tonemap, crop)
     cmd = [
         "ffmpeg", "-an", "-sn",
         "-i", video_path,
         "-map", "0:v",
-        "-vf", (
-            f"fps={fps},"
-            "zscale=t=linear:npl=100,"
-            "format=gbrpf32le,"
-            "zscale=p=bt709,"
-            "tonemap=hable,"
-            "zscale=t=bt709,"
-            "format=yuv420p"
-        ),
+        "-vf", f"fps={fps},{chain['filter']}",
         "-q:v", "1", "-fps_mode", "vfr",
         "-loglevel", "warning", "-hide_banner", "-stats",
         os.path.join(output_dir, "frame_%04d.jpg")
     ]
     print(f"[>] Extracting frames (standard): {' '.join(cmd)}")
-    subprocess.run(cmd, check=True)
+    with stage("processing.extract_frames"):
+        subprocess.run(cmd, check=True)
+    save_extraction_info(output_dir, video_path, fps, chain)
     print("[✓] Frame extraction complete.")
 
 # === METADATA (Standard mode) ===
@@ -57,47 +63,60 @@ def save_metadata(metadata, frame_dir):
     output_file = os.path.join(frame_dir, "data.json")
     with open(output_file, 'w') as f:
         json.dump(metadata, f, indent=2)
+    record_metadata(frame_dir, len(metadata))
     print(f"[✓] Metadata saved to {output_file}")
 
 # === CIRCLE MODE EXTRACTION (Direct HDR Tone-Mapped Strips) ===
-def extract_circle_strips(video_path, output_dir, fps=1, strip_height=100):
+def extract_circle_strips(video_path, output_dir, fps=1, strip_height=100, tonemap="auto", crop="auto"):
     """Extract 1px-wide tone-mapped strips directly using ffmpeg."""
     os.makedirs(output_dir, exist_ok=True)
+    begin_dataset(output_dir)
+    chain = select_tonemap(video_path, tonemap, crop)
     cmd = [
         "ffmpeg", "-an", "-sn",
         "-i", video_path,
         "-map", "0:v",
-        "-vf", (
-            f"fps={fps},"
-            "zscale=t=linear:npl=100,"
-            "format=gbrpf32le,"
-            "zscale=p=bt709,"
-            "tonemap=hable,"
-            "zscale=t=bt709,"
-            "format=yuv420p,"
-            f"scale=1:{strip_height}"
-        ),
+        "-vf", f"fps={fps},{chain['filter']},scale=1:{strip_height}",
         "-q:v", "1", "-fps_mode", "vfr",
         "-loglevel", "warning", "-hide_banner", "-stats",
         os.path.join(output_dir, "strip_%04d.png")
     ]
     print(f"[>] Extracting 1px strips (circle mode): {' '.join(cmd)}")
-    subprocess.run(cmd, check=True)
+    with stage("processing.extract_strips"):
+        subprocess.run(cmd, check=True)
+    save_extraction_info(output_dir, video_path, fps, chain, strip_height=strip_height)
     print("[✓] 1px strips extraction complete.")
 
 # === TRACKING PROCESSED FILES ===
 def load_processed():
-    if os.path.exists(PROCESSED_FILE):
-        with open(PROCESSED_FILE, 'r') as f:
-            return json.load(f)
-    return {}
+    return load_registry(PROCESSED_FILE)
 
 def save_processed(data):
-    with open(PROCESSED_FILE, 'w') as f:
-        json.dump(data, f, indent=2)
+    save_registry(PROCESSED_FILE, data)
+
+def frames_extracted(frame_dir):
+    """Whether a finished frame extraction is on disk; the manifest knows if one was interrupted."""
+    status = dataset_status(frame_dir)
+    if status is not None:
+        return status in ("extracted", "complete")
+    return any(file.lower().endswith((".jpg", ".jpeg", ".png")) for file in os.listdir(frame_dir))
+
+def strips_extracted(circle_dir):
+    status = dataset_status(circle_dir)
+    if status is not None:
+        return status == "complete"
+    return bool(os.listdir(circle_dir))
 
 # === MAIN ===
+def parse_args():
+    parser = argparse.ArgumentParser(description="Extract frames or circle strips from a video file.")
+    add_tonemap_args(parser)
+    add_profile_args(parser)
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
+    start_profiling(args, "processing_experimental")
     processed = load_processed()
     reuse = "n"
     video_path = ""
@@ -115,11 +134,22 @@ def main():
             print("[✗] Video not found.")
             return
         folder_name = input("Enter folder name (e.g. 'Aliens (1986) - tt0090605'): ").strip()
+    elif not os.path.exists(video_path):
+        print("[✗] Last video is no longer there; answer n and give its new path.")
+        return
 
     # Experimental runs always write to suffixed folders to keep originals untouched.
     if not folder_name.endswith(EXPERIMENTAL_SUFFIX):
         folder_name = f"{folder_name}{EXPERIMENTAL_SUFFIX}"
 
+    # Skips are keyed by content: a moved file is still known, a replaced one is not.
+    with stage("processing_experimental.fingerprint"):
+        fingerprint = source_fingerprint(video_path)
+    known_folder = registered_folder(processed, fingerprint, video_path)
+    if known_folder and known_folder != folder_name:
+        print(f"[!] This file was already processed as {known_folder}.")
+    same_source = known_folder == folder_name
+
     # Choose mode
     mode = input("Choose mode: [1] Standard (radial/vertical) [2] Circle (donut poster): ").strip()
     mode = "2" if mode == "2" else "1"
@@ -127,34 +157,33 @@ def main():
     if mode == "1":
         frame_dir = os.path.join(FRAME_ROOT, folder_name)
         os.makedirs(frame_dir, exist_ok=True)
-        has_frames = any(
-            file.lower().endswith((".jpg", ".jpeg", ".png"))
-            for file in os.listdir(frame_dir)
-        )
-        if processed.get("last_video", {}).get("folder") == folder_name and has_frames:
+        has_frames = frames_extracted(frame_dir)
+        if same_source and has_frames:
             print("[!] Video previously processed – skipping extraction.")
         else:
-            extract_frames(video_path, frame_dir, FPS_STANDARD)
+            extract_frames(video_path, frame_dir, FPS_STANDARD, args.tonemap, args.crop)
         print("[>] Processing metadata...")
         metadata = []
-        for i, file in enumerate(sorted(os.listdir(frame_dir)), 1):
-            if file.lower().endswith(('.jpg', '.jpeg', '.png')):
-                data = calculate_frame_data(os.path.join(frame_dir, file))
-                metadata.append(data)
-                if i % 100 == 0:
-                    print(f"  Processed {i} frames...")
+        with stage("processing.metadata") as info:
+            for i, file in enumerate(sorted(os.listdir(frame_dir)), 1):
+                if file.lower().endswith(('.jpg', '.jpeg', '.png')):
+                    data = calculate_frame_data(os.path.join(frame_dir, file))
+                    metadata.append(data)
+                    if i % 100 == 0:
+                        print(f"  Processed {i} frames...")
+            info["items"] = len(metadata)
         save_metadata(metadata, frame_dir)
 
     else:
         circle_dir = os.path.join(CIRCLE_ROOT, folder_name)
         os.makedirs(circle_dir, exist_ok=True)
-        if os.listdir(circle_dir):
+        if same_source and strips_extracted(circle_dir):
             print("[!] Circle data already processed – skipping extraction.")
         else:
-            extract_circle_strips(video_path, circle_dir, FPS_CIRCLE, STRIP_HEIGHT)
+            extract_circle_strips(video_path, circle_dir, FPS_CIRCLE, STRIP_HEIGHT, args.tonemap, args.crop)
 
     # Save last video info
-    processed["last_video"] = {"path": video_path, "folder": folder_name}
+    register_source(processed, fingerprint, video_path, folder_name)
     save_processed(processed)
     print("[✓] Processing complete.")
 
@@ -0,0 +1,169 @@
+import atexit
+import cProfile
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+# === CONFIGURATION ===
+PROFILE_DIR = Path("logs")
+
+_active = None
+
+
+def add_profile_args(parser):
+    """Add the shared --profile / --profile-cprofile flags to an entry point's parser."""
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="PATH",
+        help="Record per-stage wall/CPU time, peak RSS and item counts as JSONL "
+        "(default path: logs/profile_<timestamp>.jsonl).",
+    )
+    parser.add_argument(
+        "--profile-cprofile",
+        action="append",
+        default=[],
+        metavar="STAGE",
+        help="Also run cProfile around stages whose name starts with STAGE (repeatable); "
+        "writes .prof files next to the profile log.",
+    )
+    return parser
+
+
+def _rss_mb(who=resource.RUSAGE_SELF):
+    # ru_maxrss is bytes on macOS and KiB on Linux.
+    unit = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(who).ru_maxrss * unit / 1e6
+
+
+def _child_cpu():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class Profiler:
+    """Writes one JSONL record per completed stage.
+
+    CPU time is process-wide (it includes PNG band threads and other workers) and
+    ffmpeg time is reported separately as child CPU. Peak RSS is the process high
+    water mark when the stage ends, so it only ever grows within a run.
+    """
+
+    def __init__(self, path, entry, cprofile_prefixes=()):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.entry = entry
+        self.run_id = f"{entry}-{datetime.now().strftime('%Y%m%d_%H%M%S')}-{os.getpid()}"
+        self.cprofile_prefixes = tuple(cprofile_prefixes)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._started = (time.perf_counter(), time.process_time(), _child_cpu())
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def _write(self, record):
+        with self._lock, self.path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=True) + "\n")
+
+    def _wants_cprofile(self, name):
+        return any(name.startswith(prefix) for prefix in self.cprofile_prefixes)
+
+    @contextmanager
+    def stage(self, name, items=None):
+        stack = self._stack()
+        info = {"items": items}
+        parent = stack[-1] if stack else None
+        stack.append(name)
+        # cProfile cannot nest, so only the outermost matching stage in a thread is profiled.
+        profiler = None
+        if self._wants_cprofile(name) and not getattr(self._local, "profiling", False):
+            profiler = cProfile.Profile()
+            self._local.profiling = True
+            profiler.enable()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        child_start = _child_cpu()
+        try:
+            yield info
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            child_cpu = _child_cpu() - child_start
+            record = {
+                "run_id": self.run_id,
+                "entry": self.entry,
+                "stage": name,
+                "parent": parent,
+                "ts_utc": datetime.now(timezone.utc).isoformat(),
+                "wall_s": round(wall, 6),
+                "cpu_s": round(cpu, 6),
+                "child_cpu_s": round(child_cpu, 6),
+                "peak_rss_mb": round(_rss_mb(), 2),
+                "child_peak_rss_mb": round(_rss_mb(resource.RUSAGE_CHILDREN), 2),
+                "items": info.get("items"),
+                "thread": threading.current_thread().name,
+            }
+            if profiler is not None:
+                profiler.disable()
+                self._local.profiling = False
+                prof_path = self.path.with_name(f"{self.run_id}_{name}.prof")
+                profiler.dump_stats(str(prof_path))
+                record["cprofile"] = str(prof_path)
+            stack.pop()
+            self._write(record)
+
+    def close(self):
+        wall_start, cpu_start, child_start = self._started
+        self._write({
+            "run_id": self.run_id,
+            "entry": self.entry,
+            "stage": f"{self.entry}.total",
+            "parent": None,
+            "ts_utc": datetime.now(timezone.utc).isoformat(),
+            "wall_s": round(time.perf_counter() - wall_start, 6),
+            "cpu_s": round(time.process_time() - cpu_start, 6),
+            "child_cpu_s": round(_child_cpu() - child_start, 6),
+            "peak_rss_mb": round(_rss_mb(), 2),
+            "child_peak_rss_mb": round(_rss_mb(resource.RUSAGE_CHILDREN), 2),
+            "items": None,
+            "thread": threading.current_thread().name,
+        })
+
+
+@contextmanager
+def _null_stage():
+    yield {}
+
+
+def stage(name, items=None):
+    """Time a named pipeline stage; a no-op unless profiling was started.
+
+    Use as `with stage("circle.pieslice", items=n) as info:`; set info["items"]
+    inside the block when the count is only known afterwards.
+    """
+    if _active is None:
+        return _null_stage()
+    return _active.stage(name, items=items)
+
+
+def start_profiling(args, entry):
+    """Enable profiling for this process when --profile was given; closes itself at exit."""
+    global _active
+    if getattr(args, "profile", None) is None:
+        return None
+    path = args.profile or PROFILE_DIR / f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"
+    _active = Profiler(path, entry, getattr(args, "profile_cprofile", ()))
+    atexit.register(_active.close)
+    print(f"[>] Profiling {entry} stages to {path}")
+    return _active
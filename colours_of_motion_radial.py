@@ -2,8 +2,22 @@ import os
 import subprocess
 import json
 import argparse
-import numpy as np
-import cv2
+import math
+from functools import lru_cache
+
+from colours_of_motion_binning import fit_colours
+from colours_of_motion_fingerprint import (
+    load_registry, register_source, registered_folder, save_registry, source_fingerprint,
+)
+from colours_of_motion_lazy import lazy_import
+from colours_of_motion_manifest import begin_dataset
+from colours_of_motion_png import PALETTE_MODES, save_png
+from colours_of_motion_preview import PREVIEW_SIZE, add_preview_args, preview_path
+from colours_of_motion_profile import add_profile_args, stage, start_profiling
+from colours_of_motion_tonemap import add_tonemap_args, save_extraction_info, select_tonemap
+
+np = lazy_import("numpy")
+cv2 = lazy_import("cv2")
 
 # === CONFIGURATION ===
 FPS = 0.1
@@ -20,29 +34,31 @@ QUICK_STRIPE_WIDTH = 2
 HQ_STRIPE_WIDTH = 4
 
 # === FRAME EXTRACTION ===
-def extract_frames(video_path, frame_dir, fps=FPS):
-    """Extracts HDR frames with tone mapping using ffmpeg."""
+def extract_frames(video_path, frame_dir, fps=FPS, tonemap="auto", crop="auto"):
+    """Extracts frames using ffmpeg, tone-mapping HDR sources."""
     os.makedirs(frame_dir, exist_ok=True)
+    begin_dataset(frame_dir)
+    chain = select_tonemap(video_path, tonemap, crop)
     cmd = [
         "ffmpeg", "-an", "-sn", "-i", video_path,
-        "-vf", (
-            f"fps={fps},"
-            "zscale=t=linear:npl=100,"
-            "format=gbrpf32le,"
-            "zscale=p=bt709,"
-            "tonemap=hable,"
-            "zscale=t=bt709,"
-            "format=yuv420p"
-        ),
+        "-vf", f"fps={fps},{chain['filter']}",
         "-q:v", "1", "-vsync", "0", "-frame_pts", "1", "-fps_mode", "vfr",
         "-loglevel", "warning", "-hide_banner", "-stats",
         os.path.join(frame_dir, "frame_%04d.jpg")
     ]
-    print(f"[>] Extracting frames with tone mapping:\n{' '.join(cmd)}")
-    subprocess.run(cmd, check=True)
-    print("[✓] HDR tone-mapped frame extraction complete.")
+    print(f"[>] Extracting frames ({chain['tonemap']}):\n{' '.join(cmd)}")
+    with stage("radial.extract_frames"):
+        subprocess.run(cmd, check=True)
+    save_extraction_info(frame_dir, video_path, fps, chain)
+    print("[✓] Frame extraction complete.")
 
-def build_horizontal_timeline(frame_dir, output_path, line_height=HQ_LINE_HEIGHT, stripe_width=HQ_STRIPE_WIDTH):
+def build_horizontal_timeline(
+    frame_dir,
+    output_path,
+    line_height=HQ_LINE_HEIGHT,
+    stripe_width=HQ_STRIPE_WIDTH,
+    palette="auto",
+):
     """Build a horizontal average-colour timeline from extracted frames."""
     frame_files = sorted(
         f for f in os.listdir(frame_dir)
@@ -52,62 +68,116 @@ def build_horizontal_timeline(frame_dir, output_path, line_height=HQ_LINE_HEIGHT
         raise ValueError("No frame images found to build horizontal timeline.")
 
     colours = []
-    for file in frame_files:
-        path = os.path.join(frame_dir, file)
-        frame = cv2.imread(path)
-        if frame is None:
-            continue
-        # cv2 uses BGR; keep BGR throughout to avoid channel swapping later.
-        avg_bgr = frame.mean(axis=(0, 1))
-        colours.append(avg_bgr.astype(np.uint8))
+    with stage("radial.frame_means", items=len(frame_files)):
+        for file in frame_files:
+            path = os.path.join(frame_dir, file)
+            frame = cv2.imread(path)
+            if frame is None:
+                continue
+            # cv2 uses BGR; keep BGR throughout to avoid channel swapping later.
+            avg_bgr = frame.mean(axis=(0, 1))
+            colours.append(avg_bgr.astype(np.uint8))
 
     if not colours:
         raise ValueError("No valid frame images found to build horizontal timeline.")
 
+    timeline = render_horizontal_timeline(colours, line_height, stripe_width)
+    save_png(timeline, output_path, bgr=True, palette=palette)
+    print(f"[✓] Saved horizontal timeline: {output_path}")
+
+def render_horizontal_timeline(colours, line_height=HQ_LINE_HEIGHT, stripe_width=HQ_STRIPE_WIDTH):
+    """One stripe_width-wide stripe per frame colour (BGR in, BGR out)."""
     width = max(1, len(colours) * stripe_width)
     timeline = np.zeros((line_height, width, 3), dtype=np.uint8)
     for i, colour in enumerate(colours):
         start_x = i * stripe_width
         end_x = start_x + stripe_width
         timeline[:, start_x:end_x] = colour
-
-    cv2.imwrite(output_path, timeline)
-    print(f"[✓] Saved horizontal timeline: {output_path}")
+    return timeline
 
 # === RADIAL IMAGE BUILDER ===
-def build_radial_image(image_path, output_path, resolution=3000):
-    print("[>] Building radial image...")
-    src = cv2.imread(image_path)
-    if src is None:
-        raise ValueError(f"Could not read image: {image_path}")
-
+@lru_cache(maxsize=4)
+def radial_positions(resolution):
+    """Timeline position (0..1) of every output pixel, by distance from the top-left corner."""
     # Sample slightly in from both ends to avoid first/last-frame edge artifacts.
+    norm_dist = _radial_band(resolution, 0, resolution)
+    norm_dist.setflags(write=False)
+    return norm_dist
+
+def _radial_band(resolution, start, stop):
+    """radial_positions for rows start..stop only."""
     sample_start = 0.005
     sample_end = 0.995
-    src_mid_y = src.shape[0] // 2
-
-    y_grid, x_grid = np.indices((resolution, resolution), dtype=np.float32)
+    y_grid = np.arange(start, stop, dtype=np.float32)[:, None]
+    x_grid = np.arange(resolution, dtype=np.float32)[None, :]
     max_dist = np.hypot(resolution - 1, resolution - 1)
     norm_dist = np.sqrt(x_grid * x_grid + y_grid * y_grid) / max_dist
     norm_dist = np.clip(norm_dist, 0.0, 1.0)
-    norm_dist = sample_start + (sample_end - sample_start) * norm_dist
+    return sample_start + (sample_end - sample_start) * norm_dist
 
-    src_x = np.clip((norm_dist * (src.shape[1] - 1)).astype(np.int32), 0, src.shape[1] - 1)
-    result = src[src_mid_y, src_x]
+def radial_row(src, resolution):
+    """Middle row of a BGR timeline, binned in linear light to the distances the output can show."""
+    return fit_colours(src[src.shape[0] // 2], math.ceil(math.hypot(resolution, resolution)))
 
-    cv2.imwrite(output_path, result)
+def render_radial(src, resolution):
+    """Map the middle row of a BGR timeline onto quarter-circle distance from the top-left corner."""
+    row = radial_row(src, resolution)
+
+    with stage("radial.polar", items=resolution * resolution):
+        norm_dist = radial_positions(resolution)
+        src_x = np.clip((norm_dist * (len(row) - 1)).astype(np.int32), 0, len(row) - 1)
+        return row[src_x]
+
+def iter_radial_rows(src, resolution, chunk_rows=256):
+    """Yield (start_row, rows) bands of render_radial (BGR, like src)."""
+    row = radial_row(src, resolution)
+    for start in range(0, resolution, chunk_rows):
+        norm_dist = _radial_band(resolution, start, min(resolution, start + chunk_rows))
+        src_x = np.clip((norm_dist * (len(row) - 1)).astype(np.int32), 0, len(row) - 1)
+        yield start, row[src_x]
+
+def build_radial_image(image_path, output_path, resolution=3000):
+    print("[>] Building radial image...")
+    src = cv2.imread(image_path)
+    if src is None:
+        raise ValueError(f"Could not read image: {image_path}")
+    save_png(render_radial(src, resolution), output_path, bgr=True)
     print(f"[✓] Saved radial image: {output_path}")
 
+def load_radial_source(frame_dir, horizontal_path):
+    """BGR timeline for the radial renderer: linear_hq.png, else a row built from data.json."""
+    src = cv2.imread(horizontal_path) if os.path.exists(horizontal_path) else None
+    if src is not None:
+        return src
+    data_file = os.path.join(frame_dir, "data.json")
+    if not os.path.exists(data_file):
+        raise FileNotFoundError(f"No cached timeline or data.json for {frame_dir}")
+    with open(data_file, "r") as f:
+        colours = [frame["color"] for frame in json.load(f)]
+    if not colours:
+        raise ValueError(f"data.json is empty in {frame_dir}")
+    # data.json stores RGB; the radial renderer works on BGR rows like cv2.imread.
+    return np.array(colours, dtype=np.uint8)[None, :, ::-1]
+
+def build_radial_preview(frame_dir, horizontal_path, output_path, resolution=PREVIEW_SIZE):
+    """Render a small radial image from cached colours: linear_hq.png, else data.json."""
+    try:
+        src = load_radial_source(frame_dir, horizontal_path)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"[!] {e} – skipping preview.")
+        return False
+    with stage("radial.preview", items=resolution * resolution):
+        result = render_radial(src, resolution)
+    save_png(result, output_path, bgr=True)
+    print(f"[✓] Saved radial preview: {output_path}")
+    return True
+
 # === TRACKING PROCESSED FILES ===
 def load_processed():
-    if os.path.exists(PROCESSED_FILE):
-        with open(PROCESSED_FILE, 'r') as f:
-            return json.load(f)
-    return {}
+    return load_registry(PROCESSED_FILE)
 
 def save_processed(data):
-    with open(PROCESSED_FILE, 'w') as f:
-        json.dump(data, f, indent=2)
+    save_registry(PROCESSED_FILE, data)
 
 # === MAIN ===
 def parse_args():
@@ -117,19 +187,30 @@ def parse_args():
         action="store_true",
         help="Use high-resolution output without interactive prompt.",
     )
+    parser.add_argument(
+        "--png-palette",
+        choices=PALETTE_MODES,
+        default="auto",
+        help="Indexed PNG output: auto (only when lossless), quantize (lossy within a bound) or off.",
+    )
+    add_preview_args(parser)
+    add_tonemap_args(parser)
+    add_profile_args(parser)
     return parser.parse_args()
 
 def main():
     args = parse_args()
+    start_profiling(args, "radial")
     processed = load_processed()
     last_video = None
     last_folder = None
-    if processed:
+    legacy = [(path, folder) for path, folder in processed.items() if isinstance(folder, str)]
+    if "last_video" in processed or legacy:
         if "last_video" in processed:
             last_video = processed["last_video"].get("path")
             last_folder = processed["last_video"].get("folder")
         else:
-            last_video, last_folder = list(processed.items())[-1]
+            last_video, last_folder = legacy[-1]
         reuse = input(f"Reuse last video? ({last_video}) [y/n]: ").strip().lower()
     else:
         reuse = "n"
@@ -137,6 +218,9 @@ def main():
     if reuse == "y" and last_video and last_folder:
         video_path = last_video
         folder_name = last_folder
+        if not os.path.exists(video_path):
+            print("[✗] Last video is no longer there; answer n and give its new path.")
+            return
     else:
         video_path = input("Enter full path to video file: ").strip()
         if not os.path.exists(video_path):
@@ -147,6 +231,14 @@ def main():
     frame_dir = os.path.join(FRAME_ROOT, folder_name)
     output_dir = os.path.join(OUTPUT_ROOT, folder_name)
     os.makedirs(output_dir, exist_ok=True)
+    horizontal_path = os.path.join(output_dir, "linear_hq.png")
+    radial_out = os.path.join(output_dir, "radial_hq.png")
+
+    # Previews only use colours already on disk, so they come before any extraction.
+    if args.preview or args.progressive:
+        build_radial_preview(frame_dir, horizontal_path, preview_path(radial_out))
+        if args.preview:
+            return
 
     if args.poster_mode:
         poster_mode = True
@@ -156,30 +248,25 @@ def main():
     line_height = HQ_LINE_HEIGHT if poster_mode else QUICK_LINE_HEIGHT
     stripe_width = HQ_STRIPE_WIDTH if poster_mode else QUICK_STRIPE_WIDTH
 
-    already_processed = False
-    if processed.get(video_path) == folder_name:
-        already_processed = True
-    elif processed.get("last_video", {}).get("path") == video_path and processed.get("last_video", {}).get("folder") == folder_name:
-        already_processed = True
-    if already_processed:
+    # Skips are keyed by content: a moved file is still known, a replaced one is not.
+    with stage("radial.fingerprint"):
+        fingerprint = source_fingerprint(video_path)
+    if registered_folder(processed, fingerprint, video_path) == folder_name:
         print("[!] Video previously processed – skipping frame extraction.")
     else:
-        extract_frames(video_path, frame_dir, FPS)
-        processed[video_path] = folder_name
-        processed["last_video"] = {"path": video_path, "folder": folder_name}
-        save_processed(processed)
+        extract_frames(video_path, frame_dir, FPS, args.tonemap, args.crop)
+    register_source(processed, fingerprint, video_path, folder_name)
+    save_processed(processed)
 
     # Use existing horizontal timeline or build one from extracted frames.
-    horizontal_path = os.path.join(output_dir, "linear_hq.png")
     if not os.path.exists(horizontal_path):
         print("[!] No horizontal timeline found. Building linear_hq.png from frame averages.")
         try:
-            build_horizontal_timeline(frame_dir, horizontal_path, line_height, stripe_width)
+            build_horizontal_timeline(frame_dir, horizontal_path, line_height, stripe_width, palette=args.png_palette)
         except ValueError as e:
             print(f"[✗] {e}")
             return
 
-    radial_out = os.path.join(output_dir, "radial_hq.png")
     build_radial_image(horizontal_path, radial_out, resolution)
 
 if __name__ == "__main__":
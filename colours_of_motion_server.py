@@ -0,0 +1,603 @@
+import argparse
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+import colours_of_motion_circle as circle
+import colours_of_motion_donut as donut
+import colours_of_motion_radial as radial
+import colours_of_motion_shots as shots
+import colours_of_motion_similarity as similarity
+import colours_of_motion_vertical as vertical
+import ozonelab_style as ozonelab
+from colours_of_motion_lazy import lazy_import, load_now
+from colours_of_motion_png import PALETTE_MODES, encode_png
+from colours_of_motion_profile import add_profile_args, stage, start_profiling
+
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+
+# === CONFIGURATION ===
+FRAME_ROOT = "frames"
+CIRCLE_ROOT = "circle_data"
+OUTPUT_ROOT = "outputs"
+METADATA_PATH = Path("metadata") / "poster_metadata.json"
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_CACHE_MB = 512        # Budget for encoded PNGs kept in memory
+MAX_SIDE = 24000              # Largest width/height a request may ask for
+MAX_PIXELS = 80_000_000       # Largest width*height a request may ask for
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Serve Colours of Motion renders over local HTTP with warm in-memory caches."
+    )
+    parser.add_argument("--host", default=DEFAULT_HOST, help="Interface to bind.")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on.")
+    parser.add_argument(
+        "--cache-mb",
+        type=int,
+        default=DEFAULT_CACHE_MB,
+        help="Memory budget for rendered PNGs; least recently used renders are evicted first.",
+    )
+    parser.add_argument(
+        "--preload",
+        action="store_true",
+        help="Load every film's data.json at startup instead of on first request.",
+    )
+    add_profile_args(parser)
+    return parser.parse_args()
+
+
+# === SOURCE FILES ===
+def source_signature(paths):
+    """(path, mtime, size) for each source; changes whenever a source is rewritten."""
+    signature = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            signature.append((str(path), st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            signature.append((str(path), None, None))
+    return tuple(signature)
+
+
+def list_films():
+    films = set()
+    for root in (FRAME_ROOT, CIRCLE_ROOT):
+        if os.path.isdir(root):
+            films.update(f for f in os.listdir(root) if os.path.isdir(os.path.join(root, f)))
+    return sorted(films)
+
+
+def film_paths(film):
+    frame_dir = Path(FRAME_ROOT) / film
+    output_dir = Path(OUTPUT_ROOT) / film
+    return {
+        "frame_dir": frame_dir,
+        "data_json": frame_dir / "data.json",
+        "strip_dir": Path(CIRCLE_ROOT) / film,
+        "linear_hq": output_dir / "linear_hq.png",
+        "shot_json": output_dir / "shot_palettes.json",
+        "circle_png": output_dir / "circle_full.png",
+    }
+
+
+# === WARM FILM DATA ===
+class FilmStore:
+    """Per-film inputs parsed once and kept in memory until their source files change."""
+
+    def __init__(self):
+        self._entries = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def _get(self, film, name, sources, loader):
+        key = (film, name)
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        with lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == source_signature(sources):
+                return entry[1]
+            with stage(f"server.load.{name}"):
+                value = loader()
+            # Signed after loading, so a loader that rewrites its own source (the
+            # metadata catalog) does not invalidate itself on the next request.
+            self._entries[key] = (source_signature(sources), value)
+            return value
+
+    def frames(self, film):
+        """(colours uint8 Nx3 RGB, brightness float64 N) from data.json."""
+        path = film_paths(film)["data_json"]
+
+        def load():
+            if not path.exists():
+                raise FileNotFoundError(f"No data.json for {film}")
+            with path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+            if not data:
+                raise ValueError(f"data.json is empty for {film}")
+            colours = np.array([frame["color"] for frame in data], dtype=np.uint8)
+            brightness = np.array([frame.get("brightness", 0.0) for frame in data], dtype=np.float64)
+            return colours, brightness
+
+        return self._get(film, "frames", [path], load)
+
+    def strip_timeline(self, film):
+        strip_dir = film_paths(film)["strip_dir"]
+
+        def load():
+            if not strip_dir.is_dir():
+                raise FileNotFoundError(f"No circle strips for {film}")
+            return donut.load_strip_timeline(str(strip_dir))
+
+        return self._get(film, "strips", [strip_dir], load)
+
+    def radial_source(self, film):
+        paths = film_paths(film)
+        sources = [paths["linear_hq"], paths["data_json"]]
+        return self._get(
+            film,
+            "radial",
+            sources,
+            lambda: radial.load_radial_source(str(paths["frame_dir"]), str(paths["linear_hq"])),
+        )
+
+    def shots(self, film):
+        paths = film_paths(film)
+
+        def load():
+            if paths["shot_json"].exists():
+                with paths["shot_json"].open("r", encoding="utf-8") as f:
+                    return json.load(f)["shots"]
+            print(f"[!] No shot_palettes.json for {film} – detecting shots with default settings.")
+            return shots.build_shots(paths["frame_dir"])[0]
+
+        sources = [paths["shot_json"], paths["frame_dir"] / shots.CUTS_FILE, paths["frame_dir"]]
+        return self._get(film, "shots", sources, load)
+
+    def circle_image(self, film):
+        paths = film_paths(film)
+
+        def load():
+            if paths["circle_png"].exists():
+                return Image.open(paths["circle_png"]).convert("RGB")
+            print(f"[!] No circle_full.png for {film} – rendering one from data.json.")
+            colours, _ = self.frames(film)
+            return circle.render_circle_image(colours, circle.QUICK_RESOLUTION)
+
+        return self._get(film, "circle", [paths["circle_png"], paths["data_json"]], load)
+
+    def poster_metadata(self, film):
+        def load():
+            args = argparse.Namespace(
+                metadata=str(METADATA_PATH),
+                refresh_metadata=False,
+                tmdb_api_key=None,
+                tmdb_read_token=None,
+                tmdb_log_file=str(Path("logs") / "tmdb_server.jsonl"),
+            )
+            metadata, _ = ozonelab.resolve_metadata(args, film_paths(film)["circle_png"])
+            return metadata
+
+        return self._get(film, "metadata", [METADATA_PATH], load)
+
+
+# === RENDER CACHE ===
+class RenderCache:
+    """Encoded PNGs in LRU order, bounded by total bytes; identical renders run once."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.evictions = 0
+
+    def get_or_render(self, key, render):
+        """Return (png bytes, "hit" | "miss" | "shared")."""
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return data, "hit"
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+                self.misses += 1
+            else:
+                self.shared += 1
+        if not owner:
+            return future.result(), "shared"
+
+        try:
+            data = render()
+        except BaseException as exc:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(exc)
+            raise
+        with self._lock:
+            del self._inflight[key]
+            self._put(key, data)
+        future.set_result(data)
+        return data, "miss"
+
+    def _put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        self._items[key] = data
+        self._bytes += len(data)
+        while self._bytes > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._items),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "shared": self.shared,
+                "evictions": self.evictions,
+                "in_flight": len(self._inflight),
+            }
+
+
+# === REQUEST PARAMETERS ===
+class BadRequest(ValueError):
+    pass
+
+
+def _param(query, name, default=None):
+    values = query.get(name)
+    return values[-1] if values else default
+
+
+def _int_param(query, name, default, lo=1, hi=MAX_SIDE):
+    raw = _param(query, name)
+    if raw is None:
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        raise BadRequest(f"{name} must be an integer")
+    if not lo <= value <= hi:
+        raise BadRequest(f"{name} must be between {lo} and {hi}")
+    return value
+
+
+def _choice_param(query, name, choices, default):
+    value = _param(query, name, default)
+    if value not in choices:
+        raise BadRequest(f"{name} must be one of {', '.join(choices)}")
+    return value
+
+
+def _size(width, height):
+    if width * height > MAX_PIXELS:
+        raise BadRequest(f"width*height must be at most {MAX_PIXELS}")
+    return width, height
+
+
+# === RENDERERS ===
+# Each returns (normalised params, source files, render callable producing PNG bytes).
+def plan_circle(store, film, query):
+    resolution = _int_param(query, "resolution", circle.QUICK_RESOLUTION, 64, MAX_SIDE // 2)
+    fast = _param(query, "fast", "0") in ("1", "true", "yes")
+    palette = _choice_param(query, "palette", PALETTE_MODES, "auto")
+
+    def render():
+        colours, _ = store.frames(film)
+        if fast:
+            image = circle.render_circle_array(colours, resolution)
+        else:
+            image = circle.render_circle_image(colours, resolution)
+        return encode_png(image, palette=palette)
+
+    params = {"resolution": resolution, "fast": fast, "palette": palette}
+    return params, [film_paths(film)["data_json"]], render
+
+
+def plan_donut(store, film, query):
+    resolution = _int_param(query, "resolution", donut.QUICK_RESOLUTION, 64, MAX_SIDE // 2)
+    max_strips = _int_param(query, "max_strips", 0, 0, 10_000_000)
+
+    def render():
+        base = store.strip_timeline(film)
+        if max_strips and base.shape[1] > max_strips:
+            keep = np.linspace(0, base.shape[1] - 1, num=max_strips).round().astype(int)
+            base = base[:, keep]
+        return encode_png(donut.render_donut(base, resolution), bgr=True)
+
+    params = {"resolution": resolution, "max_strips": max_strips}
+    return params, [film_paths(film)["strip_dir"]], render
+
+
+def plan_vertical(store, film, query):
+    style = _choice_param(query, "style", ("classic", "cinematic"), "classic")
+    if style == "classic":
+        default_w, default_h = vertical.CLASSIC_QUICK_WIDTH, vertical.CLASSIC_QUICK_HEIGHT
+    else:
+        default_w, default_h = vertical.QUICK_WIDTH, vertical.QUICK_HEIGHT
+    width, height = _size(_int_param(query, "width", default_w), _int_param(query, "height", default_h))
+    palette = _choice_param(query, "palette", PALETTE_MODES, "auto")
+
+    def render():
+        colours, brightness = store.frames(film)
+        if style == "classic":
+            return encode_png(vertical.render_vertical_classic(colours, width, height), palette=palette)
+        image = vertical.render_vertical_cinematic(colours, brightness, width, height)
+        return encode_png(image)
+
+    params = {"style": style, "width": width, "height": height, "palette": palette}
+    return params, [film_paths(film)["data_json"]], render
+
+
+def plan_radial(store, film, query):
+    resolution = _int_param(query, "resolution", radial.QUICK_RESOLUTION, 64, MAX_SIDE // 2)
+
+    def render():
+        return encode_png(radial.render_radial(store.radial_source(film), resolution), bgr=True)
+
+    paths = film_paths(film)
+    return {"resolution": resolution}, [paths["linear_hq"], paths["data_json"]], render
+
+
+def plan_shots(store, film, query):
+    width, height = _size(_int_param(query, "width", 3600), _int_param(query, "height", 280))
+    palette = _choice_param(query, "palette", PALETTE_MODES, "auto")
+
+    def render():
+        image = shots.render_shot_palette_strip(store.shots(film), width, height)
+        return encode_png(image, palette=palette)
+
+    paths = film_paths(film)
+    params = {"width": width, "height": height, "palette": palette}
+    return params, [paths["shot_json"], paths["frame_dir"] / shots.CUTS_FILE, paths["frame_dir"]], render
+
+
+def plan_poster(store, film, query):
+    theme = _choice_param(query, "theme", ("light", "dark"), "light")
+    width, height = _size(_int_param(query, "width", 3600, 200), _int_param(query, "height", 5400, 200))
+    title = _param(query, "title")
+    subtitle = _param(query, "subtitle")
+    headline = _choice_param(query, "headline", ("tagline", "title"), "tagline")
+
+    def render():
+        metadata = store.poster_metadata(film)
+        circle_img = store.circle_image(film)
+        # Same choice as ozonelab_style without a terminal: tagline unless asked for the title.
+        title_text = str(metadata.get("title") or ozonelab.DEFAULT_HEADLINE).strip()
+        tagline_text = str(metadata.get("tagline") or "").strip()
+        if title:
+            headline_text = title
+        elif headline == "tagline" and tagline_text:
+            headline_text = tagline_text
+        else:
+            headline_text = title_text
+        stream = ozonelab.build_stream(
+            ozonelab.count_frames_processed(film), ozonelab.runtime_seconds_for(metadata)
+        )
+        dot_radius, dx, row_gap = ozonelab.dotstrip_layout(width, height)
+        dot_color = (255, 255, 255, 255) if theme == "dark" else (0, 0, 0, 255)
+        dotstrip = ozonelab.render_dotstrip_image(
+            stream, dot_radius, dx, row_gap, ozonelab.DOTSTRIP_GAP_MULT, dot_color
+        )
+        image = ozonelab.compose_poster(
+            circle_img=circle_img,
+            palette=ozonelab.DARK_THEME if theme == "dark" else ozonelab.LIGHT_THEME,
+            title=headline_text.upper(),
+            subtitle=subtitle or metadata.get("summary") or ozonelab.DEFAULT_SUMMARY,
+            meta_row=ozonelab.generate_meta_row(metadata),
+            dotstrip=dotstrip,
+            width=width,
+            height=height,
+        )
+        return encode_png(image)
+
+    paths = film_paths(film)
+    params = {
+        "theme": theme,
+        "width": width,
+        "height": height,
+        "title": title,
+        "subtitle": subtitle,
+        "headline": headline,
+    }
+    return params, [paths["circle_png"], paths["data_json"], METADATA_PATH], render
+
+
+PLANNERS = {
+    "circle": plan_circle,
+    "donut": plan_donut,
+    "vertical": plan_vertical,
+    "radial": plan_radial,
+    "shots": plan_shots,
+    "poster": plan_poster,
+}
+
+
+# === HTTP ===
+class RenderService:
+    def __init__(self, cache_bytes):
+        self.store = FilmStore()
+        self.cache = RenderCache(cache_bytes)
+        self._similarity = None
+        self._similarity_lock = threading.Lock()
+
+    def render(self, kind, film, query):
+        """Return (png bytes, cache status) for a render request."""
+        planner = PLANNERS.get(kind)
+        if planner is None:
+            raise LookupError(f"Unknown render kind {kind!r}; choose from {', '.join(PLANNERS)}")
+        if not film or film not in list_films():
+            raise LookupError(f"Unknown film {film!r}")
+        params, sources, render = planner(self.store, film, query)
+        key = (kind, film, tuple(sorted(params.items())), source_signature(sources))
+
+        def timed_render():
+            with stage(f"server.render.{kind}"):
+                return render()
+
+        return self.cache.get_or_render(key, timed_render)
+
+    def similar(self, kind, query):
+        """JSON answer for /similar/films or /similar/frames from the colour index."""
+        k = _int_param(query, "k", similarity.DEFAULT_K, hi=1000)
+        film = _param(query, "film")
+        # Updates replace the index arrays, so queries hold the lock too (they take ~1 ms).
+        with self._similarity_lock:
+            if self._similarity is None:
+                self._similarity = similarity.ColourIndex.load(similarity.INDEX_PATH)
+            # One stat per source file per film when nothing changed; new films are indexed here.
+            if any(self._similarity.update().values()):
+                self._similarity.save(similarity.INDEX_PATH)
+            index = self._similarity
+            if kind == "films":
+                if not film:
+                    raise BadRequest("film is required")
+                by = _choice_param(query, "by", ("auto", *similarity.SIGNATURES), "auto")
+                return index.similar_films(film, k, by)
+            if kind != "frames":
+                raise LookupError(f"Unknown similarity query {kind!r}; use films or frames")
+            colour = _param(query, "colour")
+            if colour:
+                try:
+                    lab = similarity.rgb_to_lab(similarity.parse_colour(colour))
+                except ValueError as e:
+                    raise BadRequest(str(e))
+                return {"query": colour, "results": index.similar_frames(lab, k)}
+            if not film:
+                raise BadRequest("film (with frame) or colour is required")
+            i, frame, lab = index.frame_colour(film, _int_param(query, "frame", 0, lo=0, hi=10**9))
+            exclude = None if _param(query, "same_film") == "1" else i
+            return {
+                "query": {"film": index.films[i], "frame_index": frame},
+                "results": index.similar_frames(lab, k, exclude),
+            }
+
+    def preload(self):
+        for film in list_films():
+            try:
+                self.store.frames(film)
+            except (FileNotFoundError, ValueError) as e:
+                print(f"[!] Skipping preload: {e}")
+        print(f"[✓] Preloaded colour data for {len(list_films())} film(s).")
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        server_version = "ColoursOfMotion/1.0"
+
+        def _send(self, status, body, content_type, extra_headers=()):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in extra_headers:
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_json(self, status, payload):
+            self._send(status, json.dumps(payload, indent=2).encode("utf-8"), "application/json")
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            parts = [p for p in url.path.split("/") if p]
+            query = parse_qs(url.query)
+            started = time.perf_counter()
+            if not parts or parts == ["films"]:
+                self._send_json(200, {"films": list_films(), "kinds": list(PLANNERS)})
+                return
+            if parts == ["stats"]:
+                self._send_json(200, service.cache.stats())
+                return
+            if len(parts) == 2 and parts[0] == "similar":
+                try:
+                    answer = service.similar(parts[1], query)
+                except BadRequest as e:
+                    self._send_json(400, {"error": str(e)})
+                    return
+                except LookupError as e:
+                    self._send_json(404, {"error": e.args[0] if e.args else str(e)})
+                    return
+                except Exception as e:
+                    print(f"[✗] Similarity query failed for {self.path}: {e}")
+                    self._send_json(500, {"error": str(e)})
+                    return
+                answer["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+                self._send_json(200, answer)
+                return
+            if len(parts) != 2 or parts[0] != "render":
+                self._send_json(
+                    404, {"error": "Use /films, /stats, /render/<kind>?film=<folder> or /similar/<films|frames>"}
+                )
+                return
+
+            kind = parts[1]
+            try:
+                data, status = service.render(kind, _param(query, "film"), query)
+            except BadRequest as e:
+                self._send_json(400, {"error": str(e)})
+                return
+            except (LookupError, FileNotFoundError) as e:
+                self._send_json(404, {"error": e.args[0] if e.args else str(e)})
+                return
+            except Exception as e:
+                print(f"[✗] Render failed for {self.path}: {e}")
+                self._send_json(500, {"error": str(e)})
+                return
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self._send(
+                200,
+                data,
+                "image/png",
+                [("X-Render-Cache", status), ("X-Render-Ms", f"{elapsed_ms:.1f}")],
+            )
+
+        def log_message(self, format, *args):
+            print(f"[>] {self.address_string()} {format % args}")
+
+    return Handler
+
+
+def main():
+    args = parse_args()
+    start_profiling(args, "server")
+    ozonelab.load_dotenv()
+    service = RenderService(args.cache_mb * 1024 * 1024)
+    if args.preload:
+        service.preload()
+    load_now()
+    httpd = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    httpd.daemon_threads = True
+    print(f"[✓] Serving renders on http://{args.host}:{args.port}/ (cache {args.cache_mb} MB)")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\n[>] Shutting down.")
+    finally:
+        httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
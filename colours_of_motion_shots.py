@@ -3,12 +3,20 @@ import json
 import os
 from pathlib import Path
 
-import cv2
-import numpy as np
-from PIL import Image
+from colours_of_motion_lazy import lazy_import
+from colours_of_motion_manifest import picker_note, record_output
+from colours_of_motion_png import PALETTE_MODES, save_png
+from colours_of_motion_profile import add_profile_args, stage, start_profiling
+from colours_of_motion_vector import VectorDrawing, add_vector_args, save_vector
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
 
 FRAME_ROOT = "frames"
 OUTPUT_ROOT = "outputs"
+CUTS_FILE = "cuts.json"          # Written by colours_of_motion_processing.py --scene-cuts
+MIN_SHOT_SECONDS = 0.5           # Cuts closer than this (flashes, dissolves) are merged
+SHOT_SOURCES = ("auto", "cuts", "frames")
 
 
 def parse_args():
@@ -38,6 +46,19 @@ def parse_args():
         default=8,
         help="Histogram bins per channel used for boundary detection.",
     )
+    parser.add_argument(
+        "--source",
+        choices=SHOT_SOURCES,
+        default="auto",
+        help="cuts: use exact cut timestamps from extraction (cuts.json), no image decoding; "
+        "frames: histogram-compare extracted frames; auto: cuts when available.",
+    )
+    parser.add_argument(
+        "--min-shot-seconds",
+        type=float,
+        default=MIN_SHOT_SECONDS,
+        help="With cut timestamps, the shortest shot kept; shorter ones merge into the previous shot.",
+    )
     parser.add_argument(
         "--strip-width",
         type=int,
@@ -50,6 +71,14 @@ def parse_args():
         default=280,
         help="Output shot palette strip height.",
     )
+    parser.add_argument(
+        "--png-palette",
+        choices=PALETTE_MODES,
+        default="auto",
+        help="Indexed PNG output: auto (only when lossless), quantize (lossy within a bound) or off.",
+    )
+    add_vector_args(parser)
+    add_profile_args(parser)
     return parser.parse_args()
 
 
@@ -66,7 +95,7 @@ def select_folder(base_path):
 
     print("Available films:")
     for i, folder in enumerate(folders, start=1):
-        print(f"  {i}. {folder}")
+        print(f"  {i}. {folder}{picker_note(os.path.join(base_path, folder))}")
     choice = input("Select folder number: ").strip()
     if not choice.isdigit():
         raise ValueError("Invalid folder selection.")
@@ -98,12 +127,13 @@ def calc_hist_bhattacharyya(image_bgr, bins):
 def detect_shot_boundaries(frame_paths, threshold=0.38, min_shot_len=6, hist_bins=8):
     hists = []
     avg_cols = []
-    for path in frame_paths:
-        frame = cv2.imread(str(path))
-        if frame is None:
-            continue
-        hists.append(calc_hist_bhattacharyya(frame, hist_bins))
-        avg_cols.append(frame.mean(axis=(0, 1))[::-1])  # RGB
+    with stage("shots.histograms", items=len(frame_paths)):
+        for path in frame_paths:
+            frame = cv2.imread(str(path))
+            if frame is None:
+                continue
+            hists.append(calc_hist_bhattacharyya(frame, hist_bins))
+            avg_cols.append(frame.mean(axis=(0, 1))[::-1])  # RGB
 
     if not hists:
         raise RuntimeError("No valid frames loaded for shot detection.")
@@ -146,63 +176,204 @@ def detect_shot_boundaries(frame_paths, threshold=0.38, min_shot_len=6, hist_bin
     return shots
 
 
-def save_shot_palette_strip(shots, output_path, width=3600, height=280):
-    total_frames = sum(s["frame_count"] for s in shots)
+def load_cuts(frame_dir):
+    cuts_path = Path(frame_dir) / CUTS_FILE
+    if not cuts_path.exists():
+        return None
+    with cuts_path.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def shots_from_cuts(cuts, metadata, min_shot_seconds=MIN_SHOT_SECONDS):
+    """Shots bounded by exact cut timestamps, coloured from the sampled frames in data.json.
+
+    Sampled frame k sits at k / sample_fps seconds. A shot shorter than the sample
+    interval may contain no sample; it takes the colour of the sample nearest its middle.
+    """
+    if not metadata:
+        raise RuntimeError("data.json is empty; cannot colour shots.")
+    duration = float(cuts["duration_s"])
+    colours = np.array([frame["color"] for frame in metadata], dtype=np.float32)
+    sample_times = np.arange(len(colours), dtype=np.float64) / float(cuts["sample_fps"])
+
+    bounds = [0.0]
+    scores = [0.0]
+    for cut in cuts["cuts"]:
+        t = float(cut["time_s"])
+        if t - bounds[-1] < min_shot_seconds or duration - t < min_shot_seconds:
+            continue
+        bounds.append(t)
+        scores.append(float(cut["score"]))
+    bounds.append(max(duration, bounds[-1]))
+
+    shots = []
+    for i in range(len(bounds) - 1):
+        start_s, end_s = bounds[i], bounds[i + 1]
+        start_idx = int(np.searchsorted(sample_times, start_s, side="left"))
+        end_idx = int(np.searchsorted(sample_times, end_s, side="left"))
+        if end_idx > start_idx:
+            rep = colours[start_idx:end_idx].mean(axis=0)
+        else:
+            nearest = int(np.clip(np.abs(sample_times - (start_s + end_s) / 2).argmin(), 0, len(colours) - 1))
+            rep = colours[nearest]
+        shots.append(
+            {
+                "shot_index": i,
+                "start_s": round(start_s, 6),
+                "end_s": round(end_s, 6),
+                "duration_s": round(end_s - start_s, 6),
+                "start_frame_index": start_idx,
+                "end_frame_index_exclusive": end_idx,
+                "frame_count": end_idx - start_idx,
+                "representative_rgb": [int(x) for x in np.clip(rep, 0, 255)],
+                "cut_score": scores[i],
+            }
+        )
+    return shots
+
+
+def build_shots(
+    frame_dir,
+    source="auto",
+    threshold=0.38,
+    min_shot_len=6,
+    hist_bins=8,
+    min_shot_seconds=MIN_SHOT_SECONDS,
+):
+    """Return (shots, total_frames, settings) from cut timestamps or frame histograms."""
+    cuts = load_cuts(frame_dir) if source in ("auto", "cuts") else None
+    if cuts is not None:
+        data_path = Path(frame_dir) / "data.json"
+        if not data_path.exists():
+            raise FileNotFoundError(f"No data.json found in {frame_dir}")
+        with data_path.open("r", encoding="utf-8") as f:
+            metadata = json.load(f)
+        settings = {
+            "source": "scene_cuts",
+            "scene_threshold": cuts.get("threshold"),
+            "min_shot_seconds": min_shot_seconds,
+            "duration_s": cuts["duration_s"],
+        }
+        return shots_from_cuts(cuts, metadata, min_shot_seconds), len(metadata), settings
+    if source == "cuts":
+        raise FileNotFoundError(
+            f"No {CUTS_FILE} in {frame_dir}; extract with colours_of_motion_processing.py --scene-cuts"
+        )
+    frames = frame_files_for_folder(frame_dir)
+    shots = detect_shot_boundaries(frames, threshold=threshold, min_shot_len=min_shot_len, hist_bins=hist_bins)
+    settings = {
+        "source": "frame_histograms",
+        "threshold": threshold,
+        "min_shot_len": min_shot_len,
+        "hist_bins": hist_bins,
+    }
+    return shots, len(frames), settings
+
+
+def save_shot_metadata(json_path, folder, total_frames, shots, settings):
+    with Path(json_path).open("w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "film_folder": folder,
+                "total_frames": total_frames,
+                "shot_count": len(shots),
+                **settings,
+                "shots": shots,
+            },
+            f,
+            indent=2,
+            ensure_ascii=True,
+        )
+    record_output(json_path)
+
+
+def shot_strip_spans(shots, width):
+    """(x, w, rgb) per shot; each shot's width is proportional to its length.
+
+    Shots from cut timestamps are weighted by duration, histogram shots by frame count.
+    """
+    weight_key = "duration_s" if shots and all("duration_s" in s for s in shots) else "frame_count"
+    total_frames = sum(s[weight_key] for s in shots)
     if total_frames <= 0:
         raise ValueError("No shot frame counts available to render strip.")
 
-    img = np.zeros((height, width, 3), dtype=np.uint8)
+    spans = []
     x = 0
     for i, shot in enumerate(shots):
-        w = int(round((shot["frame_count"] / total_frames) * width))
+        w = int(round((shot[weight_key] / total_frames) * width))
         if i == len(shots) - 1:
             w = width - x
-        w = max(1, w)
-        color = np.array(shot["representative_rgb"], dtype=np.uint8)
-        img[:, x : min(width, x + w), :] = color
+        w = max(1, min(w, width - x))
+        spans.append((x, w, tuple(shot["representative_rgb"])))
         x += w
         if x >= width:
             break
+    return spans
+
+
+def render_shot_palette_strip(shots, width=3600, height=280):
+    """Return the strip as an RGB array."""
+    img = np.zeros((height, width, 3), dtype=np.uint8)
+    for x, w, colour in shot_strip_spans(shots, width):
+        img[:, x : x + w, :] = np.array(colour, dtype=np.uint8)
+    return img
 
-    Image.fromarray(img).save(output_path, "PNG", optimize=False, compress_level=1)
+
+def shot_strip_drawing(shots, width=3600, height=280):
+    """Vector strip: one rectangle per run of adjacent shots with the same colour."""
+    drawing = VectorDrawing(width, height, background=(0, 0, 0))
+    spans = shot_strip_spans(shots, width)
+    i = 0
+    while i < len(spans):
+        x, w, colour = spans[i]
+        while i + 1 < len(spans) and tuple(spans[i + 1][2]) == tuple(colour):
+            i += 1
+            w = spans[i][0] + spans[i][1] - x
+        last = i == len(spans) - 1
+        # Overlap the next run by a pixel so viewers do not show hairline seams.
+        drawing.rect(x, 0, w if last else w + 1, height, colour)
+        i += 1
+    return drawing
+
+
+def save_shot_palette_strip(shots, output_path, width=3600, height=280, palette="auto"):
+    save_png(render_shot_palette_strip(shots, width, height), output_path, palette=palette)
 
 
 def main():
     args = parse_args()
+    start_profiling(args, "shots")
     folder = args.folder or select_folder(FRAME_ROOT)
     frame_dir = Path(FRAME_ROOT) / folder
     out_dir = Path(OUTPUT_ROOT) / folder
     out_dir.mkdir(parents=True, exist_ok=True)
 
-    frames = frame_files_for_folder(frame_dir)
-    print(f"[>] Detecting shots for {folder} ({len(frames)} frames)")
-    shots = detect_shot_boundaries(
-        frames,
+    print(f"[>] Detecting shots for {folder}")
+    shots, total_frames, settings = build_shots(
+        frame_dir,
+        source=args.source,
         threshold=args.threshold,
         min_shot_len=args.min_shot_len,
         hist_bins=args.hist_bins,
+        min_shot_seconds=args.min_shot_seconds,
     )
+    print(f"[>] Found {len(shots)} shots from {settings['source'].replace('_', ' ')}")
 
     json_path = out_dir / "shot_palettes.json"
-    with json_path.open("w", encoding="utf-8") as f:
-        json.dump(
-            {
-                "film_folder": folder,
-                "total_frames": len(frames),
-                "shot_count": len(shots),
-                "threshold": args.threshold,
-                "min_shot_len": args.min_shot_len,
-                "hist_bins": args.hist_bins,
-                "shots": shots,
-            },
-            f,
-            indent=2,
-            ensure_ascii=True,
-        )
+    save_shot_metadata(json_path, folder, total_frames, shots, settings)
     print(f"[✓] Saved shot metadata: {json_path}")
 
     strip_path = out_dir / "shot_palette_strip.png"
-    save_shot_palette_strip(shots, strip_path, width=args.strip_width, height=args.strip_height)
+    if args.vector:
+        save_vector(shot_strip_drawing(shots, args.strip_width, args.strip_height), strip_path, args.vector)
+        return
+    save_shot_palette_strip(
+        shots,
+        strip_path,
+        width=args.strip_width,
+        height=args.strip_height,
+        palette=args.png_palette,
+    )
     print(f"[✓] Saved shot palette strip: {strip_path}")
 
 
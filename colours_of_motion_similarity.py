@@ -0,0 +1,556 @@
+import argparse
+import heapq
+import json
+import math
+import os
+from pathlib import Path
+
+import colours_of_motion_processing as processing
+from colours_of_motion_lazy import lazy_import
+from colours_of_motion_palette import PALETTE_FILE, load_palettes
+from colours_of_motion_profile import add_profile_args, stage, start_profiling
+from colours_of_motion_tonemap import EXTRACTION_FILE
+
+cv2 = lazy_import("cv2")
+np = lazy_import("numpy")
+
+# === CONFIGURATION ===
+FRAME_ROOT = "frames"
+OUTPUT_ROOT = "outputs"
+INDEX_PATH = Path("index") / "colour_index.npz"
+EXPERIMENTAL_SUFFIX = "_experimental"   # 1 fps copies of a film; the standard set is indexed
+L_BINS = 4                    # Lightness bins over 0..100
+AB_BINS = 6                   # a*/b* bins each, over -AB_RANGE..AB_RANGE
+AB_RANGE = 80.0
+SIGNATURE_DIM = L_BINS * AB_BINS * AB_BINS
+SIGNATURES = ("colours", "palette")
+LEAF_SIZE = 16                # Points per k-d tree leaf
+DEFAULT_K = 10
+SCENE_GAP_S = 30.0            # Without shot data, hits closer than this in one film are one scene
+TREE_FIELDS = ("perm", "lo", "hi", "dim", "split", "left", "right")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Index every film's colours and find similar films or scenes across the catalogue."
+    )
+    parser.add_argument("--index", default=str(INDEX_PATH), help="Index file.")
+    add_profile_args(parser)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    update = sub.add_parser("update", help="Add new films and refresh changed ones (only those are re-read).")
+    update.add_argument("--rebuild", action="store_true", help="Re-read every film.")
+
+    films = sub.add_parser("films", help="Films whose colours are closest to a film.")
+    films.add_argument("--film", required=True, help="Film folder name (a unique prefix or substring is enough).")
+    films.add_argument("-k", type=int, default=DEFAULT_K, help="Number of films to return.")
+    films.add_argument(
+        "--by",
+        choices=("auto", *SIGNATURES),
+        default="auto",
+        help="colours: data.json frame colours; palette: dominant colours from palettes.npz; "
+        "auto: palette when the film has one.",
+    )
+
+    frames = sub.add_parser("frames", help="Scenes across the catalogue that look like a frame or colour.")
+    frames.add_argument("--film", default=None, help="Query with a frame of this film (see --frame/--time).")
+    frames.add_argument("--frame", type=int, default=None, help="0-based data.json index of the query frame.")
+    frames.add_argument("--time", type=float, default=None, help="Query frame time in seconds.")
+    frames.add_argument("--image", default=None, help="Query with an image file.")
+    frames.add_argument("--colour", default=None, help="Query with a colour: #rrggbb or r,g,b.")
+    frames.add_argument("-k", type=int, default=DEFAULT_K, help="Number of scenes to return.")
+    frames.add_argument(
+        "--include-same-film",
+        action="store_true",
+        help="With --film, also return scenes from the query film.",
+    )
+    return parser.parse_args()
+
+
+# === SIGNATURES ===
+def rgb_to_lab(rgb):
+    """CIE Lab (L 0..100) of 8-bit sRGB colours with shape (..., 3)."""
+    rgb = np.asarray(rgb, dtype=np.float32)
+    lab = cv2.cvtColor(rgb.reshape(-1, 1, 3) / 255.0, cv2.COLOR_RGB2Lab)
+    return lab.reshape(rgb.shape)
+
+
+def lab_histogram(lab, weights=None):
+    """Square root of the normalised Lab histogram, linearly interpolated between bins.
+
+    Each colour is split between the neighbouring bin centres on every axis, so a small
+    shift moves weight gradually instead of jumping bins. With the square root, the
+    Euclidean distance between two signatures is their Hellinger distance (0..sqrt 2).
+    """
+    lab = np.asarray(lab, dtype=np.float64).reshape(-1, 3)
+    if weights is None:
+        weights = np.ones(len(lab))
+    weights = np.asarray(weights, dtype=np.float64).reshape(-1)
+    bins = np.array([L_BINS, AB_BINS, AB_BINS])
+    lo = np.array([0.0, -AB_RANGE, -AB_RANGE])
+    hi = np.array([100.0, AB_RANGE, AB_RANGE])
+    # Bin centres sit at whole-number coordinates 0..bins-1.
+    pos = np.clip((lab - lo) / (hi - lo) * bins - 0.5, 0, bins - 1)
+    base = np.minimum(np.floor(pos).astype(np.int64), bins - 2)
+    frac = pos - base
+    hist = np.zeros(SIGNATURE_DIM)
+    for corner in range(8):
+        offset = np.array([(corner >> axis) & 1 for axis in range(3)])
+        corner_weights = weights * np.prod(np.where(offset, frac, 1.0 - frac), axis=1)
+        cells = np.ravel_multi_index(tuple((base + offset).T), bins)
+        hist += np.bincount(cells, weights=corner_weights, minlength=SIGNATURE_DIM)
+    total = hist.sum()
+    return np.sqrt(hist / total if total > 0 else hist).astype(np.float32)
+
+
+def palette_signature(palettes):
+    """Lab histogram of a film's dominant colours: shot palettes weighted by shot length, else frame palettes."""
+    if "shot_colours" in palettes and len(palettes["shot_colours"]):
+        colours = palettes["shot_colours"]
+        shares = palettes["shot_shares"].astype(np.float64) * palettes["shot_lengths"][:, None]
+    else:
+        colours = palettes["frame_colours"]
+        shares = palettes["frame_shares"].astype(np.float64)
+    return lab_histogram(rgb_to_lab(colours), shares)
+
+
+# === FILM SOURCES ===
+def list_films():
+    """Film folders with a data.json; 1 fps experimental copies are left out."""
+    if not os.path.isdir(FRAME_ROOT):
+        return []
+    return sorted(
+        f for f in os.listdir(FRAME_ROOT)
+        if not f.endswith(EXPERIMENTAL_SUFFIX) and os.path.exists(os.path.join(FRAME_ROOT, f, "data.json"))
+    )
+
+
+def film_sources(film):
+    frame_dir = Path(FRAME_ROOT) / film
+    return {
+        "data_json": frame_dir / "data.json",
+        "palettes": frame_dir / PALETTE_FILE,
+        "shot_json": Path(OUTPUT_ROOT) / film / "shot_palettes.json",
+        "extraction": frame_dir / EXTRACTION_FILE,
+        "cuts": frame_dir / processing.CUTS_FILE,
+    }
+
+
+def source_stamp(sources):
+    """[mtime_ns, size] per source (None when missing); a film is re-read when this changes."""
+    stamp = []
+    for path in sources.values():
+        try:
+            st = os.stat(path)
+            stamp.append([st.st_mtime_ns, st.st_size])
+        except FileNotFoundError:
+            stamp.append(None)
+    return stamp
+
+
+def sample_fps(sources):
+    for name in ("extraction", "cuts"):
+        if sources[name].exists():
+            with open(sources[name], 'r') as f:
+                fps = json.load(f).get("sample_fps")
+            if fps:
+                return float(fps)
+    return float(processing.FPS_STANDARD)
+
+
+def film_record(film):
+    """Signatures, frame colours and frame -> shot map of one film."""
+    sources = film_sources(film)
+    with open(sources["data_json"], 'r') as f:
+        metadata = json.load(f)
+    if not metadata:
+        raise ValueError(f"data.json is empty for {film}")
+    frame_rgb = np.array([entry["color"] for entry in metadata], dtype=np.uint8)
+    frame_lab = rgb_to_lab(frame_rgb)
+    frame_shot = np.full(len(metadata), -1, dtype=np.int32)
+    if sources["shot_json"].exists():
+        with open(sources["shot_json"], 'r') as f:
+            shots = json.load(f)["shots"]
+        for i, shot in enumerate(shots):
+            frame_shot[shot["start_frame_index"]:shot["end_frame_index_exclusive"]] = i
+    palette = None
+    if sources["palettes"].exists():
+        palette = palette_signature(load_palettes(sources["palettes"]))
+    return {
+        "fps": sample_fps(sources),
+        "colours": lab_histogram(frame_lab),
+        "palette": palette,
+        "frame_rgb": frame_rgb,
+        "frame_lab": frame_lab,
+        "frame_shot": frame_shot,
+    }
+
+
+# === K-D TREE ===
+class KDTree:
+    """Static k-d tree; each node covers a contiguous range of a permutation of the points.
+
+    The node arrays are saved with the index, so loading it is enough to query.
+    """
+
+    def __init__(self, points, arrays):
+        self.points = points
+        for name in TREE_FIELDS:
+            setattr(self, name, arrays[name])
+
+    @classmethod
+    def build(cls, points, leaf_size=LEAF_SIZE):
+        points = np.asarray(points, dtype=np.float32)
+        perm = np.arange(len(points), dtype=np.int64)
+        nodes = {name: [] for name in TREE_FIELDS[1:]}
+
+        def add(start, stop):
+            for name, value in zip(TREE_FIELDS[1:], (start, stop, -1, 0.0, -1, -1)):
+                nodes[name].append(value)
+            return len(nodes["lo"]) - 1
+
+        stack = [add(0, len(points))] if len(points) else []
+        while stack:
+            node = stack.pop()
+            start, stop = nodes["lo"][node], nodes["hi"][node]
+            if stop - start <= leaf_size:
+                continue
+            members = perm[start:stop]
+            block = points[members]
+            axis = int(np.argmax(block.max(axis=0) - block.min(axis=0)))
+            mid = (stop - start) // 2
+            perm[start:stop] = members[np.argpartition(block[:, axis], mid)]
+            nodes["dim"][node] = axis
+            nodes["split"][node] = float(points[perm[start + mid], axis])
+            nodes["left"][node] = add(start, start + mid)
+            nodes["right"][node] = add(start + mid, stop)
+            stack.extend((nodes["left"][node], nodes["right"][node]))
+
+        arrays = {"perm": perm, "split": np.array(nodes["split"], dtype=np.float32)}
+        for name in ("lo", "hi", "dim", "left", "right"):
+            arrays[name] = np.array(nodes[name], dtype=np.int64)
+        return cls(points, arrays)
+
+    def arrays(self):
+        return {name: getattr(self, name) for name in TREE_FIELDS}
+
+    def query(self, point, k):
+        """Up to k (distance, point index) pairs, nearest first."""
+        point = np.asarray(point, dtype=np.float32)
+        best = []   # max-heap on squared distance: (-d2, index)
+        stack = [(0, 0.0)] if len(self.lo) else []
+        while stack:
+            node, bound = stack.pop()
+            if len(best) == k and bound >= -best[0][0]:
+                continue
+            left = self.left[node]
+            if left < 0:
+                members = self.perm[self.lo[node]:self.hi[node]]
+                d2 = ((self.points[members] - point) ** 2).sum(axis=1)
+                for dist, index in zip(d2.tolist(), members.tolist()):
+                    if len(best) < k:
+                        heapq.heappush(best, (-dist, index))
+                    elif dist < -best[0][0]:
+                        heapq.heapreplace(best, (-dist, index))
+                continue
+            # Points left of the split are <= split on this axis, points right of it >= split.
+            diff = float(point[self.dim[node]] - self.split[node])
+            near, far = (left, self.right[node]) if diff < 0 else (self.right[node], left)
+            stack.append((far, max(bound, diff * diff)))
+            stack.append((near, bound))
+        return [(math.sqrt(-d2), index) for d2, index in sorted(best, reverse=True)]
+
+
+# === INDEX ===
+class ColourIndex:
+    """Film signatures and frame colours of the whole catalogue, with k-d trees over both.
+
+    Film queries search the Lab histogram signatures; scene queries search every
+    indexed frame's mean colour in Lab, where distance is the CIE76 colour difference.
+    """
+
+    def __init__(self):
+        self._assemble([], [], [])
+
+    # --- storage ---
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        index = cls()
+        if not os.path.exists(path):
+            return index
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in data.files}
+        index.films = arrays["films"].tolist()
+        index.stamps = json.loads(str(arrays["stamps"]))
+        index.fps = arrays["fps"]
+        index.offsets = arrays["offsets"]
+        index.signatures = {name: arrays[f"sig_{name}"] for name in SIGNATURES}
+        index.has_palette = arrays["has_palette"]
+        index.frame_rgb = arrays["frame_rgb"]
+        index.frame_lab = arrays["frame_lab"]
+        index.frame_shot = arrays["frame_shot"]
+        index.frame_film = arrays["frame_film"]
+        index.members = {"colours": np.arange(len(index.films)), "palette": np.flatnonzero(index.has_palette)}
+        index.trees = {}
+        for name, points in index._tree_points().items():
+            index.trees[name] = KDTree(points, {f: arrays[f"tree_{name}_{f}"] for f in TREE_FIELDS})
+        return index
+
+    def save(self, path=INDEX_PATH):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        arrays = {
+            "films": np.array(self.films, dtype=str),
+            "stamps": np.array(json.dumps(self.stamps)),
+            "fps": self.fps,
+            "offsets": self.offsets,
+            "has_palette": self.has_palette,
+            "frame_rgb": self.frame_rgb,
+            "frame_lab": self.frame_lab,
+            "frame_shot": self.frame_shot,
+            "frame_film": self.frame_film,
+        }
+        for name in SIGNATURES:
+            arrays[f"sig_{name}"] = self.signatures[name]
+        for name, tree in self.trees.items():
+            for field, values in tree.arrays().items():
+                arrays[f"tree_{name}_{field}"] = values
+        # Uncompressed so a load is one read; written aside and swapped in.
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, path)
+
+    # --- incremental update ---
+    def update(self, rebuild=False):
+        """Re-read films whose sources changed, add new ones and drop removed ones.
+
+        Returns {"added": [...], "updated": [...], "removed": [...]}; the trees are
+        rebuilt only when something changed.
+        """
+        known = {film: i for i, film in enumerate(self.films)}
+        changes = {"added": [], "updated": [], "removed": []}
+        films, stamps, records = [], [], []
+        for film in list_films():
+            stamp = source_stamp(film_sources(film))
+            i = known.get(film)
+            if i is not None and not rebuild and stamp == self.stamps[i]:
+                record = self._record(i)
+            else:
+                try:
+                    record = film_record(film)
+                except (ValueError, KeyError) as e:
+                    print(f"[!] Skipping {film}: {e}")
+                    continue
+                changes["added" if i is None else "updated"].append(film)
+            films.append(film)
+            stamps.append(stamp)
+            records.append(record)
+        changes["removed"] = [film for film in self.films if film not in films]
+        if any(changes.values()):
+            with stage("similarity.index", items=len(films)):
+                self._assemble(films, stamps, records)
+        return changes
+
+    def _record(self, i):
+        frames = slice(self.offsets[i], self.offsets[i + 1])
+        return {
+            "fps": float(self.fps[i]),
+            "colours": self.signatures["colours"][i],
+            "palette": self.signatures["palette"][i] if self.has_palette[i] else None,
+            "frame_rgb": self.frame_rgb[frames],
+            "frame_lab": self.frame_lab[frames],
+            "frame_shot": self.frame_shot[frames],
+        }
+
+    def _assemble(self, films, stamps, records):
+        self.films = list(films)
+        self.stamps = list(stamps)
+        self.fps = np.array([r["fps"] for r in records], dtype=np.float32)
+        counts = [len(r["frame_lab"]) for r in records]
+        self.offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self.has_palette = np.array([r["palette"] is not None for r in records], dtype=bool)
+        empty = np.zeros(SIGNATURE_DIM, dtype=np.float32)
+        self.signatures = {
+            name: np.array(
+                [r[name] if r[name] is not None else empty for r in records], dtype=np.float32
+            ).reshape(-1, SIGNATURE_DIM)
+            for name in SIGNATURES
+        }
+
+        def stacked(name, dtype, shape):
+            if not records:
+                return np.zeros(shape, dtype=dtype)
+            return np.concatenate([r[name] for r in records]).astype(dtype)
+
+        self.frame_rgb = stacked("frame_rgb", np.uint8, (0, 3))
+        self.frame_lab = stacked("frame_lab", np.float32, (0, 3))
+        self.frame_shot = stacked("frame_shot", np.int32, (0,))
+        self.frame_film = np.repeat(np.arange(len(records), dtype=np.int32), counts)
+        self.members = {"colours": np.arange(len(records)), "palette": np.flatnonzero(self.has_palette)}
+        self.trees = {name: KDTree.build(points) for name, points in self._tree_points().items()}
+
+    def _tree_points(self):
+        return {
+            "colours": self.signatures["colours"],
+            "palette": self.signatures["palette"][self.members["palette"]],
+            "frames": self.frame_lab,
+        }
+
+    # --- queries ---
+    def film_index(self, name):
+        """Index of a film by folder name, or by a unique case-insensitive prefix or substring."""
+        if name in self.films:
+            return self.films.index(name)
+        lowered = name.lower()
+        for match in (str.startswith, str.__contains__):
+            found = [i for i, film in enumerate(self.films) if match(film.lower(), lowered)]
+            if len(found) == 1:
+                return found[0]
+            if len(found) > 1:
+                names = ", ".join(self.films[i] for i in found)
+                raise LookupError(f"{name!r} matches several films: {names}")
+        raise LookupError(f"No indexed film matches {name!r}")
+
+    def similar_films(self, film, k=DEFAULT_K, by="auto"):
+        """The k films whose colour signatures are closest to film's, nearest first."""
+        i = self.film_index(film)
+        if by == "auto":
+            by = "palette" if self.has_palette[i] else "colours"
+        if by == "palette" and not self.has_palette[i]:
+            raise LookupError(f"No {PALETTE_FILE} for {self.films[i]}; run colours_of_motion_palette.py")
+        members = self.members[by]
+        hits = self.trees[by].query(self.signatures[by][i], k + 1)
+        results = [
+            {"film": self.films[members[j]], "distance": round(dist, 4)}
+            for dist, j in hits
+            if members[j] != i
+        ]
+        return {"film": self.films[i], "by": by, "results": results[:k]}
+
+    def frame_colour(self, film, frame=None, time_s=None):
+        """(film index, frame index, Lab colour) of one indexed frame."""
+        i = self.film_index(film)
+        n_frames = int(self.offsets[i + 1] - self.offsets[i])
+        if frame is None:
+            frame = int((time_s or 0.0) * float(self.fps[i]))
+        if not 0 <= frame < n_frames:
+            raise LookupError(f"Frame {frame} is outside {self.films[i]} (0..{n_frames - 1})")
+        return i, frame, self.frame_lab[self.offsets[i] + frame]
+
+    def similar_frames(self, lab, k=DEFAULT_K, exclude_film=None):
+        """The k closest scenes to a Lab colour: one hit per shot (or per SCENE_GAP_S without shots)."""
+        n_points = len(self.frame_lab)
+        want = min(n_points, k * 4)
+        while True:
+            results = self._scenes(self.trees["frames"].query(lab, want), k, exclude_film)
+            if len(results) >= k or want >= n_points:
+                return results
+            want = min(n_points, want * 4)
+
+    def _scenes(self, hits, k, exclude_film):
+        results = []
+        taken = {}
+        for dist, j in hits:
+            i = int(self.frame_film[j])
+            if i == exclude_film:
+                continue
+            frame = int(j - self.offsets[i])
+            shot = int(self.frame_shot[j])
+            time_s = frame / float(self.fps[i])
+            seen = taken.setdefault(i, [])
+            if any(s == shot if shot >= 0 else abs(t - time_s) < SCENE_GAP_S for s, t in seen):
+                continue
+            seen.append((shot, time_s))
+            results.append({
+                "film": self.films[i],
+                "frame_index": frame,
+                "time_s": round(time_s, 2),
+                "shot_index": shot if shot >= 0 else None,
+                "colour": "#{:02x}{:02x}{:02x}".format(*self.frame_rgb[j].tolist()),
+                "delta_e": round(dist, 2),
+            })
+            if len(results) == k:
+                break
+        return results
+
+
+def parse_colour(text):
+    """#rrggbb or r,g,b -> [r, g, b]."""
+    text = text.strip()
+    try:
+        if text.startswith("#") and len(text) == 7:
+            return [int(text[i:i + 2], 16) for i in (1, 3, 5)]
+        rgb = [int(part) for part in text.split(",")]
+    except ValueError:
+        rgb = []
+    if len(rgb) != 3 or not all(0 <= c <= 255 for c in rgb):
+        raise ValueError(f"Colour must be #rrggbb or r,g,b, got {text!r}")
+    return rgb
+
+
+def open_index(path=INDEX_PATH, rebuild=False):
+    """Load the index, bring it up to date with the frame folders and save it if it changed."""
+    index = ColourIndex.load(path)
+    changes = index.update(rebuild=rebuild)
+    if any(changes.values()):
+        index.save(path)
+    return index, changes
+
+
+# === MAIN ===
+def print_changes(index, changes, path):
+    summary = ", ".join(f"{len(films)} {name}" for name, films in changes.items())
+    print(f"[✓] Index: {len(index.films)} film(s), {len(index.frame_lab)} frames ({summary}): {path}")
+
+
+def main():
+    args = parse_args()
+    start_profiling(args, "similarity")
+    with stage("similarity.update"):
+        index, changes = open_index(args.index, rebuild=args.command == "update" and args.rebuild)
+    if args.command == "update":
+        print_changes(index, changes, args.index)
+        return
+    if not index.films:
+        print(f"[✗] No films with data.json found in {FRAME_ROOT}")
+        return
+
+    try:
+        if args.command == "films":
+            with stage("similarity.query"):
+                answer = index.similar_films(args.film, args.k, args.by)
+            print(f"[✓] Closest to {answer['film']} by {answer['by']}:")
+            for rank, hit in enumerate(answer["results"], 1):
+                print(f"  {rank:>2}. {hit['film']}  (distance {hit['distance']:.3f})")
+            return
+
+        exclude = None
+        if args.colour:
+            lab = rgb_to_lab(parse_colour(args.colour))
+            label = args.colour
+        elif args.image:
+            lab = rgb_to_lab(processing.calculate_frame_data(args.image)["color"])
+            label = args.image
+        elif args.film:
+            film, frame, lab = index.frame_colour(args.film, args.frame, args.time)
+            exclude = None if args.include_same_film else film
+            label = f"{index.films[film]} frame {frame}"
+        else:
+            print("[✗] Give a query: --film (with --frame or --time), --image or --colour.")
+            return
+        with stage("similarity.query"):
+            results = index.similar_frames(lab, args.k, exclude)
+        print(f"[✓] Scenes closest to {label}:")
+        for rank, hit in enumerate(results, 1):
+            shot = f", shot {hit['shot_index']}" if hit["shot_index"] is not None else ""
+            print(
+                f"  {rank:>2}. {hit['film']} @ {hit['time_s']:.0f}s (frame {hit['frame_index']}{shot})  "
+                f"{hit['colour']}  ΔE {hit['delta_e']:.1f}"
+            )
+    except (LookupError, ValueError, FileNotFoundError) as e:
+        print(f"[✗] {e}")
+
+
+if __name__ == "__main__":
+    main()
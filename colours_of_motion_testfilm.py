@@ -0,0 +1,178 @@
+import argparse
+import json
+import subprocess
+from pathlib import Path
+
+from colours_of_motion_lazy import lazy_import
+
+np = lazy_import("numpy")
+
+# === CONFIGURATION ===
+DEFAULT_DURATION = 120     # seconds
+DEFAULT_WIDTH = 1280
+DEFAULT_HEIGHT = 720
+DEFAULT_FPS = 24
+MIN_SHOT_SECONDS = 2
+MAX_SHOT_SECONDS = 15
+DEFAULT_NOISE = 6          # ffmpeg noise strength; keeps JPEGs and histograms film-like
+SEED = 1234
+TRANSFERS = ("sdr", "pq")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Generate a deterministic synthetic film with known per-second colours and cuts."
+    )
+    parser.add_argument("--output", required=True, help="Output video path (.mkv or .mp4).")
+    parser.add_argument("--duration", type=int, default=DEFAULT_DURATION, help="Duration in whole seconds.")
+    parser.add_argument("--width", type=int, default=DEFAULT_WIDTH, help="Frame width.")
+    parser.add_argument("--height", type=int, default=DEFAULT_HEIGHT, help="Frame height.")
+    parser.add_argument("--fps", type=int, default=DEFAULT_FPS, help="Source frame rate.")
+    parser.add_argument("--transfer", choices=TRANSFERS, default="sdr", help="SDR BT.709 or HDR PQ/BT.2020.")
+    parser.add_argument("--noise", type=int, default=DEFAULT_NOISE, help="Per-pixel noise strength (0 disables).")
+    parser.add_argument("--seed", type=int, default=SEED, help="Seed for the shot script.")
+    return parser.parse_args()
+
+
+# === SHOT SCRIPT ===
+def make_shot_script(duration, seed=SEED, min_shot=MIN_SHOT_SECONDS, max_shot=MAX_SHOT_SECONDS):
+    """Split duration into whole-second shots, each a flat colour distinct from its neighbour."""
+    rng = np.random.default_rng(seed)
+    shots = []
+    start = 0
+    previous = None
+    while start < duration:
+        length = int(min(duration - start, rng.integers(min_shot, max_shot + 1)))
+        while True:
+            colour = rng.integers(16, 240, 3)
+            # Keep consecutive shots clearly separated so every cut is a real cut.
+            if previous is None or np.abs(colour - previous).sum() > 120:
+                break
+        shots.append({"start_s": start, "duration_s": length, "color": [int(c) for c in colour]})
+        previous = colour
+        start += length
+    return shots
+
+
+def per_second_colours(shots):
+    """Ground-truth colour for every second of the film."""
+    colours = []
+    for shot in shots:
+        colours.extend([shot["color"]] * shot["duration_s"])
+    return colours
+
+
+def ground_truth(shots, width, height, fps, transfer):
+    return {
+        "duration_s": sum(s["duration_s"] for s in shots),
+        "width": width,
+        "height": height,
+        "fps": fps,
+        "transfer": transfer,
+        "shots": shots,
+        "cuts_s": [s["start_s"] for s in shots[1:]],
+        "per_second": per_second_colours(shots),
+    }
+
+
+def truth_path(video_path):
+    video_path = Path(video_path)
+    return video_path.with_name(video_path.name + ".truth.json")
+
+
+# === FFMPEG COMMAND ===
+def build_filter_graph(shots, width, height, fps, transfer, noise, seed=SEED):
+    """One lavfi colour source per shot, concatenated, then encoded in the requested transfer."""
+    parts = []
+    labels = []
+    for i, shot in enumerate(shots):
+        hex_colour = "0x{:02X}{:02X}{:02X}".format(*shot["color"])
+        parts.append(
+            f"color=c={hex_colour}:s={width}x{height}:r={fps}:d={shot['duration_s']},format=rgb24[s{i}]"
+        )
+        labels.append(f"[s{i}]")
+    chain = f"{''.join(labels)}concat=n={len(shots)}:v=1:a=0"
+    if noise > 0:
+        # Temporal noise with a fixed seed: deterministic, zero-mean, survives encoding.
+        chain += f",noise=alls={noise}:allf=t:all_seed={seed}"
+    if transfer == "pq":
+        chain += (
+            ",format=gbrpf32le,"
+            "zscale=tin=bt709:pin=bt709:t=smpte2084:p=bt2020:m=bt2020nc:r=tv:npl=100,"
+            "format=yuv420p10le"
+        )
+    else:
+        chain += ",scale=out_color_matrix=bt709:out_range=tv,format=yuv420p"
+    parts.append(chain + "[v]")
+    return ";".join(parts)
+
+
+def build_ffmpeg_command(shots, output_path, width, height, fps, transfer="sdr", noise=DEFAULT_NOISE, seed=SEED):
+    cmd = [
+        "ffmpeg", "-y", "-hide_banner", "-loglevel", "warning",
+        "-filter_complex", build_filter_graph(shots, width, height, fps, transfer, noise, seed),
+        "-map", "[v]",
+    ]
+    if transfer == "pq":
+        cmd += [
+            "-c:v", "libx265", "-preset", "ultrafast", "-crf", "12",
+            "-x265-params", "colorprim=bt2020:transfer=smpte2084:colormatrix=bt2020nc:log-level=error",
+            "-color_primaries", "bt2020", "-color_trc", "smpte2084", "-colorspace", "bt2020nc",
+        ]
+    else:
+        cmd += [
+            "-c:v", "libx264", "-preset", "ultrafast", "-crf", "12",
+            "-color_primaries", "bt709", "-color_trc", "bt709", "-colorspace", "bt709",
+        ]
+    cmd.append(str(output_path))
+    return cmd
+
+
+def generate_test_film(
+    output_path,
+    duration=DEFAULT_DURATION,
+    width=DEFAULT_WIDTH,
+    height=DEFAULT_HEIGHT,
+    fps=DEFAULT_FPS,
+    transfer="sdr",
+    noise=DEFAULT_NOISE,
+    seed=SEED,
+):
+    """Render the film with ffmpeg and write <output>.truth.json. Returns the ground truth."""
+    if transfer not in TRANSFERS:
+        raise ValueError(f"Unknown transfer {transfer!r}; choose from {TRANSFERS}")
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    shots = make_shot_script(duration, seed=seed)
+    cmd = build_ffmpeg_command(shots, output_path, width, height, fps, transfer, noise, seed)
+    print(f"[>] Generating {transfer.upper()} test film ({duration}s, {len(shots)} shots): {output_path}")
+    subprocess.run(cmd, check=True)
+
+    truth = ground_truth(shots, width, height, fps, transfer)
+    with truth_path(output_path).open("w", encoding="utf-8") as f:
+        json.dump(truth, f, indent=2)
+    print(f"[✓] Saved test film and ground truth: {truth_path(output_path)}")
+    return truth
+
+
+def load_ground_truth(video_path):
+    with truth_path(video_path).open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    args = parse_args()
+    generate_test_film(
+        args.output,
+        duration=args.duration,
+        width=args.width,
+        height=args.height,
+        fps=args.fps,
+        transfer=args.transfer,
+        noise=args.noise,
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+import argparse
+import json
+import math
+import os
+import shutil
+from pathlib import Path
+
+import colours_of_motion_circle as circle
+import colours_of_motion_donut as donut
+import colours_of_motion_radial as radial
+import colours_of_motion_vertical as vertical
+from colours_of_motion_lazy import lazy_import
+from colours_of_motion_manifest import picker_note
+from colours_of_motion_png import PALETTE_MODES, save_png
+from colours_of_motion_profile import add_profile_args, stage, start_profiling
+
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+
+# === CONFIGURATION ===
+FRAME_ROOT = "frames"
+CIRCLE_ROOT = "circle_data"
+OUTPUT_ROOT = "outputs"
+TILE_SIZE = 256
+TILE_FORMATS = ("png", "jpg")
+JPEG_QUALITY = 90
+BAND_ROWS = 256               # Rows a renderer hands over at a time
+KINDS = ("circle", "vertical", "cinematic", "donut", "radial")
+DZI_NAMESPACE = "http://schemas.microsoft.com/deepzoom/2008"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Write Colours of Motion outputs as DeepZoom tile pyramids for zoomable viewers."
+    )
+    parser.add_argument(
+        "--folder",
+        default=None,
+        help="Film folder name under frames/. If omitted, prompts for selection.",
+    )
+    parser.add_argument(
+        "--kind",
+        choices=KINDS,
+        action="append",
+        default=None,
+        help="Output to tile (repeatable; default: circle and vertical).",
+    )
+    parser.add_argument(
+        "--poster_mode",
+        action="store_true",
+        help="Tile the high-resolution variants (same sizes as the poster PNGs).",
+    )
+    parser.add_argument("--tile-size", type=int, default=TILE_SIZE, help="Tile edge in pixels.")
+    parser.add_argument("--format", choices=TILE_FORMATS, default="png", help="Tile image format.")
+    parser.add_argument(
+        "--png-palette",
+        choices=PALETTE_MODES,
+        default="auto",
+        help="Indexed PNG tiles: auto (only when lossless), quantize (lossy within a bound) or off.",
+    )
+    add_profile_args(parser)
+    return parser.parse_args()
+
+
+def list_folders(base_path):
+    return sorted(
+        [f for f in os.listdir(base_path) if os.path.isdir(os.path.join(base_path, f))]
+    )
+
+
+def select_folder(base_path):
+    folders = list_folders(base_path)
+    if not folders:
+        raise FileNotFoundError(f"No folders found in {base_path}")
+
+    print("Available films:")
+    for i, folder in enumerate(folders, start=1):
+        print(f"  {i}. {folder}{picker_note(os.path.join(base_path, folder))}")
+    choice = input("Select folder number: ").strip()
+    if not choice.isdigit():
+        raise ValueError("Invalid folder selection.")
+    idx = int(choice) - 1
+    if idx < 0 or idx >= len(folders):
+        raise ValueError("Invalid folder selection.")
+    return folders[idx]
+
+
+# === PYRAMID ===
+def halve_rows(rows):
+    """2x2 box-filter a band; an odd last row or column is averaged with itself."""
+    if rows.shape[0] % 2:
+        rows = np.concatenate([rows, rows[-1:]], axis=0)
+    if rows.shape[1] % 2:
+        rows = np.concatenate([rows, rows[:, -1:]], axis=1)
+    total = rows.astype(np.uint16)
+    total = total[0::2, 0::2] + total[1::2, 0::2] + total[0::2, 1::2] + total[1::2, 1::2]
+    return ((total + 2) // 4).astype(np.uint8)
+
+
+class _Level:
+    def __init__(self, level, width, height):
+        self.level = level
+        self.width = width
+        self.height = height
+        self.pending = []
+        self.pending_rows = 0
+        self.tile_row = 0
+
+
+class TilePyramid:
+    """DeepZoom pyramid fed with row bands from top to bottom.
+
+    Every level keeps at most one tile row of pixels: a full tile row is written out,
+    halved and passed to the level below, so memory is bounded by about twice the
+    width of one tile row however tall the image is. The .dzi manifest is written
+    last, so a viewer never sees a half-finished pyramid.
+    """
+
+    def __init__(self, out_dir, name, width, height, tile_size=TILE_SIZE, fmt="png", palette="auto"):
+        if tile_size < 2 or tile_size % 2:
+            # Halving needs tile rows to start on even source rows.
+            raise ValueError(f"Tile size must be even, got {tile_size}")
+        self.out_dir = Path(out_dir)
+        self.name = name
+        self.width = width
+        self.height = height
+        self.tile_size = tile_size
+        self.fmt = fmt
+        self.palette = palette
+        self.files_dir = self.out_dir / f"{name}_files"
+        # Drop the old manifest first so viewers stop loading a pyramid being replaced.
+        (self.out_dir / f"{name}.dzi").unlink(missing_ok=True)
+        if self.files_dir.exists():
+            shutil.rmtree(self.files_dir)
+        max_level = math.ceil(math.log2(max(width, height, 1)))
+        self.levels = {}
+        for level in range(max_level, -1, -1):
+            scale = 2 ** (max_level - level)
+            self.levels[level] = _Level(level, -(-width // scale), -(-height // scale))
+            (self.files_dir / str(level)).mkdir(parents=True, exist_ok=True)
+        self.max_level = max_level
+        self.tiles_written = 0
+
+    def write_rows(self, rows):
+        """Add the next rows (height x width x 3 uint8) of the full-resolution image."""
+        if rows.shape[1] != self.width:
+            raise ValueError(f"Band width {rows.shape[1]} does not match pyramid width {self.width}")
+        self._push(self.max_level, rows)
+
+    def _push(self, level, rows):
+        state = self.levels[level]
+        state.pending.append(rows)
+        state.pending_rows += rows.shape[0]
+        while state.pending_rows >= self.tile_size:
+            band = np.concatenate(state.pending, axis=0) if len(state.pending) > 1 else state.pending[0]
+            self._emit(state, band[:self.tile_size])
+            rest = band[self.tile_size:]
+            state.pending = [rest] if len(rest) else []
+            state.pending_rows = len(rest)
+
+    def _emit(self, state, band):
+        for col, x in enumerate(range(0, state.width, self.tile_size)):
+            tile = np.ascontiguousarray(band[:, x:x + self.tile_size])
+            path = self.files_dir / str(state.level) / f"{col}_{state.tile_row}.{self.fmt}"
+            if self.fmt == "png":
+                save_png(tile, path, palette=self.palette)
+            else:
+                Image.fromarray(tile).save(path, quality=JPEG_QUALITY)
+            self.tiles_written += 1
+        state.tile_row += 1
+        if state.level > 0:
+            self._push(state.level - 1, halve_rows(band))
+
+    def close(self):
+        """Flush the partial last tile row of every level, then write the manifest."""
+        for level in range(self.max_level, -1, -1):
+            state = self.levels[level]
+            if state.pending_rows:
+                band = np.concatenate(state.pending, axis=0)
+                state.pending, state.pending_rows = [], 0
+                self._emit(state, band)
+        manifest = self.out_dir / f"{self.name}.dzi"
+        tmp = manifest.with_suffix(".dzi.tmp")
+        tmp.write_text(
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            f'<Image xmlns="{DZI_NAMESPACE}" Format="{self.fmt}" Overlap="0" TileSize="{self.tile_size}">\n'
+            f'  <Size Width="{self.width}" Height="{self.height}"/>\n'
+            "</Image>\n",
+            encoding="utf-8",
+        )
+        os.replace(tmp, manifest)
+        return manifest
+
+
+def write_pyramid(bands, out_dir, name, width, height, tile_size=TILE_SIZE, fmt="png", palette="auto"):
+    """Consume (start_row, rows) bands from a renderer into a pyramid; returns the .dzi path."""
+    pyramid = TilePyramid(out_dir, name, width, height, tile_size=tile_size, fmt=fmt, palette=palette)
+    with stage("tiles.pyramid", items=height):
+        for _, rows in bands:
+            pyramid.write_rows(rows)
+        manifest = pyramid.close()
+    print(f"[✓] Saved {pyramid.tiles_written} tiles over {pyramid.max_level + 1} levels: {manifest}")
+    return manifest
+
+
+def array_bands(image, chunk_rows=BAND_ROWS):
+    """Row bands of a renderer that only produces whole images."""
+    for start in range(0, image.shape[0], chunk_rows):
+        yield start, image[start:start + chunk_rows]
+
+
+# === SOURCES ===
+def load_frame_metadata(frame_dir):
+    with open(os.path.join(frame_dir, "data.json"), "r") as f:
+        data = json.load(f)
+    if not data:
+        raise ValueError(f"data.json is empty in {frame_dir}")
+    return data
+
+
+def kind_source(kind, folder, poster_mode):
+    """(name, width, height, bands) for one output; bands yield RGB rows top to bottom."""
+    frame_dir = os.path.join(FRAME_ROOT, folder)
+    if kind == "circle":
+        colours = [frame["color"] for frame in load_frame_metadata(frame_dir)]
+        size = circle.HQ_RESOLUTION if poster_mode else circle.QUICK_RESOLUTION
+        return "circle_full", size, size, circle.iter_circle_rows(colours, size)
+    if kind == "vertical":
+        colours = [frame["color"] for frame in load_frame_metadata(frame_dir)]
+        if poster_mode:
+            width, height = vertical.CLASSIC_HQ_WIDTH, vertical.CLASSIC_HQ_HEIGHT
+        else:
+            width, height = vertical.CLASSIC_QUICK_WIDTH, vertical.CLASSIC_QUICK_HEIGHT
+        return "vertical_classic", width, height, vertical.iter_vertical_classic(colours, width, height, BAND_ROWS)
+    if kind == "cinematic":
+        data = load_frame_metadata(frame_dir)
+        colours = [frame["color"] for frame in data]
+        brightness = [frame["brightness"] for frame in data]
+        if poster_mode:
+            width, height = vertical.HQ_WIDTH, vertical.HQ_HEIGHT
+        else:
+            width, height = vertical.QUICK_WIDTH, vertical.QUICK_HEIGHT
+        bands = vertical.iter_vertical_cinematic(colours, brightness, width, height, BAND_ROWS)
+        return "vertical_cinematic", width, height, bands
+    if kind == "radial":
+        src = radial.load_radial_source(frame_dir, os.path.join(OUTPUT_ROOT, folder, "linear_hq.png"))
+        size = radial.POSTER_RESOLUTION if poster_mode else radial.QUICK_RESOLUTION
+        bands = ((start, rows[:, :, ::-1]) for start, rows in radial.iter_radial_rows(src, size, BAND_ROWS))
+        return "radial_hq", size, size, bands
+    # cv2.warpPolar needs the whole image; the pyramid still streams it out band by band.
+    size = donut.HQ_RESOLUTION if poster_mode else donut.QUICK_RESOLUTION
+    timeline = donut.load_strip_timeline(os.path.join(CIRCLE_ROOT, folder))
+    image = np.ascontiguousarray(donut.render_donut(timeline, size))
+    # The donut PNG is saved with bgr=True; keep the tiles identical to it.
+    return "circle_donut_poster", size, size, array_bands(image[:, :, ::-1])
+
+
+def main():
+    args = parse_args()
+    start_profiling(args, "tiles")
+    folder = args.folder or select_folder(FRAME_ROOT)
+    out_dir = Path(OUTPUT_ROOT) / folder / "tiles"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    for kind in args.kind or ["circle", "vertical"]:
+        try:
+            name, width, height, bands = kind_source(kind, folder, args.poster_mode)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"[✗] {kind}: {e}")
+            continue
+        print(f"[>] Tiling {name} ({width}x{height}, {args.tile_size}px tiles)")
+        write_pyramid(
+            bands, out_dir, name, width, height,
+            tile_size=args.tile_size, fmt=args.format, palette=args.png_palette,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+import argparse
+import json
+import os
+import re
+import subprocess
+import threading
+
+from colours_of_motion_fingerprint import source_fingerprint
+from colours_of_motion_manifest import record_extraction
+
+# === CONFIGURATION ===
+EXTRACTION_FILE = "extraction.json"   # Written next to extracted frames/strips
+HDR_TRANSFERS = ("smpte2084", "arib-std-b67")   # PQ and HLG
+BT709_PRIMARIES = ("bt709", "unknown", "", None)
+
+# Every chain ends in full-range BT.601 YCbCr: what JFIF decoders (PIL, OpenCV) assume when
+# reading the JPEG frames, and what the PNG/rawvideo outputs are converted to RGB from.
+ENCODER_FORMAT = "scale=out_color_matrix=bt601:out_range=pc,format=yuvj420p"
+
+# Filter chains applied after fps=; each ends in ENCODER_FORMAT for the image encoders.
+TONEMAP_CHAINS = {
+    # PQ/HLG: linearise, convert primaries in float, tone-map highlights back into SDR.
+    "hable": (
+        "zscale=t=linear:npl=100,"
+        "format=gbrpf32le,"
+        "zscale=p=bt709,"
+        "tonemap=hable,"
+        "zscale=t=bt709,"
+        f"{ENCODER_FORMAT}"
+    ),
+    # SDR outside BT.709 (e.g. BT.2020 SDR): convert colourimetry, no float pass.
+    "bt709": f"zscale=p=bt709:t=bt709:m=bt709,{ENCODER_FORMAT}",
+    # BT.709 SDR: only the YCbCr matrix and range change.
+    "none": ENCODER_FORMAT,
+}
+TONEMAP_MODES = ("auto", *TONEMAP_CHAINS)
+
+# Letterbox detection: cropdetect at a few dozen seek points, bars removed before tone mapping.
+CROP_POINTS = 24              # Seek points sampled across the film (first/last 5% skipped)
+CROP_FRAMES = 4               # Frames analysed at each point
+CROP_LIMIT = 24 / 255         # cropdetect black threshold as a fraction, so it scales with bit depth
+CROP_MIN_SAVING = 0.02        # Crops removing less than 2% of the picture are not applied
+CROP_RE = re.compile(r"crop=(\d+):(\d+):(\d+):(\d+)")
+CROP_CACHE_FILE = "crop_cache.json"   # Detected crops by source fingerprint, so each film is scanned once
+
+
+def crop_mode(text):
+    """argparse type for --crop: auto, none or an explicit W:H:X:Y."""
+    if text in ("auto", "none"):
+        return text
+    if not re.fullmatch(r"\d+:\d+:\d+:\d+", text):
+        raise argparse.ArgumentTypeError("expected auto, none or W:H:X:Y (e.g. 1920:800:0:140)")
+    return text
+
+
+def add_tonemap_args(parser):
+    """Add the shared --tonemap and --crop overrides to an entry point's parser."""
+    parser.add_argument(
+        "--tonemap",
+        choices=TONEMAP_MODES,
+        default="auto",
+        help="auto: probe the source with ffprobe (hable for PQ/HLG, none for BT.709 SDR); "
+        "or force hable, bt709 or none.",
+    )
+    parser.add_argument(
+        "--crop",
+        type=crop_mode,
+        default="auto",
+        help=f"auto: detect letterbox/pillarbox bars with cropdetect at {CROP_POINTS} points and crop "
+        "them before analysis; none: keep the full frame; or W:H:X:Y to force a crop.",
+    )
+    return parser
+
+
+def probe_source(video_path):
+    """Colour properties of the first video stream, or None if ffprobe is unavailable or fails."""
+    cmd = [
+        "ffprobe", "-v", "error", "-select_streams", "v:0",
+        "-show_entries",
+        "stream=width,height,pix_fmt,color_transfer,color_primaries,color_space,bits_per_raw_sample,avg_frame_rate"
+        ":format=duration",
+        "-of", "json", video_path,
+    ]
+    try:
+        result = subprocess.run(cmd, check=True, capture_output=True, text=True)
+        probed = json.loads(result.stdout)
+        streams = probed.get("streams") or []
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        return None
+    if not streams:
+        return None
+    stream = streams[0]
+    try:
+        duration = float((probed.get("format") or {}).get("duration"))
+    except (TypeError, ValueError):
+        duration = None
+    try:
+        num, _, den = str(stream.get("avg_frame_rate", "")).partition("/")
+        frame_rate = float(num) / float(den or 1)
+    except (TypeError, ValueError, ZeroDivisionError):
+        frame_rate = None
+    pix_fmt = stream.get("pix_fmt", "")
+    bits = stream.get("bits_per_raw_sample")
+    if not str(bits or "").isdigit():
+        # e.g. yuv420p10le -> 10; plain yuv420p -> 8
+        digits = "".join(ch for ch in pix_fmt.split("p")[-1] if ch.isdigit())
+        bits = digits or 8
+    return {
+        "pix_fmt": pix_fmt,
+        "bit_depth": int(bits),
+        "color_transfer": stream.get("color_transfer", "unknown"),
+        "color_primaries": stream.get("color_primaries", "unknown"),
+        "color_space": stream.get("color_space", "unknown"),
+        "duration_s": duration,
+        "frame_rate": frame_rate or None,
+        "width": stream.get("width"),
+        "height": stream.get("height"),
+    }
+
+
+def choose_tonemap(source):
+    """Chain name for a probed source: hable for PQ/HLG, bt709 for non-BT.709 SDR, else none."""
+    if source is None:
+        # Unknown source: the full chain is correct for both SDR and HDR, just slower.
+        return "hable"
+    if source["color_transfer"] in HDR_TRANSFERS:
+        return "hable"
+    if source["color_primaries"] not in BT709_PRIMARIES:
+        return "bt709"
+    return "none"
+
+
+def detect_crop(video_path, duration, points=CROP_POINTS):
+    """Picture area (w, h, x, y) from cropdetect at evenly spaced points, or None if none was found.
+
+    Each point decodes a few frames after a fast seek. The boxes are united, so a dark
+    scene (which cropdetect shrinks) never cuts into picture that a bright one shows;
+    fully black frames report no box and are skipped.
+    """
+    boxes = []
+    for i in range(points):
+        at = duration * (0.05 + 0.9 * (i + 0.5) / points)
+        cmd = [
+            "ffmpeg", "-hide_banner", "-nostats",
+            "-ss", f"{at:.3f}", "-i", video_path,
+            "-map", "0:v:0", "-an", "-sn",
+            "-frames:v", str(CROP_FRAMES),
+            "-vf", f"cropdetect=limit={CROP_LIMIT:.4f}:round=2:reset=0",
+            "-f", "null", "-",
+        ]
+        try:
+            result = subprocess.run(cmd, check=True, capture_output=True, text=True)
+        except (OSError, subprocess.CalledProcessError):
+            continue
+        found = CROP_RE.findall(result.stderr)
+        if found:
+            boxes.append(tuple(int(v) for v in found[-1]))
+    if not boxes:
+        return None
+    x0 = min(x for _, _, x, _ in boxes)
+    y0 = min(y for _, _, _, y in boxes)
+    x1 = max(x + w for w, _, x, _ in boxes)
+    y1 = max(y + h for _, h, _, y in boxes)
+    # Even offsets and sizes keep 4:2:0 chroma aligned; round outwards so no picture is lost.
+    x0, y0 = x0 // 2 * 2, y0 // 2 * 2
+    return (x1 - x0 + 1) // 2 * 2, (y1 - y0 + 1) // 2 * 2, x0, y0
+
+
+_crop_lock = threading.Lock()
+_crop_locks = {}
+
+
+def _load_crop_cache():
+    try:
+        with open(CROP_CACHE_FILE, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def cached_crop(video_path, duration):
+    """detect_crop() once per source; later calls (strips after frames, re-runs) read crop_cache.json.
+
+    Entries are keyed by the content fingerprint and the detection settings, so a
+    replaced file or a changed threshold is scanned again.
+    """
+    try:
+        fingerprint = source_fingerprint(video_path)
+    except OSError:
+        return detect_crop(video_path, duration)
+    settings = f"limit={CROP_LIMIT:.4f}:points={CROP_POINTS}:frames={CROP_FRAMES}"
+    with _crop_lock:
+        source_lock = _crop_locks.setdefault(fingerprint, threading.Lock())
+    # Parallel extractors of one film wait for the first scan instead of repeating it.
+    with source_lock:
+        with _crop_lock:
+            entry = _load_crop_cache().get(fingerprint)
+        if entry and entry.get("settings") == settings:
+            return tuple(entry["box"]) if entry["box"] else None
+        box = detect_crop(video_path, duration)
+        with _crop_lock:
+            cache = _load_crop_cache()
+            cache[fingerprint] = {
+                "source": os.path.basename(video_path),
+                "box": list(box) if box else None,
+                "settings": settings,
+            }
+            tmp = f"{CROP_CACHE_FILE}.tmp"
+            with open(tmp, 'w') as f:
+                json.dump(cache, f, indent=2)
+            os.replace(tmp, CROP_CACHE_FILE)
+    return box
+
+
+def select_crop(video_path, mode, source):
+    """Resolve --crop to a "W:H:X:Y" string, or None to keep the full frame."""
+    if mode == "none":
+        return None
+    if mode != "auto":
+        return mode
+    duration = (source or {}).get("duration_s")
+    if not duration:
+        print("[!] Crop detection needs the duration from ffprobe; keeping the full frame.")
+        return None
+    box = cached_crop(video_path, duration)
+    if box is None:
+        print("[>] Crop: none (auto; cropdetect found no picture edges)")
+        return None
+    w, h, x, y = box
+    width, height = (source or {}).get("width"), (source or {}).get("height")
+    if width and height and w * h >= (1.0 - CROP_MIN_SAVING) * width * height:
+        print("[>] Crop: none (auto; no bars found)")
+        return None
+    return f"{w}:{h}:{x}:{y}"
+
+
+def select_tonemap(video_path, mode="auto", crop="auto"):
+    """Resolve --tonemap and --crop for one source; returns the record stored in extraction.json.
+
+    A crop goes first in the filter chain, so the bars are neither tone-mapped nor
+    part of any average.
+    """
+    source = probe_source(video_path)
+    if mode == "auto":
+        name = choose_tonemap(source)
+        if source is None:
+            print("[!] ffprobe could not read the source; using the full HDR tone-map chain.")
+    else:
+        name = mode
+    if source:
+        print(
+            f"[>] Tone map: {name} ({mode}; {source['color_transfer']}/{source['color_primaries']}, "
+            f"{source['bit_depth']}-bit)"
+        )
+    else:
+        print(f"[>] Tone map: {name} ({mode})")
+    chain = TONEMAP_CHAINS[name]
+    crop_box = select_crop(video_path, crop, source)
+    if crop_box:
+        w, h, x, y = (int(v) for v in crop_box.split(":"))
+        width, height = (source or {}).get("width"), (source or {}).get("height")
+        saved = f"; {1 - w * h / (width * height):.0%} fewer pixels" if width and height else ""
+        print(f"[>] Crop: {w}x{h}+{x}+{y} ({crop}{saved})")
+        chain = f"crop={crop_box},{chain}"
+    return {
+        "mode": mode,
+        "tonemap": name,
+        "filter": chain,
+        "crop": crop_box,
+        "crop_mode": crop,
+        "probe": source,
+    }
+
+
+def save_extraction_info(output_dir, video_path, fps, tonemap, **extra):
+    """Record how a frame/strip set was extracted so renders can be reproduced (and in the film's manifest)."""
+    payload = {
+        "source": os.path.basename(video_path),
+        "sample_fps": fps,
+        **tonemap,
+        **extra,
+    }
+    with open(os.path.join(output_dir, EXTRACTION_FILE), 'w') as f:
+        json.dump(payload, f, indent=2)
+    record_extraction(output_dir, payload, video_path)
@@ -0,0 +1,277 @@
+import math
+import os
+import zlib
+from pathlib import Path
+
+from colours_of_motion_manifest import record_output
+
+# === CONFIGURATION ===
+VECTOR_FORMATS = ("svg", "pdf", "both")
+VECTOR_DPI = 300              # PDF page size: pixel coordinates printed at this resolution
+SEAM_OVERLAP = 1e-4           # Turns each wedge/run overlaps the next to hide anti-aliasing seams
+PRECISION = 2                 # Decimal places for coordinates
+
+
+def add_vector_args(parser):
+    """Add the shared --vector flag to an entry point's parser."""
+    parser.add_argument(
+        "--vector",
+        choices=VECTOR_FORMATS,
+        default=None,
+        help="Write resolution-independent SVG and/or PDF (equal adjacent colours merged) instead of the PNG.",
+    )
+    return parser
+
+
+def _num(value):
+    text = f"{value:.{PRECISION}f}".rstrip("0").rstrip(".")
+    return "0" if text in ("", "-0") else text
+
+
+def _hex(colour):
+    r, g, b = (int(c) for c in colour[:3])
+    return f"#{r:02x}{g:02x}{b:02x}"
+
+
+def colour_runs(colours):
+    """Merge adjacent equal colours: [(start, stop, colour), ...] over indices."""
+    runs = []
+    start = 0
+    colours = [tuple(int(c) for c in colour[:3]) for colour in colours]
+    for i in range(1, len(colours) + 1):
+        if i == len(colours) or colours[i] != colours[start]:
+            runs.append((start, i, colours[start]))
+            start = i
+    return runs
+
+
+def _arc_point(cx, cy, r, turn):
+    angle = turn * 2.0 * math.pi
+    return cx + r * math.cos(angle), cy + r * math.sin(angle)
+
+
+def _arc_beziers(cx, cy, r, t0, t1):
+    """Cubic Bezier control points approximating an arc from turn t0 to t1 (<= quarter turns)."""
+    segments = max(1, math.ceil(abs(t1 - t0) * 4 - 1e-9))
+    step = (t1 - t0) / segments
+    curves = []
+    for i in range(segments):
+        a0 = (t0 + i * step) * 2.0 * math.pi
+        a1 = (t0 + (i + 1) * step) * 2.0 * math.pi
+        k = 4.0 / 3.0 * math.tan((a1 - a0) / 4.0)
+        x0, y0 = cx + r * math.cos(a0), cy + r * math.sin(a0)
+        x3, y3 = cx + r * math.cos(a1), cy + r * math.sin(a1)
+        curves.append((
+            x0 - k * r * math.sin(a0), y0 + k * r * math.cos(a0),
+            x3 + k * r * math.sin(a1), y3 - k * r * math.cos(a1),
+            x3, y3,
+        ))
+    return curves
+
+
+class VectorDrawing:
+    """Filled shapes in pixel coordinates (y down), written as SVG or PDF.
+
+    Angles are turns clockwise from 3 o'clock, the PIL pieslice convention. Drawings
+    compose with place(), which is how the poster art layer reuses the circle and
+    dot strip drawings.
+    """
+
+    def __init__(self, width, height, background=None):
+        self.width = width
+        self.height = height
+        self.items = []
+        if background is not None:
+            self.rect(0, 0, width, height, background)
+
+    def rect(self, x, y, w, h, fill):
+        self.items.append(("rect", (x, y, w, h), tuple(fill[:3])))
+
+    def wedge(self, cx, cy, r_inner, r_outer, t0, t1, fill):
+        """Annular sector from turn t0 to t1; a full turn is drawn as two halves."""
+        if t1 - t0 >= 1.0:
+            self.wedge(cx, cy, r_inner, r_outer, t0, t0 + 0.5, fill)
+            self.wedge(cx, cy, r_inner, r_outer, t0 + 0.5, t1, fill)
+            return
+        self.items.append(("wedge", (cx, cy, r_inner, r_outer, t0, t1), tuple(fill[:3])))
+
+    def dot(self, cx, cy, r, fill):
+        self.items.append(("dot", (cx, cy, r), tuple(fill[:3])))
+
+    def vertical_gradient(self, x, y, w, h, stops):
+        """Rectangle shaded top to bottom through [(offset 0..1, colour), ...]."""
+        stops = [(float(o), tuple(int(c) for c in colour[:3])) for o, colour in stops]
+        self.items.append(("gradient", (x, y, w, h), stops))
+
+    def place(self, drawing, x, y, scale=1.0):
+        """Draw another drawing with its origin at (x, y), scaled."""
+        self.items.append(("group", (x, y, scale), drawing))
+
+    # === SVG ===
+    def _svg_items(self, out, gradients):
+        for kind, geom, paint in self.items:
+            if kind == "rect":
+                x, y, w, h = geom
+                out.append(
+                    f'<rect x="{_num(x)}" y="{_num(y)}" width="{_num(w)}" height="{_num(h)}" fill="{_hex(paint)}"/>'
+                )
+            elif kind == "wedge":
+                cx, cy, ri, ro, t0, t1 = geom
+                large = 1 if t1 - t0 > 0.5 else 0
+                ox0, oy0 = _arc_point(cx, cy, ro, t0)
+                ox1, oy1 = _arc_point(cx, cy, ro, t1)
+                ix1, iy1 = _arc_point(cx, cy, ri, t1)
+                ix0, iy0 = _arc_point(cx, cy, ri, t0)
+                out.append(
+                    f'<path d="M{_num(ox0)} {_num(oy0)}A{_num(ro)} {_num(ro)} 0 {large} 1 {_num(ox1)} {_num(oy1)}'
+                    f'L{_num(ix1)} {_num(iy1)}A{_num(ri)} {_num(ri)} 0 {large} 0 {_num(ix0)} {_num(iy0)}Z" '
+                    f'fill="{_hex(paint)}"/>'
+                )
+            elif kind == "dot":
+                cx, cy, r = geom
+                out.append(f'<circle cx="{_num(cx)}" cy="{_num(cy)}" r="{_num(r)}" fill="{_hex(paint)}"/>')
+            elif kind == "gradient":
+                x, y, w, h = geom
+                gid = f"g{len(gradients)}"
+                stops = "".join(
+                    f'<stop offset="{offset:.6g}" stop-color="{_hex(colour)}"/>' for offset, colour in paint
+                )
+                gradients.append(f'<linearGradient id="{gid}" x1="0" y1="0" x2="0" y2="1">{stops}</linearGradient>')
+                out.append(
+                    f'<rect x="{_num(x)}" y="{_num(y)}" width="{_num(w)}" height="{_num(h)}" fill="url(#{gid})"/>'
+                )
+            else:
+                x, y, scale = geom
+                out.append(f'<g transform="translate({_num(x)} {_num(y)}) scale({scale:.6g})">')
+                paint._svg_items(out, gradients)
+                out.append("</g>")
+
+    def to_svg(self):
+        body, gradients = [], []
+        self._svg_items(body, gradients)
+        defs = f"<defs>{''.join(gradients)}</defs>\n" if gradients else ""
+        return (
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{self.width}" height="{self.height}" '
+            f'viewBox="0 0 {self.width} {self.height}" shape-rendering="geometricPrecision">\n'
+            + defs + "\n".join(body) + "\n</svg>\n"
+        )
+
+    # === PDF ===
+    def _pdf_items(self, out, shadings):
+        current = None
+        for kind, geom, paint in self.items:
+            if kind == "group":
+                x, y, scale = geom
+                out.append(f"q {scale:.6g} 0 0 {scale:.6g} {_num(x)} {_num(y)} cm")
+                paint._pdf_items(out, shadings)
+                out.append("Q")
+                current = None
+                continue
+            if kind == "gradient":
+                x, y, w, h = geom
+                name = f"Sh{len(shadings)}"
+                shadings.append((name, y, y + h, paint))
+                out.append(f"q {_num(x)} {_num(y)} {_num(w)} {_num(h)} re W n /{name} sh Q")
+                continue
+            if paint != current:
+                out.append(" ".join(f"{c / 255:.4g}" for c in paint) + " rg")
+                current = paint
+            if kind == "rect":
+                x, y, w, h = geom
+                out.append(f"{_num(x)} {_num(y)} {_num(w)} {_num(h)} re f")
+            elif kind == "wedge":
+                cx, cy, ri, ro, t0, t1 = geom
+                x, y = _arc_point(cx, cy, ro, t0)
+                path = [f"{_num(x)} {_num(y)} m"]
+                path += [" ".join(_num(v) for v in c) + " c" for c in _arc_beziers(cx, cy, ro, t0, t1)]
+                x, y = _arc_point(cx, cy, ri, t1)
+                path.append(f"{_num(x)} {_num(y)} l")
+                path += [" ".join(_num(v) for v in c) + " c" for c in _arc_beziers(cx, cy, ri, t1, t0)]
+                out.append(" ".join(path) + " h f")
+            else:
+                cx, cy, r = geom
+                x, y = _arc_point(cx, cy, r, 0.0)
+                path = [f"{_num(x)} {_num(y)} m"]
+                path += [" ".join(_num(v) for v in c) + " c" for c in _arc_beziers(cx, cy, r, 0.0, 1.0)]
+                out.append(" ".join(path) + " h f")
+
+    def to_pdf(self, dpi=VECTOR_DPI):
+        """Single-page PDF; one pixel is 1/dpi inch and y is flipped to point down."""
+        scale = 72.0 / dpi
+        page_w, page_h = self.width * scale, self.height * scale
+        body, shadings = [], []
+        self._pdf_items(body, shadings)
+        content = f"{scale:.6g} 0 0 {-scale:.6g} 0 {page_h:.4f} cm\n" + "\n".join(body) + "\n"
+        stream = zlib.compress(content.encode("ascii"), 9)
+
+        objects = [
+            b"<< /Type /Catalog /Pages 2 0 R >>",
+            b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+            None,  # page, filled in once the shading object numbers are known
+            b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(stream) + stream + b"\nendstream",
+        ]
+        shading_refs = []
+        for name, y0, y1, stops in shadings:
+            objects.append(_pdf_shading(y0, y1, stops).encode("ascii"))
+            shading_refs.append(f"/{name} {len(objects)} 0 R")
+        resources = f"<< /Shading << {' '.join(shading_refs)} >> >>" if shading_refs else "<< >>"
+        objects[2] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page_w:.4f} {page_h:.4f}] "
+            f"/Resources {resources} /Contents 4 0 R >>"
+        ).encode("ascii")
+
+        pdf = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for number, obj in enumerate(objects, start=1):
+            offsets.append(len(pdf))
+            pdf += b"%d 0 obj\n" % number + obj + b"\nendobj\n"
+        xref = len(pdf)
+        pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+        pdf += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+        pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+        return bytes(pdf)
+
+    def save(self, path):
+        """Write .svg or .pdf (by suffix) via a temp file, like write_png."""
+        path = Path(path)
+        data = self.to_pdf() if path.suffix.lower() == ".pdf" else self.to_svg().encode("utf-8")
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+        return path
+
+
+def _pdf_shading(y0, y1, stops):
+    """Axial shading from y0 to y1 through the stops (a stitched set of linear segments)."""
+    def rgb(colour):
+        return " ".join(f"{c / 255:.4g}" for c in colour)
+
+    if len(stops) == 1:
+        stops = stops * 2
+    functions, bounds = [], []
+    for (o0, c0), (o1, c1) in zip(stops, stops[1:]):
+        functions.append(f"<< /FunctionType 2 /Domain [0 1] /C0 [{rgb(c0)}] /C1 [{rgb(c1)}] /N 1 >>")
+        bounds.append(o1)
+    encode = " ".join("0 1" for _ in functions)
+    return (
+        f"<< /ShadingType 2 /ColorSpace /DeviceRGB /Coords [0 {_num(y0)} 0 {_num(y1)}] /Extend [true true] "
+        f"/Function << /FunctionType 3 /Domain [{stops[0][0]:.6g} {stops[-1][0]:.6g}] "
+        f"/Functions [{' '.join(functions)}] "
+        f"/Bounds [{' '.join(f'{b:.6g}' for b in bounds[:-1])}] /Encode [{encode}] >> >>"
+    )
+
+
+def vector_paths(output_path, fmt):
+    """circle_full.png + "both" -> [circle_full.svg, circle_full.pdf]."""
+    root, _ = os.path.splitext(os.fspath(output_path))
+    formats = ("svg", "pdf") if fmt == "both" else (fmt,)
+    return [Path(f"{root}.{ext}") for ext in formats]
+
+
+def save_vector(drawing, output_path, fmt):
+    """Save a drawing next to the raster output path in the requested format(s)."""
+    saved = [drawing.save(path) for path in vector_paths(output_path, fmt)]
+    for path in saved:
+        record_output(path)
+        print(f"[✓] Saved vector output: {path}")
+    return saved
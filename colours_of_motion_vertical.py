@@ -1,9 +1,17 @@
 import os
 import json
-from PIL import Image, ImageDraw, ImageFilter
-import numpy as np
 import argparse
 
+from colours_of_motion_binning import area_average, bin_colours, fit_colours
+from colours_of_motion_lazy import lazy_import
+from colours_of_motion_manifest import picker_note
+from colours_of_motion_png import PALETTE_MODES, save_png, wait_for_writes
+from colours_of_motion_preview import add_preview_args, fit_preview, preview_path, render_progressive
+from colours_of_motion_profile import add_profile_args, stage, start_profiling
+from colours_of_motion_vector import VectorDrawing, add_vector_args, save_vector
+
+np = lazy_import("numpy")
+
 # === CONFIGURATION ===
 FRAME_ROOT = "frames"
 OUTPUT_ROOT = "outputs"
@@ -19,10 +27,10 @@ CLASSIC_HQ_WIDTH = 3000
 CLASSIC_HQ_HEIGHT = 24000
 
 # Cinematic tuning
-BASE_STRIPE_HEIGHT = 4        # height per frame
 MIN_WIDTH_RATIO = 0.2         # narrowest stripe = 20% of full width
 MAX_WIDTH_RATIO = 0.9         # widest stripe = 90% of full width
-FEATHER_RADIUS = 2            # blur amount
+FEATHER_RADIUS = 2            # edge falloff half-width in pixels
+CINEMATIC_CHUNK_ROWS = 512    # rows rendered per block to bound float temporaries
 
 def parse_args():
     parser = argparse.ArgumentParser(description="Generate vertical Colours of Motion outputs.")
@@ -31,6 +39,15 @@ def parse_args():
         action="store_true",
         help="Render higher-resolution vertical outputs.",
     )
+    parser.add_argument(
+        "--png-palette",
+        choices=PALETTE_MODES,
+        default="auto",
+        help="Indexed PNG output: auto (only when lossless), quantize (lossy within a bound) or off.",
+    )
+    add_preview_args(parser)
+    add_vector_args(parser)
+    add_profile_args(parser)
     return parser.parse_args()
 
 # === UTILS ===
@@ -45,68 +62,149 @@ def load_metadata(folder_path):
         return json.load(f)
 
 # === CLASSIC VERTICAL ===
-def build_vertical_classic(metadata, output_path, target_width=1600, target_height=20000):
+def build_vertical_classic(
+    metadata,
+    output_path,
+    target_width=1600,
+    target_height=20000,
+    background=False,
+    palette="auto",
+):
     print("[>] Building classic vertical image...")
     colours = np.array([frame["color"] for frame in metadata], dtype=np.float32)
     n_frames = len(colours)
     if n_frames == 0:
         print("[✗] Metadata is empty. Nothing to render.")
         return
+    with stage("vertical.classic", items=n_frames):
+        image_array = render_vertical_classic(colours, target_width, target_height)
+    if background:
+        # Encode while the next render runs; main() waits before exiting.
+        save_png(image_array, output_path, background=True, palette=palette)
+        print(f"[>] Encoding classic vertical image in background: {output_path}")
+        return
+    save_png(image_array, output_path, palette=palette)
+    print(f"[✓] Saved classic vertical image: {output_path}")
+
+def classic_row_colours(colours, target_height):
+    """One colour per output row, interpolated across the frames (binned first when they outnumber the rows)."""
+    colours = fit_colours(colours, target_height).astype(np.float32)
+    n_frames = len(colours)
     # Interpolate frame colours across full target height for smoother HQ output.
     frame_pos = np.linspace(0.0, 1.0, num=n_frames, endpoint=True)
     target_pos = np.linspace(0.0, 1.0, num=target_height, endpoint=True)
-    smooth_colours = np.stack(
+    return np.stack(
         [np.interp(target_pos, frame_pos, colours[:, c]) for c in range(3)],
         axis=1,
     ).astype(np.uint8)
-    image_array = np.tile(smooth_colours[:, None, :], (1, target_width, 1))
-    image = Image.fromarray(image_array, "RGB")
-    image.save(output_path, "PNG", optimize=False, compress_level=1)
-    print(f"[✓] Saved classic vertical image: {output_path}")
+
+def render_vertical_classic(colours, target_width, target_height):
+    """Return the classic vertical as an RGB array, one full-width band per output row."""
+    smooth_colours = classic_row_colours(colours, target_height)
+    return np.tile(smooth_colours[:, None, :], (1, target_width, 1))
+
+def iter_vertical_classic(colours, target_width, target_height, chunk_rows=CINEMATIC_CHUNK_ROWS):
+    """Yield (start_row, rows) bands of the classic vertical (read-only broadcast views)."""
+    smooth_colours = classic_row_colours(colours, target_height)
+    for start in range(0, target_height, chunk_rows):
+        rows = smooth_colours[start:start + chunk_rows, None, :]
+        yield start, np.broadcast_to(rows, (rows.shape[0], target_width, 3))
+
+def vertical_classic_drawing(colours, target_width, target_height):
+    """Vector classic vertical: one gradient with a stop per frame (per row when frames outnumber rows).
+
+    Stops inside a run of equal colours add nothing and are dropped.
+    """
+    colours = [tuple(int(c) for c in colour[:3]) for colour in fit_colours(colours, target_height)]
+    n_frames = len(colours)
+    drawing = VectorDrawing(target_width, target_height)
+    if n_frames == 1:
+        drawing.rect(0, 0, target_width, target_height, colours[0])
+        return drawing
+    stops = [
+        (i / (n_frames - 1), colour)
+        for i, colour in enumerate(colours)
+        if i in (0, n_frames - 1) or not (colours[i - 1] == colour == colours[i + 1])
+    ]
+    drawing.vertical_gradient(0, 0, target_width, target_height, stops)
+    return drawing
+
+def build_vertical_classic_vector(metadata, output_path, fmt, target_width=1600, target_height=20000):
+    colours = [frame["color"] for frame in metadata]
+    if not colours:
+        print("[✗] Metadata is empty. Nothing to render.")
+        return
+    with stage("vertical.classic_vector", items=len(colours)):
+        save_vector(vertical_classic_drawing(colours, target_width, target_height), output_path, fmt)
 
 # === CINEMATIC VERTICAL (BRIGHTNESS-BASED WIDTH) ===
-def build_vertical_cinematic(metadata, output_path, target_width=QUICK_WIDTH, target_height=QUICK_HEIGHT):
+def build_vertical_cinematic(
+    metadata,
+    output_path,
+    target_width=QUICK_WIDTH,
+    target_height=QUICK_HEIGHT,
+    chunk_rows=CINEMATIC_CHUNK_ROWS,
+):
     print("[>] Building cinematic brightness-based vertical image...")
 
     # Extract brightness values
-    brightness_values = [frame["brightness"] for frame in metadata]
-    if not brightness_values:
+    brightness_values = np.array([frame["brightness"] for frame in metadata], dtype=np.float64)
+    if brightness_values.size == 0:
         print("[✗] Metadata is empty. Nothing to render.")
         return
-    min_b, max_b = min(brightness_values), max(brightness_values)
-    colours = [frame["color"] for frame in metadata]
-    n_frames = len(colours)
-
-    # Fixed height per frame
-    stripe_height = max(1, target_height // n_frames)
+    colours = np.array([frame["color"] for frame in metadata], dtype=np.float64)
 
-    # Create black canvas
-    image = Image.new("RGB", (target_width, target_height), "black")
-    draw = ImageDraw.Draw(image)
+    with stage("vertical.cinematic", items=len(colours)):
+        image = render_vertical_cinematic(colours, brightness_values, target_width, target_height, chunk_rows)
 
-    y = 0
-    for colour, brightness in zip(colours, brightness_values):
-        # Map brightness to stripe width
-        norm_b = (brightness - min_b) / (max_b - min_b + 1e-5)
-        stripe_width = int(MIN_WIDTH_RATIO * target_width + norm_b * (MAX_WIDTH_RATIO - MIN_WIDTH_RATIO) * target_width)
+    save_png(image, output_path)
+    print(f"[✓] Saved cinematic vertical image: {output_path}")
 
-        x1 = (target_width - stripe_width) // 2
-        x2 = x1 + stripe_width
+def render_vertical_cinematic(
+    colours,
+    brightness_values,
+    target_width,
+    target_height,
+    chunk_rows=CINEMATIC_CHUNK_ROWS,
+):
+    """Return the cinematic vertical as an RGB array; stripe width follows brightness."""
+    image = np.empty((target_height, target_width, 3), dtype=np.uint8)
+    bands = iter_vertical_cinematic(colours, brightness_values, target_width, target_height, chunk_rows)
+    for start, rows in bands:
+        image[start:start + len(rows)] = rows
+    return image
 
-        draw.rectangle([x1, y, x2, y + stripe_height], fill=tuple(map(int, colour)))
-        y += stripe_height
-        if y >= target_height:
-            break
+def iter_vertical_cinematic(
+    colours,
+    brightness_values,
+    target_width,
+    target_height,
+    chunk_rows=CINEMATIC_CHUNK_ROWS,
+):
+    """Yield (start_row, rows) bands of the cinematic vertical."""
+    colours = np.asarray(colours, dtype=np.float64)
+    brightness_values = np.asarray(brightness_values, dtype=np.float64)
+    min_b, max_b = brightness_values.min(), brightness_values.max()
+    # Resample frames to rows (colours in linear light), then map brightness to stripe width per row.
+    row_colours = bin_colours(colours, target_height).astype(np.float32)
+    row_brightness = area_average(brightness_values, target_height)
+    norm_b = (row_brightness - min_b) / (max_b - min_b + 1e-5)
+    stripe_widths = (MIN_WIDTH_RATIO + norm_b * (MAX_WIDTH_RATIO - MIN_WIDTH_RATIO)) * target_width
+    half_widths = (stripe_widths / 2.0).astype(np.float32)
 
-    # Feather edges
-    blurred = image.filter(ImageFilter.GaussianBlur(radius=FEATHER_RADIUS))
-    final = Image.composite(blurred, image, image.convert("L"))
-    final.save(output_path, "PNG", optimize=False, compress_level=1)
-    print(f"[✓] Saved cinematic vertical image: {output_path}")
+    # Feather edges with a linear falloff along each row instead of a 2D blur.
+    feather = max(1e-3, 2.0 * FEATHER_RADIUS)
+    dist_from_centre = np.abs(np.arange(target_width, dtype=np.float32) + 0.5 - target_width / 2.0)
+    for start in range(0, target_height, chunk_rows):
+        stop = min(target_height, start + chunk_rows)
+        coverage = (half_widths[start:stop, None] - dist_from_centre[None, :]) / feather + 0.5
+        np.clip(coverage, 0.0, 1.0, out=coverage)
+        yield start, (coverage[:, :, None] * row_colours[start:stop, None, :] + 0.5).astype(np.uint8)
 
 # === MAIN ===
 def main():
     args = parse_args()
+    start_profiling(args, "vertical")
     folders = list_folders(FRAME_ROOT)
     if not folders:
         print("[✗] No processed frame folders found.")
@@ -114,7 +212,7 @@ def main():
 
     print("Available processed movies:")
     for i, folder in enumerate(folders, start=1):
-        print(f"  {i}. {folder}")
+        print(f"  {i}. {folder}{picker_note(os.path.join(FRAME_ROOT, folder))}")
 
     choice = input("Select a folder number: ").strip()
     try:
@@ -127,39 +225,59 @@ def main():
     output_dir = os.path.join(OUTPUT_ROOT, folder_name)
     os.makedirs(output_dir, exist_ok=True)
 
-    metadata = load_metadata(frame_dir)
+    with stage("vertical.load_metadata"):
+        metadata = load_metadata(frame_dir)
 
     # Build both styles
     classic_out = os.path.join(output_dir, "vertical_classic.png")
     cinematic_out = os.path.join(output_dir, "vertical_cinematic.png")
 
     if args.poster_mode:
-        build_vertical_classic(
-            metadata,
-            classic_out,
-            target_width=CLASSIC_HQ_WIDTH,
-            target_height=CLASSIC_HQ_HEIGHT,
-        )
-        build_vertical_cinematic(
-            metadata,
-            cinematic_out,
-            target_width=HQ_WIDTH,
-            target_height=HQ_HEIGHT,
-        )
+        classic_size = (CLASSIC_HQ_WIDTH, CLASSIC_HQ_HEIGHT)
+        cinematic_size = (HQ_WIDTH, HQ_HEIGHT)
     else:
-        build_vertical_classic(
-            metadata,
-            classic_out,
-            target_width=CLASSIC_QUICK_WIDTH,
-            target_height=CLASSIC_QUICK_HEIGHT,
-        )
+        classic_size = (CLASSIC_QUICK_WIDTH, CLASSIC_QUICK_HEIGHT)
+        cinematic_size = (QUICK_WIDTH, QUICK_HEIGHT)
+
+    def build(classic_path, cinematic_path, classic_wh, cinematic_wh):
+        if args.vector:
+            # The cinematic feathered stripes have no vector form; it stays a PNG.
+            build_vertical_classic_vector(metadata, classic_path, args.vector, *classic_wh)
+        else:
+            build_vertical_classic(
+                metadata,
+                classic_path,
+                target_width=classic_wh[0],
+                target_height=classic_wh[1],
+                background=True,
+                palette=args.png_palette,
+            )
         build_vertical_cinematic(
             metadata,
-            cinematic_out,
-            target_width=QUICK_WIDTH,
-            target_height=QUICK_HEIGHT,
+            cinematic_path,
+            target_width=cinematic_wh[0],
+            target_height=cinematic_wh[1],
         )
 
+    def build_preview():
+        build(
+            preview_path(classic_out),
+            preview_path(cinematic_out),
+            fit_preview(*classic_size),
+            fit_preview(*cinematic_size),
+        )
+        wait_for_writes()
+
+    if args.preview:
+        build_preview()
+    elif args.progressive:
+        render_progressive(
+            build_preview, lambda: build(classic_out, cinematic_out, classic_size, cinematic_size)
+        ).join()
+    else:
+        build(classic_out, cinematic_out, classic_size, cinematic_size)
+
+    wait_for_writes()
     print("[✓] Vertical generation complete.")
 
 if __name__ == "__main__":
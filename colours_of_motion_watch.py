@@ -0,0 +1,524 @@
+import argparse
+import json
+import os
+import re
+import socket
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+import colours_of_motion_circle as circle
+import colours_of_motion_donut as donut
+import colours_of_motion_palette as palette
+import colours_of_motion_processing as processing
+import colours_of_motion_radial as radial
+import colours_of_motion_shots as shots
+import colours_of_motion_vertical as vertical
+from colours_of_motion_fingerprint import source_fingerprint
+from colours_of_motion_lazy import load_now
+from colours_of_motion_profile import add_profile_args, stage, start_profiling
+from colours_of_motion_tonemap import add_tonemap_args
+
+# === CONFIGURATION ===
+INBOX = "inbox"
+QUEUE_DB = "ingest_queue.sqlite3"
+FRAME_ROOT = "frames"
+CIRCLE_ROOT = "circle_data"
+OUTPUT_ROOT = "outputs"
+VIDEO_EXTENSIONS = {".mkv", ".mp4", ".m4v", ".mov", ".avi", ".ts", ".m2ts", ".webm"}
+POLL_SECONDS = 5
+SETTLE_SECONDS = 10          # A file must stop growing for this long before it is queued
+DEFAULT_WORKERS = 1
+
+# Filename convention shared with the frame folders: "Title (Year) - ttXXXXXXX".
+FILM_NAME_RE = re.compile(r"^(?P<title>.+?)\s*\((?P<year>\d{4})\)\s*-\s*(?P<imdb>tt\d{6,10})\b")
+
+# Job graph for one input: kind -> kind it waits for.
+JOB_GRAPH = {
+    "extract_frames": None,
+    "metadata": "extract_frames",
+    "extract_strips": None,
+    "render_circle": "metadata",
+    "render_vertical": "metadata",
+    "render_radial": "extract_frames",
+    "render_shots": "metadata",
+    "render_palette": "render_shots",
+    "render_donut": "extract_strips",
+    "render_poster": "render_circle",
+}
+RENDERS = ("circle", "vertical", "radial", "shots", "palette", "donut", "poster")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS inputs (
+    input_key TEXT PRIMARY KEY,
+    video_path TEXT NOT NULL,
+    folder TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    options TEXT NOT NULL,
+    added_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    input_key TEXT NOT NULL REFERENCES inputs(input_key),
+    kind TEXT NOT NULL,
+    depends_on TEXT,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    claimed_by TEXT,
+    error TEXT,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT,
+    UNIQUE (input_key, kind)
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+"""
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Watch an inbox folder and ingest new videos through a durable job queue."
+    )
+    parser.add_argument("--inbox", default=INBOX, help="Folder to watch for new video files.")
+    parser.add_argument("--db", default=QUEUE_DB, help="SQLite job queue path.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Jobs run concurrently.")
+    parser.add_argument("--poll", type=float, default=POLL_SECONDS, help="Seconds between inbox scans.")
+    parser.add_argument(
+        "--settle",
+        type=float,
+        default=SETTLE_SECONDS,
+        help="Seconds a file must stay unchanged before it is queued (copies in progress are skipped).",
+    )
+    parser.add_argument(
+        "--renders",
+        default=",".join(RENDERS),
+        help=f"Comma-separated renders to queue per film ({','.join(RENDERS)}).",
+    )
+    parser.add_argument(
+        "--poster_mode",
+        action="store_true",
+        help="Queue high-resolution renders.",
+    )
+    parser.add_argument(
+        "--scene-cuts",
+        action="store_true",
+        help="Detect scene cuts during frame extraction so shot strips use exact cut times.",
+    )
+    add_tonemap_args(parser)
+    parser.add_argument(
+        "--once",
+        action="store_true",
+        help="Queue what is in the inbox now, run every runnable job, then exit.",
+    )
+    parser.add_argument("--status", action="store_true", help="Print the queue and exit.")
+    parser.add_argument("--retry-failed", action="store_true", help="Requeue failed jobs and exit.")
+    add_profile_args(parser)
+    return parser.parse_args()
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+# === INPUT NAMING ===
+def folder_from_filename(path):
+    """'Aliens (1986) - tt0090605.mkv' -> 'Aliens (1986) - tt0090605', or None."""
+    match = FILM_NAME_RE.match(Path(path).stem)
+    if not match:
+        return None
+    return f"{match.group('title').strip()} ({match.group('year')}) - {match.group('imdb')}"
+
+
+# === QUEUE ===
+class JobQueue:
+    """Jobs in SQLite; every state change is its own transaction so a crash loses nothing."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        # host:pid:session - a restarted container can reuse the pid, never the session.
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        # sqlite3 connections cannot be shared across threads; one per worker.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def _connect(self):
+        return _Transaction(self._conn())
+
+    def known_input(self, input_key):
+        with self._connect() as conn:
+            return conn.execute("SELECT 1 FROM inputs WHERE input_key = ?", (input_key,)).fetchone() is not None
+
+    def folder_owner(self, folder):
+        with self._connect() as conn:
+            row = conn.execute("SELECT input_key FROM inputs WHERE folder = ?", (folder,)).fetchone()
+            return row["input_key"] if row else None
+
+    def add_input(self, input_key, video_path, folder, options, kinds):
+        """Register an input and its jobs; returns False if it was already queued."""
+        now = _now()
+        with self._connect() as conn:
+            inserted = conn.execute(
+                "INSERT OR IGNORE INTO inputs (input_key, video_path, folder, size, options, added_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (input_key, str(video_path), folder, os.path.getsize(video_path), json.dumps(options), now),
+            ).rowcount
+            for kind in kinds:
+                depends_on = JOB_GRAPH[kind]
+                conn.execute(
+                    "INSERT OR IGNORE INTO jobs (input_key, kind, depends_on, created_at) VALUES (?, ?, ?, ?)",
+                    (input_key, kind, depends_on if depends_on in kinds else None, now),
+                )
+            return bool(inserted)
+
+    def claim(self):
+        """Atomically move the oldest runnable job to 'running' and return it, or None."""
+        with self._connect() as conn:
+            row = conn.execute(
+                """
+                SELECT j.id, j.kind, i.video_path, i.folder, i.options
+                FROM jobs j JOIN inputs i ON i.input_key = j.input_key
+                WHERE j.status = 'queued'
+                  AND (j.depends_on IS NULL OR EXISTS (
+                        SELECT 1 FROM jobs d
+                        WHERE d.input_key = j.input_key AND d.kind = j.depends_on AND d.status = 'done'))
+                ORDER BY j.id LIMIT 1
+                """
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', claimed_by = ?, started_at = ?, attempts = attempts + 1, "
+                "error = NULL WHERE id = ?",
+                (self.owner, _now(), row["id"]),
+            )
+            return dict(row)
+
+    def finish(self, job_id, error=None):
+        status = "failed" if error else "done"
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, error, _now(), job_id),
+            )
+
+    def recover(self):
+        """Requeue jobs left 'running' by a process on this host that no longer exists.
+
+        A claim carrying our own pid under another session is from an earlier process
+        that had this pid (e.g. before a container restart), so it is stale too.
+        """
+        host, pid_now = socket.gethostname(), str(os.getpid())
+        requeued = 0
+        with self._connect() as conn:
+            rows = conn.execute("SELECT id, claimed_by FROM jobs WHERE status = 'running'").fetchall()
+            for row in rows:
+                claimed_by = row["claimed_by"] or ""
+                if claimed_by == self.owner:
+                    continue
+                owner_host, pid = _split_owner(claimed_by)
+                if owner_host == host and pid.isdigit() and (pid == pid_now or not _pid_alive(int(pid))):
+                    conn.execute(
+                        "UPDATE jobs SET status = 'queued', claimed_by = NULL WHERE id = ?", (row["id"],)
+                    )
+                    requeued += 1
+        return requeued
+
+    def retry_failed(self):
+        with self._connect() as conn:
+            return conn.execute("UPDATE jobs SET status = 'queued', error = NULL WHERE status = 'failed'").rowcount
+
+    def counts(self):
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+            return {row["status"]: row["n"] for row in rows}
+
+    def listing(self):
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT j.id, i.folder, j.kind, j.status, j.attempts, j.error "
+                "FROM jobs j JOIN inputs i ON i.input_key = j.input_key ORDER BY j.id"
+            ).fetchall()
+
+
+class _Transaction:
+    """`with` block wrapping BEGIN IMMEDIATE ... COMMIT on an autocommit connection."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+def _split_owner(claimed_by):
+    """(host, pid) of a 'host:pid:session' or older 'host:pid' claim."""
+    host, _, rest = claimed_by.partition(":")
+    return host, rest.partition(":")[0]
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# === JOB RUNNERS ===
+def run_job(kind, video_path, folder, options):
+    """Run one job in this process; raises on failure."""
+    poster_mode = options.get("poster_mode", False)
+    frame_dir = os.path.join(FRAME_ROOT, folder)
+    circle_dir = os.path.join(CIRCLE_ROOT, folder)
+    output_dir = os.path.join(OUTPUT_ROOT, folder)
+    os.makedirs(output_dir, exist_ok=True)
+
+    if kind == "extract_frames":
+        processing.extract_frames(
+            video_path,
+            frame_dir,
+            processing.FPS_STANDARD,
+            scene_cuts=options.get("scene_cuts", False),
+            tonemap=options.get("tonemap", "auto"),
+            crop=options.get("crop", "auto"),
+        )
+    elif kind == "metadata":
+        processing.save_metadata(processing.build_metadata(frame_dir), frame_dir)
+    elif kind == "extract_strips":
+        processing.extract_circle_strips(
+            video_path,
+            circle_dir,
+            processing.FPS_CIRCLE,
+            processing.STRIP_HEIGHT,
+            tonemap=options.get("tonemap", "auto"),
+            crop=options.get("crop", "auto"),
+        )
+    elif kind == "render_circle":
+        resolution = circle.HQ_RESOLUTION if poster_mode else circle.QUICK_RESOLUTION
+        circle.build_circle_image(
+            os.path.join(frame_dir, "data.json"), os.path.join(output_dir, "circle_full.png"), resolution
+        )
+    elif kind == "render_vertical":
+        metadata = vertical.load_metadata(frame_dir)
+        if poster_mode:
+            classic = (vertical.CLASSIC_HQ_WIDTH, vertical.CLASSIC_HQ_HEIGHT)
+            cinematic = (vertical.HQ_WIDTH, vertical.HQ_HEIGHT)
+        else:
+            classic = (vertical.CLASSIC_QUICK_WIDTH, vertical.CLASSIC_QUICK_HEIGHT)
+            cinematic = (vertical.QUICK_WIDTH, vertical.QUICK_HEIGHT)
+        vertical.build_vertical_classic(metadata, os.path.join(output_dir, "vertical_classic.png"), *classic)
+        vertical.build_vertical_cinematic(metadata, os.path.join(output_dir, "vertical_cinematic.png"), *cinematic)
+    elif kind == "render_radial":
+        horizontal_path = os.path.join(output_dir, "linear_hq.png")
+        if poster_mode:
+            line_height, stripe_width, resolution = radial.HQ_LINE_HEIGHT, radial.HQ_STRIPE_WIDTH, radial.POSTER_RESOLUTION
+        else:
+            line_height, stripe_width, resolution = radial.QUICK_LINE_HEIGHT, radial.QUICK_STRIPE_WIDTH, radial.QUICK_RESOLUTION
+        radial.build_horizontal_timeline(frame_dir, horizontal_path, line_height, stripe_width)
+        radial.build_radial_image(horizontal_path, os.path.join(output_dir, "radial_hq.png"), resolution)
+    elif kind == "render_shots":
+        shot_list, total_frames, settings = shots.build_shots(frame_dir)
+        shots.save_shot_metadata(Path(output_dir) / "shot_palettes.json", folder, total_frames, shot_list, settings)
+        shots.save_shot_palette_strip(shot_list, Path(output_dir) / "shot_palette_strip.png")
+    elif kind == "render_palette":
+        palette.build_palettes(frame_dir, output_dir)
+    elif kind == "render_donut":
+        resolution = donut.HQ_RESOLUTION if poster_mode else donut.QUICK_RESOLUTION
+        donut.build_donut_poster(circle_dir, os.path.join(output_dir, "circle_donut_poster.png"), resolution)
+    elif kind == "render_poster":
+        # The poster CLI is already non-interactive without a terminal (it uses the tagline).
+        script = Path(__file__).with_name("ozonelab_style.py")
+        cmd = [sys.executable, str(script), "--input", os.path.join(output_dir, "circle_full.png")]
+        subprocess.run(cmd, check=True, stdin=subprocess.DEVNULL)
+    else:
+        raise ValueError(f"Unknown job kind: {kind}")
+
+
+# === DAEMON ===
+class InboxWatcher:
+    """Queues video files once they have stopped changing for the settle period."""
+
+    def __init__(self, inbox, queue, kinds, options, settle=SETTLE_SECONDS):
+        self.inbox = Path(inbox)
+        self.queue = queue
+        self.kinds = kinds
+        self.options = options
+        self.settle = settle
+        self._seen = {}
+        self._handled = {}
+
+    def scan(self):
+        self.inbox.mkdir(parents=True, exist_ok=True)
+        now = time.time()
+        queued = 0
+        for path in sorted(self.inbox.iterdir()):
+            if not path.is_file() or path.suffix.lower() not in VIDEO_EXTENSIONS:
+                continue
+            st = path.stat()
+            state = (st.st_size, st.st_mtime_ns)
+            if self._handled.get(path) == state:
+                continue
+            if self._seen.get(path, (None, 0))[0] != state:
+                self._seen[path] = (state, now)
+            if now - self._seen[path][1] < self.settle:
+                continue
+            self._handled[path] = state
+            if self.enqueue(path):
+                queued += 1
+        return queued
+
+    def enqueue(self, path):
+        folder = folder_from_filename(path)
+        if folder is None:
+            print(f"[!] Skipping {path.name}: name must look like 'Title (Year) - ttXXXXXXX'.")
+            return False
+        with stage("watch.fingerprint"):
+            key = source_fingerprint(str(path))
+        if self.queue.known_input(key):
+            return False
+        owner = self.queue.folder_owner(folder)
+        if owner is not None and owner != key:
+            print(f"[!] Skipping {path.name}: {folder} was already ingested from a different file.")
+            return False
+        if self.queue.add_input(key, path.resolve(), folder, self.options, self.kinds):
+            print(f"[✓] Queued {len(self.kinds)} job(s) for {folder}")
+            return True
+        return False
+
+
+def worker_loop(queue, stop, idle, poll, name):
+    while not stop.is_set():
+        job = queue.claim()
+        if job is None:
+            idle.set()
+            stop.wait(poll)
+            continue
+        idle.clear()
+        label = f"{job['kind']} for {job['folder']}"
+        print(f"[>] {name}: {label}")
+        try:
+            with stage(f"watch.{job['kind']}"):
+                run_job(job["kind"], job["video_path"], job["folder"], json.loads(job["options"]))
+        except Exception as e:
+            queue.finish(job["id"], error=f"{type(e).__name__}: {e}")
+            print(f"[✗] {name}: {label} failed: {e}")
+        else:
+            queue.finish(job["id"])
+            print(f"[✓] {name}: {label}")
+
+
+def kinds_for(renders):
+    """Frame extraction and metadata plus the selected renders and their prerequisites, in JOB_GRAPH order."""
+    wanted = {r.strip() for r in renders.split(",") if r.strip()}
+    unknown = wanted - set(RENDERS)
+    if unknown:
+        raise ValueError(f"Unknown render(s): {', '.join(sorted(unknown))}")
+    needed = {"extract_frames", "metadata"}
+    for render in wanted:
+        kind = f"render_{render}"
+        # Pull in prerequisites too, e.g. a poster needs the circle render.
+        while kind is not None:
+            needed.add(kind)
+            kind = JOB_GRAPH[kind]
+    return [kind for kind in JOB_GRAPH if kind in needed]
+
+
+def print_status(queue):
+    for row in queue.listing():
+        error = f"  {row['error']}" if row["error"] else ""
+        print(f"  {row['id']:>5}  {row['status']:<8} {row['kind']:<15} {row['folder']}{error}")
+    print(f"[>] {queue.counts()}")
+
+
+def main():
+    args = parse_args()
+    queue = JobQueue(args.db)
+    if args.status:
+        print_status(queue)
+        return
+    if args.retry_failed:
+        print(f"[✓] Requeued {queue.retry_failed()} failed job(s).")
+        return
+
+    start_profiling(args, "watch")
+    try:
+        kinds = kinds_for(args.renders)
+    except ValueError as e:
+        print(f"[✗] {e}")
+        return
+    requeued = queue.recover()
+    if requeued:
+        print(f"[!] Requeued {requeued} job(s) interrupted by a previous run.")
+
+    watcher = InboxWatcher(
+        args.inbox,
+        queue,
+        kinds,
+        {
+            "poster_mode": args.poster_mode,
+            "scene_cuts": args.scene_cuts,
+            "tonemap": args.tonemap,
+            "crop": args.crop,
+        },
+        settle=0 if args.once else args.settle,
+    )
+    print(f"[✓] Watching {args.inbox} with {max(1, args.workers)} worker(s); queue at {args.db}")
+    watcher.scan()
+    load_now()
+    stop = threading.Event()
+    idles = []
+    workers = []
+    for i in range(max(1, args.workers)):
+        idle = threading.Event()
+        thread = threading.Thread(
+            target=worker_loop,
+            args=(queue, stop, idle, min(args.poll, 1.0) if args.once else args.poll, f"worker-{i + 1}"),
+            name=f"watch-worker-{i + 1}",
+        )
+        thread.start()
+        idles.append(idle)
+        workers.append(thread)
+
+    try:
+        while not stop.is_set():
+            if args.once:
+                # Done once every worker has found nothing runnable.
+                time.sleep(0.2)
+                if all(idle.is_set() for idle in idles):
+                    break
+                continue
+            time.sleep(args.poll)
+            watcher.scan()
+    except KeyboardInterrupt:
+        print("\n[>] Stopping after running jobs finish...")
+    finally:
+        stop.set()
+        for thread in workers:
+            thread.join()
+    print(f"[✓] Queue: {queue.counts()}")
+
+
+if __name__ == "__main__":
+    main()
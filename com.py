@@ -0,0 +1,54 @@
+import argparse
+import importlib
+import sys
+
+# === CONFIGURATION ===
+# Subcommand -> (module, summary). Modules are imported only when their subcommand runs.
+COMMANDS = {
+    "process": ("colours_of_motion_processing", "Extract frames + metadata or circle strips from a film."),
+    "experimental": ("colours_of_motion_processing_experimental", "Extract 1 fps frames or strips into *_experimental folders."),
+    "pipeline": ("colours_of_motion_pipeline", "Extract, analyse and render one film with the stages overlapped."),
+    "analyse": ("colours_of_motion_analysis", "Analyse every frame inside ffmpeg into frames/<film>/analysis.npz."),
+    "decimate": ("colours_of_motion_decimate", "Derive lower-rate datasets from one 1 fps extraction."),
+    "circle": ("colours_of_motion_circle", "Build circle_full.png from data.json."),
+    "donut": ("colours_of_motion_donut", "Build circle_donut_poster.png from strips."),
+    "vertical": ("colours_of_motion_vertical", "Build vertical_classic.png and vertical_cinematic.png."),
+    "radial": ("colours_of_motion_radial", "Build linear_hq.png and radial_hq.png."),
+    "shots": ("colours_of_motion_shots", "Build shot_palettes.json and shot_palette_strip.png."),
+    "palette": ("colours_of_motion_palette", "Extract per-frame/per-shot palettes and palette strips."),
+    "animate": ("colours_of_motion_animate", "Encode a time-lapse of the circle or a timeline filling up."),
+    "tiles": ("colours_of_motion_tiles", "Write DeepZoom tile pyramids of the large outputs."),
+    "similar": ("colours_of_motion_similarity", "Index film colours and find similar films or scenes."),
+    "align": ("colours_of_motion_align", "Align two editions of a film and render where they differ."),
+    "manifest": ("colours_of_motion_manifest", "Show, rebuild or verify the per-film dataset and output manifest."),
+    "poster": ("ozonelab_style", "Build light/dark posters (or --metadata-only)."),
+    "serve": ("colours_of_motion_server", "Run the local render service."),
+    "watch": ("colours_of_motion_watch", "Run the watch-folder ingestion daemon."),
+    "bench": ("colours_of_motion_benchmark", "Benchmark builders, extraction and startup time."),
+    "testfilm": ("colours_of_motion_testfilm", "Generate a synthetic test film with ground truth."),
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="com",
+        description="Colours of Motion: one entry point for every script.",
+        epilog="\n".join(f"  {name:<12} {summary}" for name, (_, summary) in COMMANDS.items()),
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("command", choices=COMMANDS, metavar="command", help="Subcommand to run (see below).")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="Arguments passed to the subcommand.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    module_name, _ = COMMANDS[args.command]
+    # Each script parses sys.argv itself; present it as `com <command> ...` in usage lines.
+    sys.argv = [f"com {args.command}", *args.args]
+    module = importlib.import_module(module_name)
+    return module.main()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,14 +5,26 @@ import os
 import re
 import sys
 import urllib.parse
-import urllib.request
-import urllib.error
 from datetime import datetime, timezone
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Tuple
 
-import numpy as np
-from PIL import Image, ImageDraw, ImageFilter, ImageFont
+from colours_of_motion_lazy import lazy_import
+from colours_of_motion_manifest import frame_count
+from colours_of_motion_png import save_png, wait_for_writes
+from colours_of_motion_preview import add_preview_args, fit_preview, preview_path, render_progressive
+from colours_of_motion_profile import add_profile_args, stage, start_profiling
+from colours_of_motion_vector import SEAM_OVERLAP, VectorDrawing, add_vector_args, colour_runs, save_vector
+
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+ImageDraw = lazy_import("PIL.ImageDraw")
+ImageFilter = lazy_import("PIL.ImageFilter")
+ImageFont = lazy_import("PIL.ImageFont")
+# Only TMDB refreshes need the HTTP stack (~40 ms of imports).
+urllib_error = lazy_import("urllib.error")
+urllib_request = lazy_import("urllib.request")
 
 
 LIGHT_THEME = {
@@ -104,6 +116,9 @@ def parse_args():
         default=None,
         help="Path for TMDB request/response debug log (JSONL). Defaults to logs/tmdb_run_<timestamp>.jsonl",
     )
+    add_preview_args(parser)
+    add_vector_args(parser)
+    add_profile_args(parser)
     return parser.parse_args()
 
 
@@ -201,6 +216,22 @@ def render_dotstrip_png(
     dot_color: Tuple[int, int, int, int] = (0, 0, 0, 255),
     padding: int = DOTSTRIP_PADDING_PX,
 ) -> Path:
+    img = render_dotstrip_image(stream, dot_radius, dx, row_gap, gap_mult, dot_color, padding)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    save_png(img, output_path)
+    return output_path
+
+
+def dotstrip_layout(width, height):
+    """Dot radius, horizontal step and row gap for a poster of the given size."""
+    dot_radius = max(2, int(round(width * DOTSTRIP_RADIUS_RATIO)))
+    dx = max(8.0, width * DOTSTRIP_DX_RATIO) + DOTSTRIP_EXTRA_DX_PX
+    row_gap = max(6.0, height * DOTSTRIP_ROW_GAP_RATIO)
+    return dot_radius, dx, row_gap
+
+
+def dotstrip_geometry(stream, dot_radius, dx, row_gap, gap_mult, padding=DOTSTRIP_PADDING_PX):
+    """Dot centres and the (width, height) of the strip they sit in."""
     y_top = padding + dot_radius
     y_bottom = y_top + row_gap
     x0 = padding + dot_radius
@@ -214,7 +245,36 @@ def render_dotstrip_png(
             x += dx * gap_mult
     width = int(math.ceil(x + dot_radius + padding))
     height = int(math.ceil(y_bottom + dot_radius + padding))
+    return dots, width, height
+
 
+def dotstrip_drawing(
+    stream: str,
+    dot_radius: int,
+    dx: float,
+    row_gap: float,
+    gap_mult: float,
+    dot_color: Tuple[int, int, int, int] = (0, 0, 0, 255),
+    padding: int = DOTSTRIP_PADDING_PX,
+) -> VectorDrawing:
+    """Vector dot strip with the same geometry as render_dotstrip_image (transparent ground)."""
+    dots, width, height = dotstrip_geometry(stream, dot_radius, dx, row_gap, gap_mult, padding)
+    drawing = VectorDrawing(max(1, width), max(1, height))
+    for px, py in dots:
+        drawing.dot(px, py, dot_radius, dot_color)
+    return drawing
+
+
+def render_dotstrip_image(
+    stream: str,
+    dot_radius: int,
+    dx: float,
+    row_gap: float,
+    gap_mult: float,
+    dot_color: Tuple[int, int, int, int] = (0, 0, 0, 255),
+    padding: int = DOTSTRIP_PADDING_PX,
+) -> "Image.Image":
+    dots, width, height = dotstrip_geometry(stream, dot_radius, dx, row_gap, gap_mult, padding)
     img = Image.new("RGBA", (max(1, width), max(1, height)), (0, 0, 0, 0))
     draw = ImageDraw.Draw(img)
     for px, py in dots:
@@ -222,10 +282,7 @@ def render_dotstrip_png(
             (px - dot_radius, py - dot_radius, px + dot_radius, py + dot_radius),
             fill=dot_color,
         )
-
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    img.save(output_path, "PNG", optimize=False, compress_level=1)
-    return output_path
+    return img
 
 
 def parse_film_hint(input_path):
@@ -286,8 +343,8 @@ def tmdb_get(path, params, api_key=None, read_token=None, log_path=None):
         },
     )
     try:
-        request = urllib.request.Request(url, headers=headers)
-        with urllib.request.urlopen(request, timeout=15) as response:
+        request = urllib_request.Request(url, headers=headers)
+        with urllib_request.urlopen(request, timeout=15) as response:
             raw = response.read().decode("utf-8")
             data = json.loads(raw)
             tmdb_log(
@@ -301,7 +358,7 @@ def tmdb_get(path, params, api_key=None, read_token=None, log_path=None):
                 },
             )
             return data
-    except urllib.error.HTTPError as exc:
+    except urllib_error.HTTPError as exc:
         body = ""
         try:
             body = exc.read().decode("utf-8")
@@ -615,6 +672,7 @@ def resolve_metadata(args, input_path):
     return metadata, metadata_path
 
 
+@lru_cache(maxsize=256)
 def get_font(size, bold=False):
     # Prefer condensed/impact-like fonts for closer poster typography.
     candidates = []
@@ -668,10 +726,8 @@ def wrap_text(draw, text, font, max_width):
     return lines
 
 
-def ring_from_circle(circle_img, diameter):
-    src = circle_img.convert("RGB").resize((diameter, diameter), Image.LANCZOS)
-    src_rgba = src.convert("RGBA")
-
+@lru_cache(maxsize=8)
+def ring_mask(diameter):
     mask = Image.new("L", (diameter, diameter), 0)
     draw_mask = ImageDraw.Draw(mask)
     center = diameter // 2
@@ -685,7 +741,13 @@ def ring_from_circle(circle_img, diameter):
         (center - inner, center - inner, center + inner, center + inner),
         fill=0,
     )
-    src_rgba.putalpha(mask)
+    return mask
+
+
+def ring_from_circle(circle_img, diameter):
+    src = circle_img.convert("RGB").resize((diameter, diameter), Image.LANCZOS)
+    src_rgba = src.convert("RGBA")
+    src_rgba.putalpha(ring_mask(diameter))
     return src_rgba
 
 
@@ -727,13 +789,118 @@ def add_paper_grain(img):
     return grain
 
 
-def draw_poster(circle_img, output_path, palette, title, subtitle, meta_row, dotstrip_asset_path, width, height):
+def draw_poster(
+    circle_img,
+    output_path,
+    palette,
+    title,
+    subtitle,
+    meta_row,
+    dotstrip_asset_path,
+    width,
+    height,
+    background=False,
+):
+    # Dot strip asset is pre-rendered and composited by compose_poster.
+    dotstrip = None
+    if dotstrip_asset_path.exists():
+        dotstrip = Image.open(dotstrip_asset_path).convert("RGBA")
+    img = compose_poster(circle_img, palette, title, subtitle, meta_row, dotstrip, width, height)
+    if background:
+        save_png(img, output_path, background=True)
+        print(f"[>] Encoding poster in background: {output_path}")
+        return
+    save_png(img, output_path)
+    print(f"[✓] Saved poster: {output_path}")
+
+
+def poster_geometry(width, height):
+    """Fixed poster boxes (frame, metadata strip, circle, colour bar, dot strip anchor)."""
+    frame = int(width * 0.03)
+    border = max(6, int(width * 0.004))
+    left = frame + int(width * 0.08)
+    right = width - frame - int(width * 0.08)
+    inner_top = frame + int(height * 0.08)
+    inner_bottom = height - frame - int(height * 0.07)
+    meta_strip_h = int(height * TOP_META_STRIP_HEIGHT_RATIO)
+    meta_strip_top = inner_top - int(meta_strip_h * 0.36)
+    circle_d = int(width * 0.65)
+    bar_h = int(height * 0.03)
+    bar_y = inner_bottom - bar_h
+    return {
+        "frame": frame,
+        "border": border,
+        "left": left,
+        "right": right,
+        "inner_top": inner_top,
+        "inner_bottom": inner_bottom,
+        "content_w": right - left,
+        "meta_strip_top": meta_strip_top,
+        "strip_left": frame + border,
+        "strip_right": width - frame - border,
+        "strip_bottom": meta_strip_top + meta_strip_h,
+        "circle_d": circle_d,
+        "circle_x": width // 2 - circle_d // 2,
+        "circle_y": inner_top + int(height * 0.07),
+        "bar_h": bar_h,
+        "bar_y": bar_y,
+        "dots_y": bar_y - int(height * DOTSTRIP_Y_ABOVE_COLORBAR_RATIO),
+    }
+
+
+def poster_art_drawing(colours, palette, dotstrip, width, height):
+    """Vector layer of the poster graphics in poster coordinates: frame, metadata strip,
+    ring, colour bar and dot strip. Type is left to the layout tool (or the PNG poster).
+    """
+    layout = poster_geometry(width, height)
+    frame, border = layout["frame"], layout["border"]
+    art = VectorDrawing(width, height, background=palette["frame_outer"])
+    # PIL rectangles include both end pixels; the outline is drawn inside the box.
+    inner = width - 2 * frame + 1, height - 2 * frame + 1
+    art.rect(frame, frame, inner[0], inner[1], palette["fg"])
+    art.rect(frame + border, frame + border, inner[0] - 2 * border, inner[1] - 2 * border, palette["frame_inner"])
+    art.rect(
+        layout["strip_left"], layout["meta_strip_top"],
+        layout["strip_right"] - layout["strip_left"] + 1, layout["strip_bottom"] - layout["meta_strip_top"] + 1,
+        palette["fg"],
+    )
+
+    # Same ring as ring_mask: outer radius d/2 - 1, inner a quarter of that.
+    circle_d = layout["circle_d"]
+    centre = circle_d // 2
+    outer = circle_d // 2 - 1
+    n_frames = len(colours)
+    ring = VectorDrawing(circle_d, circle_d)
+    for start, stop, colour in colour_runs(colours):
+        end = stop / n_frames + (SEAM_OVERLAP if stop < n_frames else 0.0)
+        ring.wedge(centre, centre, int(outer * 0.25), outer, start / n_frames, end, colour)
+    art.place(ring, layout["circle_x"], layout["circle_y"])
+
+    # The colour bar walks the ring from 3 o'clock, i.e. the frames in order.
+    bar_w = layout["content_w"]
+    for start, stop, colour in colour_runs(colours):
+        x0 = start / n_frames * bar_w
+        x1 = stop / n_frames * bar_w + (1 if stop < n_frames else 0)
+        art.rect(layout["left"] + x0, layout["bar_y"], x1 - x0, layout["bar_h"], colour)
+
+    if dotstrip is not None:
+        art.place(
+            dotstrip,
+            width // 2 - dotstrip.width // 2,
+            layout["dots_y"] - dotstrip.height // 2,
+        )
+    return art
+
+
+def compose_poster(circle_img, palette, title, subtitle, meta_row, dotstrip, width, height):
+    """Lay out the full poster and return it as an RGB PIL image."""
     img = Image.new("RGB", (width, height), palette["bg"])
     draw = ImageDraw.Draw(img)
+    layout = poster_geometry(width, height)
 
     # Outer frame + inner border.
-    frame = int(width * 0.03)
-    border = max(6, int(width * 0.004))
+    frame = layout["frame"]
+    border = layout["border"]
     draw.rectangle((0, 0, width - 1, height - 1), fill=palette["frame_outer"])
     draw.rectangle(
         (frame, frame, width - frame, height - frame),
@@ -742,19 +909,14 @@ def draw_poster(circle_img, output_path, palette, title, subtitle, meta_row, dot
         width=border,
     )
 
-    left = frame + int(width * 0.08)
-    right = width - frame - int(width * 0.08)
-    inner_top = frame + int(height * 0.08)
-    inner_bottom = height - frame - int(height * 0.07)
-    content_w = right - left
+    left = layout["left"]
+    inner_top = layout["inner_top"]
+    content_w = layout["content_w"]
 
     # Top metadata row with inverted strip.
     meta_y = inner_top
-    meta_strip_h = int(height * TOP_META_STRIP_HEIGHT_RATIO)
-    meta_strip_top = meta_y - int(meta_strip_h * 0.36)
-    strip_left = frame + border
-    strip_right = width - frame - border
-    strip_bottom = meta_strip_top + meta_strip_h
+    meta_strip_top, strip_left = layout["meta_strip_top"], layout["strip_left"]
+    strip_right, strip_bottom = layout["strip_right"], layout["strip_bottom"]
     draw.rectangle(
         (strip_left, meta_strip_top, strip_right, strip_bottom),
         fill=palette["fg"],
@@ -789,17 +951,18 @@ def draw_poster(circle_img, output_path, palette, title, subtitle, meta_row, dot
         draw.text((x - (bb[2] - bb[0]) / 2, meta_y), item, fill=palette["bg"], font=meta_font)
 
     # Circle placement.
-    circle_d = int(width * 0.65)
-    ring = ring_from_circle(circle_img, circle_d)
-    cx = width // 2 - circle_d // 2
-    cy = inner_top + int(height * 0.07)
+    circle_d = layout["circle_d"]
+    with stage("ozonelab.ring_resize"):
+        ring = ring_from_circle(circle_img, circle_d)
+    cx, cy = layout["circle_x"], layout["circle_y"]
 
     # Subtle drop shadow to lift the donut from the paper.
     shadow_alpha = ring.split()[-1]
     shadow = Image.new("RGBA", ring.size, (0, 0, 0, 0))
     shadow_draw = ImageDraw.Draw(shadow)
     shadow_draw.bitmap((0, 0), shadow_alpha, fill=(0, 0, 0, 64))
-    shadow = shadow.filter(ImageFilter.GaussianBlur(radius=max(4, int(width * 0.004))))
+    with stage("ozonelab.shadow_blur"):
+        shadow = shadow.filter(ImageFilter.GaussianBlur(radius=max(4, int(width * 0.004))))
     shadow_dx = int(width * 0.004)
     shadow_dy = int(height * 0.006)
     img.paste(shadow, (cx + shadow_dx, cy + shadow_dy), shadow)
@@ -813,9 +976,10 @@ def draw_poster(circle_img, output_path, palette, title, subtitle, meta_row, dot
     tb = draw.textbbox((0, 0), title_text, font=title_font)
 
     # Bottom color strip derived from circle colors.
-    strip_h = int(height * 0.03)
-    strip_y = inner_bottom - strip_h
-    strip = sample_ring_strip(circle_img, content_w, strip_h)
+    strip_h = layout["bar_h"]
+    strip_y = layout["bar_y"]
+    with stage("ozonelab.strip_sample", items=content_w):
+        strip = sample_ring_strip(circle_img, content_w, strip_h)
 
     # Matching subtle drop shadow for the bottom strip.
     strip_shadow = Image.new("RGBA", strip.size, (0, 0, 0, 0))
@@ -832,7 +996,7 @@ def draw_poster(circle_img, output_path, palette, title, subtitle, meta_row, dot
     img.paste(strip, (left, strip_y))
 
     # Dot strip is anchored above the bottom color bar.
-    dots_y = strip_y - int(height * DOTSTRIP_Y_ABOVE_COLORBAR_RATIO)
+    dots_y = layout["dots_y"]
 
     subtitle_top_gap = int(height * 0.014)
     subtitle_bottom_limit = dots_y - int(height * 0.030)
@@ -882,18 +1046,69 @@ def draw_poster(circle_img, output_path, palette, title, subtitle, meta_row, dot
         draw.text((width / 2 - (sb[2] - sb[0]) / 2, sub_y), line, fill=palette["muted"], font=chosen_font)
         sub_y += chosen_line_h
 
-    # Dot strip asset is pre-rendered and composited here.
-    dotstrip_path = dotstrip_asset_path
-    if dotstrip_path.exists():
-        dotstrip = Image.open(dotstrip_path).convert("RGBA")
+    if dotstrip is not None:
         dots_x = width // 2 - dotstrip.width // 2
         dots_y_top = dots_y - dotstrip.height // 2
         img.paste(dotstrip, (dots_x, dots_y_top), dotstrip)
 
     # Subtle paper grain for print-like finish.
-    img = add_paper_grain(img)
-    img.save(output_path, "PNG", optimize=False, compress_level=1)
-    print(f"[✓] Saved poster: {output_path}")
+    with stage("ozonelab.grain", items=width * height):
+        return add_paper_grain(img)
+
+
+def count_frames_processed(folder):
+    """A for the dot strip: the manifest count, else frames in data.json, else extracted frame files."""
+    frames_processed = frame_count(Path("frames") / folder)
+    if frames_processed:
+        return frames_processed
+    data_json = Path("frames") / folder / "data.json"
+    frames_processed = 0
+    if data_json.exists():
+        with data_json.open("r", encoding="utf-8") as f:
+            frame_data = json.load(f)
+        if isinstance(frame_data, list):
+            frames_processed = len(frame_data)
+    if frames_processed <= 0:
+        frame_dir = Path("frames") / folder
+        if frame_dir.exists():
+            frame_files = [
+                p for p in frame_dir.iterdir()
+                if p.is_file() and p.suffix.lower() in {".jpg", ".jpeg", ".png"}
+            ]
+            frames_processed = len(frame_files)
+    if frames_processed <= 0:
+        raise RuntimeError(f"Could not determine frames_processed for {folder}")
+    return frames_processed
+
+
+def runtime_seconds_for(metadata):
+    """B for the dot strip: runtime in seconds."""
+    runtime_min = metadata.get("runtime_min")
+    # Keep B predictable: if runtime is missing, encode as 0.
+    runtime_seconds = int(runtime_min * 60) if isinstance(runtime_min, (int, float)) and runtime_min >= 0 else 0
+    if runtime_seconds < 0:
+        raise ValueError("runtime_seconds must be non-negative")
+    return runtime_seconds
+
+
+def render_vector_art(args, folder, stream, targets):
+    """--vector: write each theme's dot strip and poster art layer as SVG/PDF."""
+    data_json = Path("frames") / folder / "data.json"
+    if not data_json.exists():
+        raise FileNotFoundError(f"Vector art needs frame colours: {data_json}")
+    with data_json.open("r", encoding="utf-8") as f:
+        colours = [frame["color"] for frame in json.load(f)]
+    dot_radius, dx, row_gap = dotstrip_layout(args.width, args.height)
+    for target in targets:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        theme = "dark" if "dark" in target.name.lower() else "light"
+        palette = DARK_THEME if theme == "dark" else LIGHT_THEME
+        dot_color = (255, 255, 255) if theme == "dark" else (0, 0, 0)
+        with stage("ozonelab.vector", items=len(colours)):
+            dotstrip = dotstrip_drawing(stream, dot_radius, dx, row_gap, DOTSTRIP_GAP_MULT, dot_color)
+            save_vector(dotstrip, Path(args.input).parent / f"dotstrip_{theme}.png", args.vector)
+            art = poster_art_drawing(colours, palette, dotstrip, args.width, args.height)
+            save_vector(art, target.with_name(f"{target.stem}_art.png"), args.vector)
 
 
 def output_paths(input_path, output_path, theme):
@@ -934,6 +1149,7 @@ def choose_headline_text(metadata, title_override=None):
 
 def main():
     args = parse_args()
+    start_profiling(args, "ozonelab")
     load_dotenv()
     if not args.tmdb_log_file:
         run_stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -942,81 +1158,88 @@ def main():
     if not input_path.exists():
         raise FileNotFoundError(f"Input not found: {input_path}")
 
-    metadata, metadata_path = resolve_metadata(args, input_path)
+    with stage("ozonelab.metadata"):
+        metadata, metadata_path = resolve_metadata(args, input_path)
     if args.metadata_only:
         print(f"[✓] Metadata-only run complete: {metadata_path}")
         return
 
-    # Determine A from actual processed frame list used by this film.
     hint = parse_film_hint(input_path)
-    data_json = Path("frames") / hint["folder"] / "data.json"
-    frames_processed = 0
-    if data_json.exists():
-        with data_json.open("r", encoding="utf-8") as f:
-            frame_data = json.load(f)
-        if isinstance(frame_data, list):
-            frames_processed = len(frame_data)
-    if frames_processed <= 0:
-        frame_dir = Path("frames") / hint["folder"]
-        if frame_dir.exists():
-            frame_files = [
-                p for p in frame_dir.iterdir()
-                if p.is_file() and p.suffix.lower() in {".jpg", ".jpeg", ".png"}
-            ]
-            frames_processed = len(frame_files)
-    if frames_processed <= 0:
-        raise RuntimeError(f"Could not determine frames_processed for {hint['folder']}")
+    stream = build_stream(count_frames_processed(hint["folder"]), runtime_seconds_for(metadata))
 
-    runtime_min = metadata.get("runtime_min")
-    # Keep B predictable: if runtime is missing, encode as 0.
-    runtime_seconds = int(runtime_min * 60) if isinstance(runtime_min, (int, float)) and runtime_min >= 0 else 0
-    if runtime_seconds < 0:
-        raise ValueError("runtime_seconds must be non-negative")
-
-    stream = build_stream(frames_processed, runtime_seconds)
-    dot_radius = max(2, int(round(args.width * DOTSTRIP_RADIUS_RATIO)))
-    dx = max(8.0, args.width * DOTSTRIP_DX_RATIO) + DOTSTRIP_EXTRA_DX_PX
-    row_gap = max(6.0, args.height * DOTSTRIP_ROW_GAP_RATIO)
-
-    circle = Image.open(input_path).convert("RGB")
+    with stage("ozonelab.load_circle"):
+        circle = Image.open(input_path).convert("RGB")
     headline = choose_headline_text(metadata, title_override=args.title).upper()
     summary = args.subtitle or metadata.get("summary") or DEFAULT_SUMMARY
     meta_row = generate_meta_row(metadata)
 
     targets = output_paths(args.input, args.output, args.theme)
-    for target in targets:
-        target.parent.mkdir(parents=True, exist_ok=True)
-        if "dark" in target.name.lower():
-            palette = DARK_THEME
-            dot_color = (255, 255, 255, 255)
-            dotstrip_path = input_path.parent / "dotstrip_dark.png"
-        else:
-            palette = LIGHT_THEME
-            dot_color = (0, 0, 0, 255)
-            dotstrip_path = input_path.parent / "dotstrip_light.png"
-
-        render_dotstrip_png(
-            stream=stream,
-            output_path=dotstrip_path,
-            dot_radius=dot_radius,
-            dx=dx,
-            row_gap=row_gap,
-            gap_mult=DOTSTRIP_GAP_MULT,
-            dot_color=dot_color,
-            padding=DOTSTRIP_PADDING_PX,
-        )
+    if args.vector:
+        render_vector_art(args, hint["folder"], stream, targets)
+        return
 
-        draw_poster(
-            circle_img=circle,
-            output_path=target,
-            palette=palette,
-            title=headline,
-            subtitle=summary,
-            meta_row=meta_row,
-            dotstrip_asset_path=dotstrip_path,
-            width=args.width,
-            height=args.height,
-        )
+    def render_posters(width, height, circle_img, preview=False):
+        dot_radius, dx, row_gap = dotstrip_layout(width, height)
+        for target in targets:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            if "dark" in target.name.lower():
+                palette = DARK_THEME
+                dot_color = (255, 255, 255, 255)
+                dotstrip_path = input_path.parent / "dotstrip_dark.png"
+            else:
+                palette = LIGHT_THEME
+                dot_color = (0, 0, 0, 255)
+                dotstrip_path = input_path.parent / "dotstrip_light.png"
+            if preview:
+                target = preview_path(target)
+                dotstrip_path = preview_path(dotstrip_path)
+
+            with stage("ozonelab.dotstrip", items=len(stream)):
+                render_dotstrip_png(
+                    stream=stream,
+                    output_path=dotstrip_path,
+                    dot_radius=dot_radius,
+                    dx=dx,
+                    row_gap=row_gap,
+                    gap_mult=DOTSTRIP_GAP_MULT,
+                    dot_color=dot_color,
+                    padding=DOTSTRIP_PADDING_PX,
+                )
+
+            with stage("ozonelab.poster"):
+                draw_poster(
+                    circle_img=circle_img,
+                    output_path=target,
+                    palette=palette,
+                    title=headline,
+                    subtitle=summary,
+                    meta_row=meta_row,
+                    dotstrip_asset_path=dotstrip_path,
+                    width=width,
+                    height=height,
+                    background=True,
+                )
+
+    def render_preview():
+        width, height = fit_preview(args.width, args.height)
+        # The poster only shows the circle at a fraction of its width; shrink it first.
+        factor = max(1, circle.width // width)
+        with stage("ozonelab.preview", items=width * height):
+            render_posters(width, height, circle.reduce(factor), preview=True)
+        print(f"[✓] Rendered {len(targets)} preview poster(s) at {width}x{height}.")
+
+    def render_full():
+        render_posters(args.width, args.height, circle)
+
+    if args.preview:
+        render_preview()
+    elif args.progressive:
+        render_progressive(render_preview, render_full).join()
+    else:
+        render_full()
+    with stage("ozonelab.wait_for_writes"):
+        wait_for_writes()
+    print(f"[✓] Saved {len(targets)} poster(s).")
 
 
 if __name__ == "__main__":